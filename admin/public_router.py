@@ -1,10 +1,10 @@
-import io
-import wave
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse, JSONResponse
-from mongo import jobs_collection, users_collection
-from supabase_client import build_playlist_response, download_to_bytes
-from core.dependencies import get_current_user
+from mongo import async_jobs_collection, async_users_collection, jobs_collection, users_collection
+from supabase_client import build_playlist_response
+from core.dependencies import get_current_user, get_current_user_async
+from audio.service import charge_when_started, download_body, download_plan
+from audio.transcode import file_extension, media_type, validate_format
 
 public_router = APIRouter(prefix="/public", tags=["Public Library"])
 
@@ -124,10 +124,11 @@ def listen_public_audio(job_id: str, user=Depends(get_current_user)):
     return build_playlist_response(job)
 
 @public_router.get("/download/{job_id}")
-def download_public_audio(job_id: str, token: str = Query(...)):
-    user = get_current_user(token)
+async def download_public_audio(job_id: str, token: str = Query(...), format: str = Query("wav")):
+    fmt = validate_format(format)
+    user = await get_current_user_async(token)
 
-    job = jobs_collection.find_one({
+    job = await async_jobs_collection.find_one({
         "job_id": job_id,
         "is_admin": True
     })
@@ -138,13 +139,8 @@ def download_public_audio(job_id: str, token: str = Query(...)):
     if not pages:
         raise HTTPException(404, "No audio pages")
 
-    def page_sort_key(item):
-        return int(item[0].split("_")[-1])
-
-    ordered_pages = sorted(pages.items(), key=page_sort_key)
-
     # ---- Credit check ----
-    user_doc = users_collection.find_one({"_id": user["_id"]})
+    user_doc = await async_users_collection.find_one({"_id": user["_id"]})
     user_credits = user_doc.get("credits", 0)
     required = job.get("required_credits", 0)
 
@@ -154,49 +150,32 @@ def download_public_audio(job_id: str, token: str = Query(...)):
             detail=f"Not enough credits. Required: {required}, you have: {user_credits}"
         )
 
-    users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$inc": {"credits": -required}}
-    )
-
-    # ---- Build final WAV ----
-    pcm_chunks = []
-    params = None
-
-    def extract_storage_path(public_url: str) -> str:
-        marker = "/storage/v1/object/public/reading_app/"
-        if marker not in public_url:
-            raise RuntimeError("Invalid Supabase public URL format")
-        return public_url.split(marker, 1)[1]
-
-    for _, page in ordered_pages:
-        wav_bytes = download_to_bytes(
-            extract_storage_path(page["audio_url"])
+    async def adjust_credits(amount: int):
+        await async_users_collection.update_one(
+            {"_id": user["_id"]},
+            {"$inc": {"credits": amount}}
         )
 
-        with wave.open(io.BytesIO(wav_bytes), "rb") as w:
-            if params is None:
-                params = w.getparams()
-            pcm_chunks.append(w.readframes(w.getnframes()))
+    # ---- Stream final WAV (stored artifact when current) ----
+    plan, sizes = await download_plan(job, fmt)
+    body, content_length = download_body(job, plan, sizes, fmt)
+
+    # Charged once the body has started, refunded if it then fails
+    body = await charge_when_started(body, lambda: adjust_credits(-required), lambda: adjust_credits(required))
 
-    def wav_file():
-        out = io.BytesIO()
-        with wave.open(out, "wb") as writer:
-            writer.setparams(params)
-            for chunk in pcm_chunks:
-                writer.writeframes(chunk)
-        out.seek(0)
-        yield from iter(lambda: out.read(8192), b"")
+    filename = f"{job.get('title', job_id)}.{file_extension(fmt)}"
 
-    filename = f"{job.get('title', job_id)}.wav"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store"
+    }
+    if content_length is not None:
+        headers["Content-Length"] = str(content_length)
 
     return StreamingResponse(
-        wav_file(),
-        media_type="audio/wav",
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"',
-            "Cache-Control": "no-store"
-        }
+        body,
+        media_type=media_type(fmt),
+        headers=headers
     )
 
 
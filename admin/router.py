@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
-from mongo import jobs_collection, users_collection
-from supabase_client import upload_bytes
+from mongo import async_jobs_collection, jobs_collection, users_collection
+from core.uploads import spool_upload
+from pdf_store import acquire_pdf, pdf_page_count
+from page_text import plan_page_tasks
 from core.security import (
     hash_password,
     verify_password,
@@ -11,10 +13,10 @@ from credits.service import  (
     deduct_credits_atomic,
     PAGE_COST
 )
-from pdf_utils import get_num_pages_from_bytes
-from core.dependencies import get_current_user
+from core.dependencies import get_current_user, get_current_user_async
 from celery import Celery
 from datetime import datetime, timedelta
+import asyncio
 import uuid
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -43,7 +45,7 @@ async def upload_pdf(
     title: str = Form(...),
     category: str = Form(...),
     required_credits: int = Form(1),
-    user=Depends(get_current_user)
+    user=Depends(get_current_user_async)
 ):
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -51,21 +53,23 @@ async def upload_pdf(
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(400, "Only PDF allowed")
 
-    pdf_bytes = await file.read()
     job_id = str(uuid.uuid4())
     folder_name = make_folder_name(job_id)
-    remote_path = f"{SUPABASE_ADMIN_FOLDER}/pdfs/{folder_name}/original.pdf"
 
     original_file_name = file.filename
 
-    upload_bytes(remote_path, pdf_bytes, "application/pdf")
+    with await spool_upload(file) as upload:
+        # Count pages (known already if this content was uploaded before)
+        num_pages = await pdf_page_count(upload)
+        digits = len(str(num_pages))
 
-    # Count pages
-    num_pages = get_num_pages_from_bytes(pdf_bytes)
-    digits = len(str(num_pages))
+        # Identical content is stored once and shared between jobs
+        blob = await asyncio.to_thread(acquire_pdf, upload, num_pages)
+        remote_path = blob["path"]
+        pdf_sha256 = upload.sha256
 
     # Save metadata
-    jobs_collection.insert_one({
+    await async_jobs_collection.insert_one({
         "job_id": job_id,
         "user_id": str(user["_id"]),
         "is_admin": True,
@@ -74,6 +78,7 @@ async def upload_pdf(
         "file_name": original_file_name,
         "folder_name": folder_name,
         "remote_pdf_path": remote_path,
+        "pdf_sha256": pdf_sha256,
         "num_pages": num_pages,
         "digits": digits,
         "required_credits": required_credits,  # credits required to listen
@@ -91,16 +96,16 @@ async def upload_pdf(
     }
 
 @router.post("/start-admin-job")
-def start_job(
+async def start_job(
     job_id: str,
     start: int = 1,
     end: int | None = None,
-    user=Depends(get_current_user)
+    user=Depends(get_current_user_async)
 ):
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    job = jobs_collection.find_one({"job_id": job_id, "user_id": str(user["_id"])})
+    job = await async_jobs_collection.find_one({"job_id": job_id, "user_id": str(user["_id"])})
     if not job:
         raise HTTPException(404, "Job not found")
 
@@ -111,17 +116,25 @@ def start_job(
     if pages > MAX_PAGES_AT_ONCE:
         raise HTTPException(400, "Page limit exceeded")
 
+    plan = await plan_page_tasks(job, list(range(start, end + 1)))
     task_ids = []
-    for page in range(start, end + 1):
-        res =celery.send_task(
+    for page, path, kwargs in plan["tasks"]:
+        res = await asyncio.to_thread(
+            celery.send_task,
             "tasks.process_admin_page",
-            args=[job_id, job["remote_pdf_path"], page]
+            args=[job_id, path, page],
+            kwargs=kwargs
         )
         task_ids.append(res.id)
+    await async_jobs_collection.update_one(
+        {"job_id": job_id},
+        {"$set": {"skipped_pages": plan["skipped"]}, "$inc": {"audio_generation": 1}}
+    )
 
     return {
         "status": "processing", 
         "pages": pages,
+        "skipped_pages": plan["skipped"],
         "job_id": job_id,
         "task_ids": task_ids,
     }
@@ -230,11 +243,11 @@ def admin_activity_metrics(user=Depends(get_current_user)):
 # -------------------------
 @router.post("/process-job",
              tags=[ADMIN_TAG, PROCESSING_TAG, EMAIL_TAG])
-def start_admin_request_job(
+async def start_admin_request_job(
     job_id: str = Form(...),
     start: int = Form(1),
     end: int = Form(None),
-    user=Depends(get_current_user)
+    user=Depends(get_current_user_async)
 ):
     """
     Trigger Celery tasks to process admin job pages.
@@ -244,7 +257,7 @@ def start_admin_request_job(
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    job = jobs_collection.find_one({"job_id": job_id})
+    job = await async_jobs_collection.find_one({"job_id": job_id})
     if not job:
         raise HTTPException(status_code=404, detail="User job not found")
 
@@ -270,15 +283,23 @@ def start_admin_request_job(
         )
 
     # Trigger Celery tasks for each page
+    plan = await plan_page_tasks(job, list(range(start, end + 1)))
     task_ids = []
-    for page in range(start, end + 1):
-        task = celery.send_task(
+    for page, path, kwargs in plan["tasks"]:
+        task = await asyncio.to_thread(
+            celery.send_task,
             "tasks.process_page",
-            args=[job_id, job["remote_pdf_path"], page]
+            args=[job_id, path, page],
+            kwargs=kwargs
         )
         task_ids.append(task.id)
+    await async_jobs_collection.update_one(
+        {"job_id": job_id},
+        {"$set": {"skipped_pages": plan["skipped"]}, "$inc": {"audio_generation": 1}}
+    )
 
-    celery.send_task(
+    await asyncio.to_thread(
+        celery.send_task,
         "tasks.send_job_state_email",
         args=[job_id, "processing", "Your job has started processing."]
     )
@@ -287,6 +308,7 @@ def start_admin_request_job(
         "job_id": job_id,
         "task_ids": task_ids,
         "pages_processing": pages_requested,
+        "skipped_pages": plan["skipped"],
         "total_pages": total_pages
     }
 
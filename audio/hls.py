@@ -0,0 +1,97 @@
+import math
+from urllib.parse import urlencode
+
+from fastapi import HTTPException
+from audio.manifest import page_durations
+from utils import ordered_pages, parse_wav, wav_header
+
+# HLS packed-audio segment formats; WAV isn't playable as an HLS segment.
+HLS_FORMATS = ("aac", "mp3")
+MIN_SEGMENT_SECONDS = 2
+MAX_SEGMENT_SECONDS = 60
+
+
+def validate_hls_params(fmt: str, segment_seconds: int) -> tuple:
+    fmt = (fmt or "aac").lower()
+    if fmt not in HLS_FORMATS:
+        raise HTTPException(400, f"Unsupported HLS format. Use one of: {', '.join(HLS_FORMATS)}")
+    if segment_seconds and not MIN_SEGMENT_SECONDS <= segment_seconds <= MAX_SEGMENT_SECONDS:
+        raise HTTPException(
+            400,
+            f"segment must be 0 (one per page) or between {MIN_SEGMENT_SECONDS} and {MAX_SEGMENT_SECONDS}"
+        )
+    return fmt, segment_seconds
+
+
+def page_segments(duration: float, segment_seconds: int) -> list:
+    """
+    Split a page of `duration` seconds into fixed-length sub-segment
+    durations, the last one taking the remainder. 0 means one segment.
+    """
+    if not segment_seconds or duration <= segment_seconds:
+        return [duration]
+    count = math.ceil(duration / segment_seconds)
+    return [segment_seconds] * (count - 1) + [duration - segment_seconds * (count - 1)]
+
+
+def build_hls_playlist(job: dict, fmt: str, segment_seconds: int, query: dict) -> str:
+    """
+    Build a VOD m3u8 over the job's page audio, in page order. Segment URIs
+    are relative to the playlist and carry `query` (auth token, options).
+    Segments are encoded independently, so each is marked discontinuous.
+    """
+    suffix = urlencode({**query, "segment": segment_seconds})
+    durations = page_durations(job)
+    lines = []
+    longest = 0.0
+
+    for key, page in ordered_pages(job.get("pages", {})):
+        if not page.get("audio_path") and not page.get("audio_url"):
+            continue
+        duration = durations.get(key, 0)
+        if duration <= 0:
+            continue
+
+        for index, length in enumerate(page_segments(duration, segment_seconds)):
+            if lines:
+                # Every segment (sub-segments too) is its own ffmpeg encode,
+                # so timestamps and encoder priming restart at each one
+                lines.append("#EXT-X-DISCONTINUITY")
+            longest = max(longest, length)
+            lines.append(f"#EXTINF:{length:.3f},")
+            lines.append(f"{key}/{index}.{fmt}?{suffix}")
+
+    if not lines:
+        raise HTTPException(404, "No audio pages")
+
+    header = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{math.ceil(longest)}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    return "\n".join(header + lines + ["#EXT-X-ENDLIST", ""])
+
+
+def segment_wav(wav_bytes: bytes, index: int, segment_seconds: int, segment_count: int) -> bytes:
+    """
+    Cut sub-segment `index` out of a page WAV and return it as its own WAV.
+    The last segment runs to the end of the page so nothing is lost when the
+    stored duration is slightly off.
+    """
+    if index < 0 or index >= segment_count:
+        raise HTTPException(404, "Segment not found")
+
+    info = parse_wav(wav_bytes)
+    block_align = info.channels * info.sample_width
+
+    frames_per_segment = (segment_seconds or 0) * info.sample_rate
+    start = min(index * frames_per_segment, info.frames)
+    if index == segment_count - 1:
+        count = info.frames - start
+    else:
+        count = frames_per_segment
+
+    pcm = info.data[start * block_align:(start + count) * block_align]
+    return wav_header(info.channels, info.sample_width, info.sample_rate, len(pcm)) + pcm
@@ -0,0 +1,105 @@
+import logging
+from typing import Optional
+
+from mongo import async_jobs_collection
+from supabase_client import extract_storage_path
+from utils import ordered_pages, page_number, parse_wav
+
+logger = logging.getLogger("audio")
+
+
+def manifest_entry(key: str, path: str, wav_bytes: bytes) -> dict:
+    """
+    Describe one page's WAV so it can be assembled without re-reading it.
+    """
+    info = parse_wav(wav_bytes)
+    return {
+        "page": page_number(key),
+        "key": key,
+        "path": path,
+        "sample_rate": info.sample_rate,
+        "channels": info.channels,
+        "sample_width": info.sample_width,
+        "frames": info.frames,
+        "data_offset": info.data_offset,
+        "size": len(wav_bytes),
+    }
+
+
+async def arecord_page_manifest(job_id: str, key: str, path: str, wav_bytes: bytes) -> dict:
+    """
+    Add or replace a page in the job's audio manifest, keeping it sorted by
+    page number. Page audio is written by the worker, outside this API, so
+    entries are recorded here by backfill_manifest the first time a job's
+    audio is planned without a current manifest.
+    """
+    entry = manifest_entry(key, path, wav_bytes)
+    await async_jobs_collection.update_one(
+        {"job_id": job_id},
+        {"$pull": {"audio_manifest": {"key": key}}}
+    )
+    await async_jobs_collection.update_one(
+        {"job_id": job_id},
+        {"$push": {"audio_manifest": {"$each": [entry], "$sort": {"page": 1}}}}
+    )
+    return entry
+
+
+def page_storage_path(page: dict) -> Optional[str]:
+    if page.get("audio_path"):
+        return page["audio_path"]
+    if page.get("audio_url"):
+        return extract_storage_path(page["audio_url"])
+    return None
+
+
+def current_manifest(job: dict) -> Optional[list]:
+    """
+    Return the job's manifest (already in page order) when it covers exactly
+    the job's current page audio; None when it is missing or stale.
+    """
+    manifest = job.get("audio_manifest")
+    if not manifest:
+        return None
+
+    pages = job.get("pages", {})
+    with_audio = sum(1 for page in pages.values() if page.get("audio_path") or page.get("audio_url"))
+    if len(manifest) != with_audio:
+        return None
+
+    for entry in manifest:
+        page = pages.get(entry["key"])
+        if not page or page_storage_path(page) != entry.get("path"):
+            return None
+    return manifest
+
+
+def missing_manifest_pages(job: dict) -> list:
+    """
+    (key, path) pairs for pages whose manifest entry is absent or stale.
+    """
+    by_key = {entry["key"]: entry for entry in job.get("audio_manifest") or []}
+    missing = []
+    for key, page in ordered_pages(job.get("pages", {})):
+        path = page_storage_path(page)
+        if path and (by_key.get(key) or {}).get("path") != path:
+            missing.append((key, path))
+    return missing
+
+
+def entry_duration(entry: dict) -> float:
+    return entry["frames"] / entry["sample_rate"] if entry.get("sample_rate") else 0.0
+
+
+def page_durations(job: dict) -> dict:
+    """
+    {page_key: seconds}, exact from the manifest where it is current and
+    falling back to the duration the worker stored on the page.
+    """
+    durations = {key: float(page.get("duration") or 0) for key, page in job.get("pages", {}).items()}
+    by_key = {entry["key"]: entry for entry in job.get("audio_manifest") or []}
+    for key, page in job.get("pages", {}).items():
+        entry = by_key.get(key)
+        if entry and entry.get("path") == page_storage_path(page):
+            durations[key] = entry_duration(entry)
+    return durations
@@ -1,32 +1,61 @@
-import time
-from fastapi import APIRouter, HTTPException, Depends, Query
-from fastapi.responses import StreamingResponse, JSONResponse
-from supabase_client import _safe_create_signed_url, download_to_bytes, extract_storage_path
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from supabase_client import (
+    adownload_stream,
+    adownload_to_bytes,
+    aobject_size,
+    asigned_urls,
+    playlist_entries,
+    playlist_paths,
+    playlist_versions
+)
 from credits.service import  (
+    add_credits,
     require_credits,
-    deduct_credits_atomic,
+    deduct_credits_atomic_async,
     DOWNLOAD_COST
 )
-from mongo import jobs_collection
-from core.dependencies import get_current_user
-import io
+from mongo import async_jobs_collection
+from core.dependencies import get_current_user_async
+from audio.service import (
+    charge_when_started,
+    download_body,
+    download_plan,
+    get_wav_plan,
+    iter_wav_range,
+    iter_wav_stream,
+    page_storage_path,
+    parse_range_header,
+    wav_content_length
+)
+from audio.transcode import (
+    ensure_transcode_capacity,
+    file_extension,
+    media_type,
+    transcode_bytes,
+    transcode_stream,
+    validate_format
+)
+from audio.hls import build_hls_playlist, page_segments, segment_wav, validate_hls_params
+from audio.manifest import current_manifest, page_durations
+from storage.base import ObjectNotFound
+from utils import ordered_pages, page_cache_version
 import os
-import wave
 from dotenv import load_dotenv
 
 load_dotenv()
 router = APIRouter(prefix="/audio", tags=["Audio"])
-WAV_HEADER_SIZE = 44
 
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "reading_app")
 
 
 @router.get("/my")
-def my_audios(user=Depends(get_current_user)):
+async def my_audios(user=Depends(get_current_user_async)):
     """
     Fetch all completed audios for the authenticated user
     """
-    jobs = jobs_collection.find(
+    jobs = async_jobs_collection.find(
         {"user_id": str(user["_id"])},
         {
             "_id": 0, 
@@ -36,25 +65,26 @@ def my_audios(user=Depends(get_current_user)):
             "created_at": 1
         }
     )
-    return list(jobs)
+    return await jobs.to_list(length=None)
 
 
 # @router.get("/pages/{job_id}")
-# def get_pages(job_id: str, user=Depends(get_current_user)):
+# def get_pages(job_id: str, user=Depends(get_current_user_async)):
 #     """
 #     Fetch per-page info (audio URL, sync URL, duration) for a job
 #     """
-#     job = jobs_collection.find_one({"job_id": job_id, "user_id": str(user["_id"])})
+#     job = await async_jobs_collection.find_one({"job_id": job_id, "user_id": str(user["_id"])})
 #     if not job or "pages" not in job:
 #         raise HTTPException(status_code=404, detail="Pages info not found")
 
 #     return {"pages": job["pages"]}
 
 @router.get("/stream/{job_id}")
-def stream_wav(job_id: str, token: str = Query(...)):
-    user = get_current_user(token)
+async def stream_wav(job_id: str, request: Request, token: str = Query(...), format: str = Query("wav")):
+    fmt = validate_format(format)
+    user = await get_current_user_async(token)
 
-    job = jobs_collection.find_one({
+    job = await async_jobs_collection.find_one({
         "job_id": job_id,
         "user_id": str(user["_id"])
     })
@@ -65,109 +95,94 @@ def stream_wav(job_id: str, token: str = Query(...)):
     if not pages:
         raise HTTPException(404, "No audio pages")
 
-    def page_sort_key(item):
-        return int(item[0].split("_")[-1])
-
-    ordered_pages = sorted(pages.items(), key=page_sort_key)
+    if fmt != "wav":
+        # Free to call, so refuse rather than queue encodes
+        ensure_transcode_capacity()
 
-    # ---- First pass: read params + total size ----
-    pcm_chunks = []
-    params = None
-    total_frames = 0
+    plan = await get_wav_plan(job)
 
-    for _, page in ordered_pages:
-        wav_bytes = download_to_bytes(
-            extract_storage_path(page["audio_url"])
+    if fmt != "wav":
+        # Encoded length isn't known up front, so no ranges here
+        return StreamingResponse(
+            transcode_stream(iter_wav_stream(plan), fmt),
+            media_type=media_type(fmt),
+            headers={"Cache-Control": "no-store"}
         )
 
-        with wave.open(io.BytesIO(wav_bytes), "rb") as w:
-            if params is None:
-                params = w.getparams()
-
-            frames = w.readframes(w.getnframes())
-            pcm_chunks.append(frames)
-            total_frames += w.getnframes()
-
-    # ---- Build ONE correct WAV stream ----
-    def wav_stream():
-        out = io.BytesIO()
-        with wave.open(out, "wb") as writer:
-            writer.setparams(params)
-            for chunk in pcm_chunks:
-                writer.writeframes(chunk)
-
-        out.seek(0)
-        yield from iter(lambda: out.read(8192), b"")
+    total = wav_content_length(plan)
+
+    byte_range = parse_range_header(request.headers.get("range"), total)
+    if byte_range:
+        start, end = byte_range
+        return StreamingResponse(
+            iter_wav_range(plan, start, end),
+            status_code=206,
+            media_type="audio/wav",
+            headers={
+                "Accept-Ranges": "bytes",
+                "Content-Range": f"bytes {start}-{end}/{total}",
+                "Content-Length": str(end - start + 1),
+                "Cache-Control": "no-store"
+            }
+        )
 
     return StreamingResponse(
-        wav_stream(),
+        iter_wav_stream(plan),
         media_type="audio/wav",
-        headers={"Cache-Control": "no-store"}
+        headers={
+            "Accept-Ranges": "bytes",
+            "Content-Length": str(total),
+            "Cache-Control": "no-store"
+        }
     )
 
 @router.get("/download/{job_id}")
-def download_audio(job_id: str, token: str = Query(...)):
-    user = get_current_user(token)
+async def download_audio(job_id: str, token: str = Query(...), format: str = Query("wav")):
+    fmt = validate_format(format)
+    user = await get_current_user_async(token)
 
-    job = jobs_collection.find_one(
+    job = await async_jobs_collection.find_one(
         {"job_id": job_id, "user_id": str(user["_id"])}
     )
     if not job or "pages" not in job:
         raise HTTPException(status_code=404, detail="Audio not available")
 
-    pages = job["pages"]
-
     require_credits(user, DOWNLOAD_COST)
-    deduct_credits_atomic(user["_id"], DOWNLOAD_COST)
-
-    def page_sort_key(item):
-        return int(item[0].split("_")[-1])
-
-    ordered_pages = sorted(pages.items(), key=page_sort_key)
-
-    pcm_chunks = []
-    params = None
-
-    for _, page in ordered_pages:
-        wav_bytes = download_to_bytes(
-            extract_storage_path(page["audio_url"])
-        )
-
-        with wave.open(io.BytesIO(wav_bytes), "rb") as w:
-            if params is None:
-                params = w.getparams()
-            pcm_chunks.append(w.readframes(w.getnframes()))
+    plan, sizes = await download_plan(job, fmt)
+    body, content_length = download_body(job, plan, sizes, fmt)
+
+    # Charged once the body has started, refunded if it then fails
+    body = await charge_when_started(
+        body,
+        lambda: deduct_credits_atomic_async(user["_id"], DOWNLOAD_COST),
+        lambda: asyncio.to_thread(add_credits, user["_id"], DOWNLOAD_COST)
+    )
 
-    def wav_file():
-        out = io.BytesIO()
-        with wave.open(out, "wb") as writer:
-            writer.setparams(params)
-            for chunk in pcm_chunks:
-                writer.writeframes(chunk)
-        out.seek(0)
-        yield from iter(lambda: out.read(8192), b"")
+    filename = f"{job.get('folder_name', job_id)}.{file_extension(fmt)}"
 
-    filename = f"{job.get('folder_name', job_id)}.wav"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store"
+    }
+    if content_length is not None:
+        headers["Content-Length"] = str(content_length)
 
     return StreamingResponse(
-        wav_file(),
-        media_type="audio/wav",
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"',
-            "Cache-Control": "no-store"
-        }
+        body,
+        media_type=media_type(fmt),
+        headers=headers
     )
 
 
 
 @router.get("/sync/{job_id}")
-def get_sync(job_id: str, user=Depends(get_current_user)):
+async def get_sync(job_id: str, user=Depends(get_current_user_async)):
     """
     Return per-page sync info for the frontend to build dynamic global sync.
     """
-    job = jobs_collection.find_one({"job_id": job_id,
-                                     "user_id": str(user["_id"])
-                                    })
+    job = await async_jobs_collection.find_one({"job_id": job_id,
+                                                 "user_id": str(user["_id"])
+                                                })
     if not job or "pages" not in job:
         raise HTTPException(status_code=404, detail="Sync info not available")
 
@@ -175,8 +190,8 @@ def get_sync(job_id: str, user=Depends(get_current_user)):
 
 
 @router.get("/pages/{job_id}")
-def get_pages(job_id: str, skip: int = 0, limit: int = 5, user=Depends(get_current_user)):
-    job = jobs_collection.find_one({"job_id": job_id})
+async def get_pages(job_id: str, skip: int = 0, limit: int = 5, user=Depends(get_current_user_async)):
+    job = await async_jobs_collection.find_one({"job_id": job_id})
     if not job or "pages" not in job:
         raise HTTPException(404, "Pages not found")
 
@@ -184,47 +199,39 @@ def get_pages(job_id: str, skip: int = 0, limit: int = 5, user=Depends(get_curre
         raise HTTPException(403, "Access denied")
 
     pages = job.get("pages", {})
-    
-    # Sort keys
-    ordered_keys = sorted(pages.keys(), key=lambda k: int(k.split("_")[-1]))
+
+    # The manifest is stored in page order; only sort when it is stale
+    manifest = current_manifest(job)
+    if manifest:
+        ordered_keys = [entry["key"] for entry in manifest]
+    else:
+        ordered_keys = [key for key, _ in ordered_pages(pages)]
+    durations = page_durations(job)
 
     # Paginate
     paged_keys = ordered_keys[skip : skip + limit]
 
-    playlist = []
-    now = int(time.time())
-    expires_at = now + 300  # 5 minutes TTL for signed URLs
-
-    for key in paged_keys:
-        page = pages[key]
-        audio_path = page.get("audio_path")
-        if not audio_path:
-            continue
-
-        audio_url = _safe_create_signed_url(audio_path, 300)
-        sync_url = _safe_create_signed_url(page["sync_path"], 300) if page.get("sync_path") else None
-
-        playlist.append({
-            "page": key,
-            "audio_url": audio_url,
-            "sync_url": sync_url,
-            "duration": page.get("duration", 0),
-            "expires_at": expires_at
-        })
+    # 5 minutes TTL for signed URLs; reused from the shared cache when fresh
+    signed = await asigned_urls(playlist_paths(job, paged_keys), 300, playlist_versions(job, paged_keys))
+    playlist, failed = playlist_entries(job, signed, paged_keys)
+    for entry in playlist:
+        entry["duration"] = durations.get(entry["page"], 0)
 
     return {
         "job_id": job.get("job_id"),
         "title": job.get("title"),
         "pages": playlist,
         "total_pages": len(ordered_keys),
+        "total_duration": round(sum(durations.get(key, 0) for key in ordered_keys), 3),
+        "failed_urls": failed,
         "skip": skip,
         "limit": limit
     }
 
 
 @router.post("/share/{job_id}")
-def share_audiobook(job_id: str, user=Depends(get_current_user)):
-    result = jobs_collection.update_one(
+async def share_audiobook(job_id: str, user=Depends(get_current_user_async)):
+    result = await async_jobs_collection.update_one(
         {"job_id": job_id, "user_id": str(user["_id"])},
         {"$set": {"shared": True}}
     )
@@ -234,8 +241,8 @@ def share_audiobook(job_id: str, user=Depends(get_current_user)):
     return {"message": "Job updated successfully"}
 
 @router.get("/unshare/{job_id}")
-def unshare_audiobook(job_id: str, user=Depends(get_current_user)):
-    result = jobs_collection.update_one(
+async def unshare_audiobook(job_id: str, user=Depends(get_current_user_async)):
+    result = await async_jobs_collection.update_one(
         {"job_id": job_id, "user_id": str(user["_id"])},
         {"$set": {"shared": False}}
     )
@@ -245,19 +252,110 @@ def unshare_audiobook(job_id: str, user=Depends(get_current_user)):
     return {"message": "Job updated successfully"}
 
 @router.get("/stream/page/{job_id}/{page}")
-def stream_page_audio(job_id: str, page: str, user=Depends(get_current_user)):
+async def stream_page_audio(job_id: str, page: str, request: Request, user=Depends(get_current_user_async)):
     """
     Stream a single page’s audio.
     """
-    job = jobs_collection.find_one({"job_id": job_id, "user_id": str(user["_id"])})
+    job = await async_jobs_collection.find_one({"job_id": job_id, "user_id": str(user["_id"])})
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    audio_url = job.get("pages", {}).get(page, {}).get("audio_url")
-    if not audio_url:
+    page_info = job.get("pages", {}).get(page, {})
+    if not page_info.get("audio_path") and not page_info.get("audio_url"):
         raise HTTPException(status_code=404, detail="Audio for this page not found")
 
-    audio_bytes = download_to_bytes(audio_url)
-    return StreamingResponse(io.BytesIO(audio_bytes), media_type="audio/wav")
+    path = page_storage_path(page_info)
+    version = page_cache_version(job, page_info)
+    entry = next((e for e in job.get("audio_manifest") or [] if e["key"] == page), None)
+    try:
+        total = entry["size"] if entry and entry.get("path") == path else await aobject_size(path)
+    except ObjectNotFound:
+        raise HTTPException(status_code=404, detail="Audio for this page not found")
+
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "no-store"}
+    byte_range = parse_range_header(request.headers.get("range"), total)
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            adownload_stream(path, start=start, end=end, version=version),
+            status_code=206,
+            media_type="audio/wav",
+            headers=headers
+        )
+
+    headers["Content-Length"] = str(total)
+    return StreamingResponse(adownload_stream(path, version=version), media_type="audio/wav", headers=headers)
 
 
+
+
+async def _get_listenable_job(job_id: str, user: dict) -> dict:
+    job = await async_jobs_collection.find_one({"job_id": job_id})
+    if not job or "pages" not in job:
+        raise HTTPException(404, "Pages not found")
+
+    if job.get("shared") is not True and job["user_id"] != str(user["_id"]):
+        raise HTTPException(403, "Access denied")
+    return job
+
+
+@router.get("/hls/{job_id}/playlist.m3u8")
+async def hls_playlist(
+    job_id: str,
+    token: str = Query(...),
+    format: str = Query("aac"),
+    segment: int = Query(0)
+):
+    """
+    HLS playlist over the per-page audio. segment=0 gives one segment per
+    page, otherwise pages are split into fixed-length sub-segments.
+    """
+    fmt, segment_seconds = validate_hls_params(format, segment)
+    user = await get_current_user_async(token)
+    job = await _get_listenable_job(job_id, user)
+
+    playlist = build_hls_playlist(job, fmt, segment_seconds, {"token": token})
+    return Response(
+        playlist,
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "no-store"}
+    )
+
+
+@router.get("/hls/{job_id}/{page}/{segment_file}")
+async def hls_segment(
+    job_id: str,
+    page: str,
+    segment_file: str,
+    token: str = Query(...),
+    segment: int = Query(0)
+):
+    index, _, ext = segment_file.partition(".")
+    fmt, segment_seconds = validate_hls_params(ext, segment)
+    if not index.isdigit():
+        raise HTTPException(404, "Segment not found")
+
+    user = await get_current_user_async(token)
+    job = await _get_listenable_job(job_id, user)
+    ensure_transcode_capacity()
+
+    page_info = job["pages"].get(page)
+    if not page_info or not (page_info.get("audio_path") or page_info.get("audio_url")):
+        raise HTTPException(404, "Audio for this page not found")
+
+    segment_count = len(page_segments(page_durations(job).get(page, 0), segment_seconds))
+    wav_bytes = segment_wav(
+        await adownload_to_bytes(page_storage_path(page_info), page_cache_version(job, page_info)),
+        int(index),
+        segment_seconds,
+        segment_count
+    )
+    encoded = await transcode_bytes(wav_bytes, fmt)
+
+    return Response(
+        encoded,
+        media_type=media_type(fmt),
+        headers={"Cache-Control": "private, max-age=3600"}
+    )
@@ -0,0 +1,683 @@
+import asyncio
+import hashlib
+import itertools
+import os
+import logging
+import posixpath
+import threading
+import time
+import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+from fastapi import HTTPException
+from core.config import ASSEMBLED_AUDIO_MAX_BYTES, AUDIO_PREFETCH_WINDOW, AUDIO_PREFETCH_WORKERS
+from mongo import jobs_collection
+from audio.manifest import (
+    arecord_page_manifest,
+    current_manifest,
+    missing_manifest_pages,
+    page_storage_path
+)
+from audio.transcode import file_extension, media_type, transcode_stream
+from supabase_client import (
+    adownload_range,
+    adownload_stream,
+    adownload_to_bytes,
+    afile_sizes,
+    delete_file,
+    upload_file
+)
+from utils import WavError, ordered_pages, page_cache_version, parse_wav, parse_wav_header, wav_header
+
+logger = logging.getLogger("audio")
+
+STREAM_CHUNK_SIZE = 64 * 1024
+# Artifact spool writes are batched into worker-thread writes of this size
+ARTIFACT_WRITE_BATCH = 1024 * 1024
+# Enough for the fmt chunk plus the odd LIST/fact chunk ahead of `data`
+WAV_HEAD_BYTES = 4096
+PLAN_CACHE_SIZE = 128
+PLAN_CACHE_TTL = 600
+
+# Shared across requests so concurrent downloads of many books can't open
+# an unbounded number of storage connections.
+_fetch_slots = asyncio.Semaphore(AUDIO_PREFETCH_WORKERS)
+_background_tasks = set()
+_artifact_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="artifact-upload")
+
+_plan_cache = OrderedDict()
+_plan_cache_lock = threading.Lock()
+_backfilling = set()
+
+
+def _spawn(coro):
+    # Keep a reference so fire-and-forget tasks aren't garbage collected
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _timed_fetch(fetch: Callable[[str], Awaitable[bytes]], path: str):
+    async with _fetch_slots:
+        started = time.perf_counter()
+        data = await fetch(path)
+        return data, time.perf_counter() - started
+
+
+async def prefetch_ordered(
+    paths: Iterable[str],
+    window: int = AUDIO_PREFETCH_WINDOW,
+    fetch: Callable[[str], Awaitable[bytes]] = adownload_to_bytes
+) -> AsyncIterator[tuple]:
+    """
+    Download up to `window` objects ahead and yield (path, bytes) strictly
+    in input order.
+
+    At most `window` downloads are in flight plus the one being consumed, so
+    memory stays bounded regardless of book length. Per-page fetch times and
+    the time the consumer spent waiting are logged for tuning the window.
+    Closing the generator (client disconnect) cancels pending downloads.
+    """
+    window = max(1, window)
+    paths = iter(paths)
+    pending = deque()
+    fetch_times = []
+    stalled = 0.0
+    started = time.perf_counter()
+
+    def submit(path):
+        pending.append((path, asyncio.ensure_future(_timed_fetch(fetch, path))))
+
+    try:
+        for path in itertools.islice(paths, window):
+            submit(path)
+
+        while pending:
+            path, task = pending.popleft()
+            wait_started = time.perf_counter()
+            data, elapsed = await task
+            stalled += time.perf_counter() - wait_started
+            fetch_times.append(elapsed)
+            logger.debug("[Prefetch] %s fetched in %.3fs", path, elapsed)
+
+            for next_path in itertools.islice(paths, 1):
+                submit(next_path)
+
+            yield path, data
+    finally:
+        for _, task in pending:
+            task.cancel()
+        if fetch_times:
+            fetch_times.sort()
+            logger.info(
+                "[Prefetch] %d pages in %.2fs (window=%d, fetch avg=%.3fs p95=%.3fs max=%.3fs, stalled=%.2fs)",
+                len(fetch_times),
+                time.perf_counter() - started,
+                window,
+                sum(fetch_times) / len(fetch_times),
+                fetch_times[int(0.95 * (len(fetch_times) - 1))],
+                fetch_times[-1],
+                stalled,
+            )
+
+
+async def object_sizes(paths) -> dict:
+    """
+    {path: size} from one storage listing per folder. Paths in a folder
+    whose listing failed are left out.
+    """
+    sizes = {}
+    folders = sorted({posixpath.dirname(p) for p in paths})
+    listings = await asyncio.gather(*(afile_sizes(f) for f in folders), return_exceptions=True)
+    for folder, listing in zip(folders, listings):
+        if isinstance(listing, Exception):
+            logger.warning("[Assembly] Listing %s failed: %s", folder, listing)
+            continue
+        for name, size in listing.items():
+            sizes[posixpath.join(folder, name)] = size
+    return sizes
+
+
+async def plan_wav_assembly(pages: dict, versions: dict) -> dict:
+    """
+    Work out the final WAV layout before any PCM is sent.
+
+    Page sizes come from one storage listing per folder; the first page is
+    downloaded whole and every other page's header is read with a small
+    range request, so pages with extra chunks (LIST, fact, ...) still get
+    their exact PCM size. Pages missing from the listing, or whose header
+    doesn't fit in WAV_HEAD_BYTES, are downloaded and measured. Raises
+    WavError when pages don't share one format. `versions` maps each path
+    to its page cache version (see page_versions).
+    """
+    entries = []
+    for key, page in ordered_pages(pages):
+        if page.get("audio_path") or page.get("audio_url"):
+            entries.append({"key": key, "path": page_storage_path(page)})
+
+    if not entries:
+        raise HTTPException(404, "No audio pages")
+
+    first_bytes = await adownload_to_bytes(entries[0]["path"], versions.get(entries[0]["path"]))
+    first = parse_wav(first_bytes)
+    expected = (first.channels, first.sample_width, first.sample_rate)
+
+    sizes = await object_sizes(e["path"] for e in entries)
+
+    prefetched = {entries[0]["path"]: first_bytes}
+    layouts = {entries[0]["path"]: (expected, first.data_offset, len(first.data))}
+    listed = [e["path"] for e in entries if e["path"] not in layouts and sizes.get(e["path"])]
+    unlisted = [e["path"] for e in entries if e["path"] not in layouts and not sizes.get(e["path"])]
+
+    async def fetch_head(path: str) -> bytes:
+        return await adownload_range(path, 0, min(WAV_HEAD_BYTES, sizes[path]) - 1, versions.get(path))
+
+    async for path, head in prefetch_ordered(listed, fetch=fetch_head):
+        try:
+            info = parse_wav_header(head, sizes[path])
+        except WavError:
+            unlisted.append(path)
+            continue
+        layouts[path] = ((info.channels, info.sample_width, info.sample_rate), info.data_offset, info.data_size)
+
+    # Measure and drop; these pages are fetched again while streaming so
+    # memory stays bounded even when the listing is unavailable.
+    async for path, wav_bytes in prefetch_ordered(unlisted, fetch=lambda p: adownload_to_bytes(p, versions.get(p))):
+        try:
+            info = parse_wav(wav_bytes)
+        except WavError as e:
+            # Left out of the book, as page_pcm would do mid-stream
+            logger.warning("[Assembly] %s is not usable PCM: %s", path, e)
+            layouts[path] = (expected, None, 0)
+            continue
+        layouts[path] = ((info.channels, info.sample_width, info.sample_rate), info.data_offset, len(info.data))
+
+    for entry in entries:
+        params, data_offset, data_size = layouts[entry["path"]]
+        if params != expected:
+            raise WavError(f"{entry['path']} has params {params}, expected {expected}")
+        entry["data_offset"] = data_offset
+        entry["data_size"] = data_size
+
+    return {
+        "nchannels": first.channels,
+        "sampwidth": first.sample_width,
+        "framerate": first.sample_rate,
+        "pages": entries,
+        "data_size": sum(e["data_size"] for e in entries),
+        "prefetched": prefetched,
+        "versions": versions,
+    }
+
+
+def plan_from_manifest(manifest: list) -> dict:
+    """
+    Same layout as `plan_wav_assembly`, computed from the stored manifest
+    with no storage calls at all.
+    """
+    first = manifest[0]
+    entries = []
+    for entry in manifest:
+        if (entry["channels"], entry["sample_width"], entry["sample_rate"]) != (
+            first["channels"], first["sample_width"], first["sample_rate"]
+        ):
+            raise WavError(f"{entry['path']} params differ from the first page")
+        entries.append({
+            "key": entry["key"],
+            "path": entry["path"],
+            "data_size": entry["frames"] * first["channels"] * first["sample_width"],
+            "data_offset": entry.get("data_offset"),
+        })
+
+    return {
+        "nchannels": first["channels"],
+        "sampwidth": first["sample_width"],
+        "framerate": first["sample_rate"],
+        "pages": entries,
+        "data_size": sum(e["data_size"] for e in entries),
+    }
+
+
+async def backfill_manifest(job: dict):
+    """
+    Record manifest entries for pages that have none yet (or whose audio
+    changed). This is the only writer of the manifest: the worker that
+    uploads page audio doesn't record it. Pages go through the disk cache,
+    so this also warms it for the next assembly.
+    """
+    job_id = job.get("job_id")
+    with _plan_cache_lock:
+        if job_id in _backfilling:
+            return
+        _backfilling.add(job_id)
+
+    paths = {path: key for key, path in missing_manifest_pages(job)}
+    versions = page_versions(job)
+    try:
+        async for path, wav_bytes in prefetch_ordered(paths, fetch=lambda p: adownload_to_bytes(p, versions.get(p))):
+            await arecord_page_manifest(job_id, paths[path], path, wav_bytes)
+    except Exception as e:
+        logger.warning("[Manifest] Backfill failed for job %s: %s", job_id, e)
+    finally:
+        with _plan_cache_lock:
+            _backfilling.discard(job_id)
+
+
+def page_versions(job: dict) -> dict:
+    """
+    {audio path: page cache version} for every page with audio.
+    """
+    versions = {}
+    for _, page in ordered_pages(job.get("pages", {})):
+        path = page_storage_path(page)
+        if path:
+            versions[path] = page_cache_version(job, page)
+    return versions
+
+
+def plan_header(plan: dict) -> bytes:
+    return wav_header(plan["nchannels"], plan["sampwidth"], plan["framerate"], plan["data_size"])
+
+
+def wav_content_length(plan: dict) -> int:
+    return len(plan_header(plan)) + plan["data_size"]
+
+
+def page_pcm(path: str, wav_bytes: bytes, expected: tuple = None) -> memoryview:
+    """
+    Zero-copy view of a page's PCM. A page that can't be parsed is logged
+    and treated as empty (fit_pcm turns it into silence) rather than
+    aborting a stream that has already started.
+    """
+    try:
+        info = parse_wav(wav_bytes)
+    except WavError as e:
+        logger.warning("[Assembly] %s is not usable PCM: %s", path, e)
+        return memoryview(b"")
+
+    params = (info.channels, info.sample_width, info.sample_rate)
+    if expected and params != expected:
+        logger.warning("[Assembly] %s has params %s, expected %s", path, params, expected)
+    return info.data
+
+
+def fit_pcm(pcm: memoryview, size: int) -> memoryview:
+    """
+    Truncate or zero-pad (silence) PCM so it matches the size we promised
+    in the header. Only the padding case copies.
+    """
+    if len(pcm) >= size:
+        return pcm[:size]
+    return memoryview(bytes(pcm) + b"\x00" * (size - len(pcm)))
+
+
+async def iter_wav_stream(plan: dict) -> AsyncIterator[bytes]:
+    """
+    Yield one WAV file: a single header up front, then each page's PCM as
+    soon as it is its turn. Following pages are prefetched concurrently,
+    bounded by AUDIO_PREFETCH_WINDOW.
+    """
+    yield plan_header(plan)
+
+    prefetched = plan.pop("prefetched", {})
+    versions = plan.get("versions") or {}
+    expected = (plan["nchannels"], plan["sampwidth"], plan["framerate"])
+
+    async def fetch(path: str) -> bytes:
+        return prefetched.pop(path, None) or await adownload_to_bytes(path, versions.get(path))
+
+    fetched = prefetch_ordered((e["path"] for e in plan["pages"]), fetch=fetch)
+    try:
+        for entry in plan["pages"]:
+            _, wav_bytes = await anext(fetched)
+            pcm = fit_pcm(page_pcm(entry["path"], wav_bytes, expected), entry["data_size"])
+            del wav_bytes
+            for start in range(0, len(pcm), STREAM_CHUNK_SIZE):
+                yield pcm[start:start + STREAM_CHUNK_SIZE]
+    finally:
+        # Cancels outstanding downloads when the client goes away early
+        await fetched.aclose()
+
+
+# ---- Byte ranges over the virtual concatenated WAV ----
+
+async def get_wav_plan(job: dict) -> dict:
+    """
+    Return the assembly plan for a job, reusing a recent one while the job's
+    page list is unchanged. Seeking fires a new request per seek, so this
+    keeps the storage listing off the hot path.
+    """
+    pages = job.get("pages", {})
+    versions = page_versions(job)
+    key = (job.get("job_id"), tuple(
+        (k, path, versions[path]) for k, path in (
+            (k, page_storage_path(p)) for k, p in ordered_pages(pages)
+        ) if path
+    ))
+    now = time.monotonic()
+
+    with _plan_cache_lock:
+        cached = _plan_cache.get(key)
+        if cached and now - cached[0] < PLAN_CACHE_TTL:
+            _plan_cache.move_to_end(key)
+            return dict(cached[1])
+
+    manifest = current_manifest(job)
+    try:
+        if manifest:
+            plan = plan_from_manifest(manifest)
+            plan["versions"] = versions
+        else:
+            plan = await plan_wav_assembly(pages, versions)
+            _spawn(backfill_manifest(job))
+    except WavError as e:
+        # Concatenating pages in different formats would corrupt the audio
+        raise HTTPException(422, f"Page audio can't be assembled: {e}")
+    shared = {k: v for k, v in plan.items() if k != "prefetched"}
+    shared["offsets"] = page_offset_table(plan)
+
+    with _plan_cache_lock:
+        _plan_cache[key] = (now, shared)
+        _plan_cache.move_to_end(key)
+        while len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+
+    plan["offsets"] = shared["offsets"]
+    return plan
+
+
+def page_offset_table(plan: dict) -> list:
+    """
+    Map every page to its [start, end) byte range in the assembled WAV.
+    """
+    offset = len(plan_header(plan))
+    table = []
+    for entry in plan["pages"]:
+        table.append({
+            "key": entry["key"],
+            "path": entry["path"],
+            "start": offset,
+            "end": offset + entry["data_size"],
+            "data_offset": entry.get("data_offset"),
+        })
+        offset += entry["data_size"]
+    return table
+
+
+def parse_range_header(range_header: str, total: int):
+    """
+    Parse a single `bytes=` range into an inclusive (start, end) pair.
+    Returns None when the header should be ignored (missing, malformed or
+    multi-range) and raises 416 when it can't be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+
+    first, last = (part.strip() for part in spec.split("-", 1))
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else total - 1
+        else:
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError
+            start = max(total - suffix, 0)
+            end = total - 1
+    except ValueError:
+        return None
+
+    if start >= total or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{total}"}
+        )
+    return start, min(end, total - 1)
+
+
+async def iter_wav_range(plan: dict, start: int, end: int) -> AsyncIterator[bytes]:
+    """
+    Yield bytes [start, end] of the assembled WAV, fetching only the pages
+    that overlap the range. A page only partly inside the range is fetched
+    with a storage byte-range request when its PCM offset is known.
+    """
+    header = plan_header(plan)
+    if start < len(header):
+        yield header[start:end + 1]
+
+    prefetched = plan.pop("prefetched", {})
+    overlapping = [
+        o for o in plan.get("offsets") or page_offset_table(plan)
+        if o["end"] > start and o["start"] <= end
+    ]
+    sizes = {e["path"]: e["data_size"] for e in plan["pages"]}
+
+    # PCM-relative [lo, hi) of each page that falls inside the range
+    spans = {}
+    partial = {}
+    for o in overlapping:
+        lo = max(start - o["start"], 0)
+        hi = min(end + 1 - o["start"], sizes[o["path"]])
+        spans[o["path"]] = (lo, hi)
+        if (lo, hi) != (0, sizes[o["path"]]) and o.get("data_offset") is not None and o["path"] not in prefetched:
+            partial[o["path"]] = (o["data_offset"] + lo, o["data_offset"] + hi - 1)
+
+    versions = plan.get("versions") or {}
+
+    async def fetch(path: str) -> bytes:
+        if path in partial:
+            return await adownload_range(path, *partial[path], versions.get(path))
+        return prefetched.pop(path, None) or await adownload_to_bytes(path, versions.get(path))
+
+    fetched = prefetch_ordered((o["path"] for o in overlapping), fetch=fetch)
+    try:
+        for offset in overlapping:
+            path, data = await anext(fetched)
+            lo, hi = spans[path]
+            if path in partial:
+                pcm = fit_pcm(memoryview(data), hi - lo)
+                lo, hi = 0, hi - lo
+            else:
+                pcm = fit_pcm(page_pcm(path, data), sizes[path])
+            del data
+            for chunk_start in range(lo, hi, STREAM_CHUNK_SIZE):
+                yield pcm[chunk_start:min(chunk_start + STREAM_CHUNK_SIZE, hi)]
+    finally:
+        await fetched.aclose()
+
+
+# ---- Assembled book artifacts ----
+
+def assembly_digest(job: dict, sizes: dict, fmt: str = "wav") -> Optional[str]:
+    """
+    Content key for an assembled book: the output format plus each page's
+    audio path, object size, duration and (when known) manifest frame
+    count. Any page being added, removed, reordered or regenerated, even in
+    place at the same path, produces a new key. `sizes` comes from
+    object_sizes; None when a page's size is unknown, since the key could
+    then miss a change.
+    """
+    manifest = {entry["key"]: entry for entry in job.get("audio_manifest") or []}
+    h = hashlib.sha256(fmt.encode())
+    for key, page in ordered_pages(job.get("pages", {})):
+        path = page_storage_path(page)
+        if not path:
+            continue
+        if path not in sizes:
+            return None
+        entry = manifest.get(key) or {}
+        frames = entry.get("frames") if entry.get("path") == path else None
+        h.update(f"\n{key}:{path}:{sizes[path]}:{page.get('duration')}:{frames}".encode())
+    return h.hexdigest()
+
+
+def artifact_path(job: dict, digest: str, fmt: str = "wav") -> str:
+    first = next(
+        path for path in (page_storage_path(page) for _, page in ordered_pages(job["pages"])) if path
+    )
+    return f"{posixpath.dirname(first)}/assembled/{digest[:32]}.{file_extension(fmt)}"
+
+
+def cached_artifact(job: dict, sizes: dict, fmt: str = "wav"):
+    record = (job.get("assembled_audio") or {}).get(fmt)
+    digest = assembly_digest(job, sizes, fmt)
+    if record and digest and record.get("hash") == digest:
+        return record
+    return None
+
+
+async def download_plan(job: dict, fmt: str = "wav"):
+    """
+    Return (plan, sizes) for a whole-book download. `sizes` are the page
+    objects' sizes (one listing per folder) that artifacts are keyed by;
+    `plan` is the assembly plan, or None when a stored artifact can serve
+    the download (directly, or as the source for encoding). Repeat
+    downloads then never touch the pages themselves.
+    """
+    sizes = await object_sizes(
+        path for path in (page_storage_path(page) for page in job.get("pages", {}).values()) if path
+    )
+    if cached_artifact(job, sizes, fmt) or cached_artifact(job, sizes, "wav"):
+        return None, sizes
+    return await get_wav_plan(job), sizes
+
+
+def _store_artifact(job: dict, local_path: str, fmt: str, digest: str, size: int):
+    job_id = job["job_id"]
+    remote_path = artifact_path(job, digest, fmt)
+    previous = (job.get("assembled_audio") or {}).get(fmt)
+    try:
+        upload_file(local_path, remote_path, media_type(fmt), upsert=True)
+        jobs_collection.update_one(
+            {"job_id": job_id},
+            {"$set": {f"assembled_audio.{fmt}": {
+                "hash": digest,
+                "path": remote_path,
+                "size": size,
+                "created_at": datetime.utcnow()
+            }}}
+        )
+        if previous and previous.get("path") and previous["path"] != remote_path:
+            delete_file(previous["path"])
+        logger.info("[Artifact] Stored %s (%d bytes) for job %s", remote_path, size, job_id)
+    except Exception as e:
+        logger.warning("[Artifact] Failed to store artifact for job %s: %s", job_id, e)
+    finally:
+        os.unlink(local_path)
+
+
+async def tee_to_artifact(chunks: AsyncIterator[bytes], job: dict, digest: str, fmt: str = "wav") -> AsyncIterator[bytes]:
+    """
+    Pass chunks through to the client while spooling them to a temp file.
+    Only a fully delivered body is uploaded as the job's artifact, keyed by
+    `digest` (see assembly_digest); an
+    aborted download just discards the spool. Chunks are written in batches
+    of ARTIFACT_WRITE_BATCH bytes from a worker thread.
+    """
+    tmp = tempfile.NamedTemporaryFile(prefix="book-", suffix=f".{file_extension(fmt)}", delete=False)
+    completed = False
+    size = 0
+    batch = bytearray()
+    try:
+        async for chunk in chunks:
+            batch += chunk
+            size += len(chunk)
+            if len(batch) >= ARTIFACT_WRITE_BATCH:
+                await asyncio.to_thread(tmp.write, bytes(batch))
+                batch.clear()
+            yield chunk
+        if batch:
+            await asyncio.to_thread(tmp.write, bytes(batch))
+        completed = True
+    finally:
+        await chunks.aclose()
+        tmp.close()
+        if completed:
+            _artifact_pool.submit(_store_artifact, job, tmp.name, fmt, digest, size)
+        else:
+            os.unlink(tmp.name)
+
+
+def download_body(job: dict, plan, sizes: dict, fmt: str = "wav"):
+    """
+    Return (chunks, content_length) for a whole-book download, streaming
+    the stored artifact when it is current and assembling (and storing) it
+    otherwise. `plan` and `sizes` come from download_plan; `plan` is None
+    whenever an artifact covers the request. Compressed formats are encoded
+    from the stored WAV when there is one; their length is only known once
+    an artifact exists. Nothing is stored while page sizes are unknown.
+    """
+    artifact = cached_artifact(job, sizes, fmt)
+    if artifact:
+        return adownload_stream(artifact["path"]), artifact["size"]
+
+    digest = assembly_digest(job, sizes, fmt)
+    if fmt == "wav":
+        total = wav_content_length(plan)
+        if total > ASSEMBLED_AUDIO_MAX_BYTES or not digest:
+            return iter_wav_stream(plan), total
+        return tee_to_artifact(iter_wav_stream(plan), job, digest), total
+
+    wav_artifact = cached_artifact(job, sizes, "wav")
+    source = adownload_stream(wav_artifact["path"]) if wav_artifact else iter_wav_stream(plan)
+    encoded = transcode_stream(source, fmt)
+    if not digest:
+        return encoded, None
+    return tee_to_artifact(encoded, job, digest, fmt), None
+
+
+async def charge_when_started(chunks: AsyncIterator[bytes], charge, refund) -> AsyncIterator[bytes]:
+    """
+    Pull the first chunk of a paid download, then await `charge()`, and
+    return the whole stream. A body that can't start fails the request
+    before anything is charged; one that fails on our side later awaits
+    `refund()`. A client that goes away mid-download stays charged.
+    """
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except BaseException:
+        await chunks.aclose()
+        raise
+
+    try:
+        await charge()
+    except BaseException:
+        await chunks.aclose()
+        raise
+
+    async def stream():
+        try:
+            if first is not None:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+        except Exception:
+            await refund()
+            raise
+        finally:
+            await chunks.aclose()
+
+    return stream()
+
+
+def discard_artifacts(job: dict):
+    """
+    Delete every stored artifact for a job and forget them on the job.
+    """
+    for record in (job.get("assembled_audio") or {}).values():
+        if record.get("path"):
+            delete_file(record["path"])
+    jobs_collection.update_one(
+        {"job_id": job["job_id"]},
+        {"$unset": {"assembled_audio": ""}}
+    )
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import tempfile
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+from core.config import TRANSCODE_MAX_CONCURRENCY
+
+logger = logging.getLogger("audio")
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Bounds concurrent ffmpeg processes across every caller in this process
+_transcode_slots = asyncio.Semaphore(TRANSCODE_MAX_CONCURRENCY)
+
+# Speech-tuned encoder settings; output is roughly a tenth of 16-bit PCM.
+FORMATS = {
+    "opus": {
+        "ext": "ogg",
+        "media_type": "audio/ogg",
+        "args": ["-c:a", "libopus", "-b:a", "32k", "-application", "voip", "-f", "ogg"],
+    },
+    "mp3": {
+        "ext": "mp3",
+        "media_type": "audio/mpeg",
+        "args": ["-c:a", "libmp3lame", "-b:a", "64k", "-f", "mp3"],
+    },
+    "aac": {
+        "ext": "aac",
+        "media_type": "audio/aac",
+        "args": ["-c:a", "aac", "-b:a", "64k", "-f", "adts"],
+    },
+}
+
+
+def validate_format(fmt: str) -> str:
+    fmt = (fmt or "wav").lower()
+    if fmt != "wav" and fmt not in FORMATS:
+        raise HTTPException(400, f"Unsupported format. Use one of: wav, {', '.join(FORMATS)}")
+    return fmt
+
+
+def ensure_transcode_capacity():
+    """
+    Refuse with 503 while every ffmpeg slot is taken, for endpoints that
+    shouldn't queue. Streams that get past this in a race wait for a slot.
+    """
+    if _transcode_slots.locked():
+        raise HTTPException(503, "Audio encoding is busy, try again shortly", headers={"Retry-After": "5"})
+
+
+def media_type(fmt: str) -> str:
+    return FORMATS[fmt]["media_type"] if fmt in FORMATS else "audio/wav"
+
+
+def file_extension(fmt: str) -> str:
+    return FORMATS[fmt]["ext"] if fmt in FORMATS else "wav"
+
+
+async def _feed(proc: asyncio.subprocess.Process, wav_chunks: AsyncIterator[bytes]):
+    """
+    Push WAV bytes into ffmpeg. `drain()` waits while the pipe is full,
+    which happens as soon as ffmpeg is itself blocked on an unread stdout:
+    a slow client therefore stalls assembly instead of buffering it.
+    """
+    try:
+        async for chunk in wav_chunks:
+            proc.stdin.write(chunk)
+            await proc.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # ffmpeg exited or was killed because the client went away
+        pass
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning("[Transcode] Source failed: %s", e)
+        proc.kill()
+    finally:
+        await wav_chunks.aclose()
+        if not proc.stdin.is_closing():
+            proc.stdin.close()
+
+
+async def transcode_stream(wav_chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[bytes]:
+    """
+    Pipe a WAV byte stream through ffmpeg and yield encoded output as it is
+    produced. Holds one of TRANSCODE_MAX_CONCURRENCY slots while running.
+    """
+    async with _transcode_slots:
+        encoded = _transcode(wav_chunks, fmt)
+        try:
+            async for data in encoded:
+                yield data
+        finally:
+            # Kills ffmpeg now if the client went away, not at GC time
+            await encoded.aclose()
+
+
+async def _transcode(wav_chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[bytes]:
+    # stderr goes to a file: an unread pipe could fill up and wedge ffmpeg
+    errors = tempfile.TemporaryFile()
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "wav", "-i", "pipe:0",
+        *FORMATS[fmt]["args"],
+        "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=errors,
+    )
+    feeder = asyncio.create_task(_feed(proc, wav_chunks))
+
+    completed = False
+    try:
+        while True:
+            data = await proc.stdout.read(READ_CHUNK_SIZE)
+            if not data:
+                break
+            yield data
+        completed = True
+    finally:
+        if not completed:
+            proc.kill()
+            feeder.cancel()
+            # wait() only returns once stdout hits EOF, and a paused reader
+            # never gets there on its own
+            await proc.stdout.read()
+        try:
+            await feeder
+        except asyncio.CancelledError:
+            pass
+        returncode = await proc.wait()
+        errors.seek(0)
+        stderr = errors.read().decode(errors="replace").strip()
+        errors.close()
+
+    if returncode != 0:
+        # Raising keeps a truncated encode from being stored as an artifact
+        raise RuntimeError(f"ffmpeg exited with {returncode}: {stderr[-500:]}")
+
+
+async def transcode_bytes(wav_bytes: bytes, fmt: str) -> bytes:
+    async def source():
+        yield wav_bytes
+
+    return b"".join([chunk async for chunk in transcode_stream(source(), fmt)])
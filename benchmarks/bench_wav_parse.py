@@ -0,0 +1,97 @@
+"""
+Compare the old `wave`-module assembly path with the zero-copy RIFF parser.
+
+Simulates assembling a book of N pages (default 300 pages of 60s, 24 kHz
+mono 16-bit, roughly what the TTS worker produces) and reports wall time
+and peak Python allocations for each path. Pages are generated once and
+reused, so the numbers reflect parsing/copying only, not I/O.
+
+    python benchmarks/bench_wav_parse.py --pages 500 --seconds 90
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils import parse_wav  # noqa: E402
+
+CHUNK = 64 * 1024
+
+
+def make_page(seconds: int, rate: int, with_list_chunk: bool) -> bytes:
+    out = io.BytesIO()
+    with wave.open(out, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(os.urandom(seconds * rate * 2))
+    data = out.getvalue()
+    if with_list_chunk:
+        # Encoders like ffmpeg add a LIST/INFO chunk before `data`
+        info = b"LIST" + (14).to_bytes(4, "little") + b"INFOISFT" + (2).to_bytes(4, "little") + b"x\x00"
+        riff_size = int.from_bytes(data[4:8], "little") + len(info)
+        data = data[:4] + riff_size.to_bytes(4, "little") + data[8:36] + info + data[36:]
+    return data
+
+
+def assemble_with_wave(pages: list) -> int:
+    sent = 0
+    for page in pages:
+        with wave.open(io.BytesIO(page), "rb") as w:
+            pcm = w.readframes(w.getnframes())
+        for start in range(0, len(pcm), CHUNK):
+            sent += len(pcm[start:start + CHUNK])
+    return sent
+
+
+def assemble_with_parser(pages: list) -> int:
+    sent = 0
+    for page in pages:
+        pcm = parse_wav(page).data
+        for start in range(0, len(pcm), CHUNK):
+            sent += len(pcm[start:start + CHUNK])
+    return sent
+
+
+def measure(label: str, fn, pages: list, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        sent = fn(pages)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn(pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mb = sent / 1e6
+    print(f"{label:<8} {best * 1000:9.1f} ms  {mb / best:9.0f} MB/s  peak alloc {peak / 1e6:8.1f} MB")
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--rate", type=int, default=24000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--list-chunk", action="store_true", help="add a LIST chunk before data")
+    args = parser.parse_args()
+
+    page = make_page(args.seconds, args.rate, args.list_chunk)
+    pages = [page] * args.pages
+    print(f"{args.pages} pages x {len(page) / 1e6:.2f} MB = {len(page) * args.pages / 1e6:.0f} MB of WAV")
+
+    a = measure("wave", assemble_with_wave, pages, args.repeat)
+    b = measure("parser", assemble_with_parser, pages, args.repeat)
+    assert a == b, "paths disagree on PCM size"
+
+
+if __name__ == "__main__":
+    main()
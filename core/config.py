@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,3 +11,94 @@ SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "reading_app")
 MAX_UPLOAD_SIZE = 50 * 1024 * 1024
 MAX_PAGES = 500
 MAX_PAGES_PER_JOB = 20
+
+# Uploads are copied to a temp file in chunks (never held whole in memory)
+UPLOAD_READ_CHUNK_SIZE = int(os.getenv("UPLOAD_READ_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+# Lifetime of a direct-to-storage upload slot (POST /upload/init)
+DIRECT_UPLOAD_TTL = int(os.getenv("DIRECT_UPLOAD_TTL", "3600"))
+
+# Process pool for PyMuPDF parsing in the API (off the event loop)
+PDF_POOL_WORKERS = int(os.getenv("PDF_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_POOL_MAX_QUEUE = int(os.getenv("PDF_POOL_MAX_QUEUE", "16"))
+# Concurrent uploads when splitting a PDF into per-page objects
+PAGE_SPLIT_UPLOAD_WORKERS = int(os.getenv("PAGE_SPLIT_UPLOAD_WORKERS", "8"))
+# Newest page task format the deployed workers accept: 1 = (job_id, pdf,
+# page) only, 2 = split page PDFs, 3 = extracted text (see
+# page_text.plan_page_tasks). Raise it only once every worker is upgraded
+PAGE_TASK_VERSION = int(os.getenv("PAGE_TASK_VERSION", "1"))
+
+# Extracted page text is shared by content hash and dropped this long
+# after a job last used it
+PAGE_TEXT_TTL_DAYS = int(os.getenv("PAGE_TEXT_TTL_DAYS", "30"))
+# Rough end-to-end TTS throughput, for ETAs from a job's text volume
+ESTIMATE_CHARS_PER_SECOND = float(os.getenv("ESTIMATE_CHARS_PER_SECOND", "50"))
+
+# Page audio prefetch during whole-book assembly
+AUDIO_PREFETCH_WINDOW = int(os.getenv("AUDIO_PREFETCH_WINDOW", "4"))
+AUDIO_PREFETCH_WORKERS = int(os.getenv("AUDIO_PREFETCH_WORKERS", "16"))
+
+# ffmpeg processes per API process; free endpoints answer 503 beyond it
+TRANSCODE_MAX_CONCURRENCY = int(os.getenv("TRANSCODE_MAX_CONCURRENCY", str(os.cpu_count() or 2)))
+
+# Assembled whole-book audio kept in storage for repeat downloads
+ASSEMBLED_AUDIO_MAX_BYTES = int(os.getenv("ASSEMBLED_AUDIO_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Local disk cache in front of storage downloads (0 bytes disables it)
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "audio-book-page-cache"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+PAGE_CACHE_MAX_AGE = int(os.getenv("PAGE_CACHE_MAX_AGE", str(24 * 3600)))
+
+# Storage HTTP transport (one sync and one async pool per process)
+STORAGE_MAX_CONNECTIONS = int(os.getenv("STORAGE_MAX_CONNECTIONS", "64"))
+STORAGE_MAX_KEEPALIVE = int(os.getenv("STORAGE_MAX_KEEPALIVE", "32"))
+STORAGE_KEEPALIVE_EXPIRY = float(os.getenv("STORAGE_KEEPALIVE_EXPIRY", "60"))
+STORAGE_HTTP2 = os.getenv("STORAGE_HTTP2", "true").lower() in ("1", "true", "yes")
+STORAGE_CONNECT_TIMEOUT = float(os.getenv("STORAGE_CONNECT_TIMEOUT", "5"))
+STORAGE_READ_TIMEOUT = float(os.getenv("STORAGE_READ_TIMEOUT", "60"))
+STORAGE_POOL_TIMEOUT = float(os.getenv("STORAGE_POOL_TIMEOUT", "10"))
+STORAGE_RETRIES = int(os.getenv("STORAGE_RETRIES", "3"))
+STORAGE_RETRY_BACKOFF = float(os.getenv("STORAGE_RETRY_BACKOFF", "0.2"))
+STORAGE_RETRY_BACKOFF_MAX = float(os.getenv("STORAGE_RETRY_BACKOFF_MAX", "5"))
+
+# Storage circuit breaker: opens when at least MIN_CALLS of the last WINDOW
+# calls were recorded and FAILURE_RATE of them errored or took over SLOW_MS
+STORAGE_BREAKER_WINDOW = int(os.getenv("STORAGE_BREAKER_WINDOW", "50"))
+STORAGE_BREAKER_MIN_CALLS = int(os.getenv("STORAGE_BREAKER_MIN_CALLS", "10"))
+STORAGE_BREAKER_FAILURE_RATE = float(os.getenv("STORAGE_BREAKER_FAILURE_RATE", "0.5"))
+STORAGE_BREAKER_SLOW_MS = float(os.getenv("STORAGE_BREAKER_SLOW_MS", "10000"))
+STORAGE_BREAKER_COOLDOWN = float(os.getenv("STORAGE_BREAKER_COOLDOWN", "30"))
+STORAGE_BREAKER_HALF_OPEN_CALLS = int(os.getenv("STORAGE_BREAKER_HALF_OPEN_CALLS", "3"))
+
+# Bulk signed-URL generation for playlists
+SIGNED_URL_BATCH_SIZE = int(os.getenv("SIGNED_URL_BATCH_SIZE", "100"))
+SIGNED_URL_FALLBACK_WORKERS = int(os.getenv("SIGNED_URL_FALLBACK_WORKERS", "8"))
+
+# Signed URLs are reused from Redis while at least this fraction of their
+# TTL is left (1 disables the cache)
+SIGNED_URL_CACHE_MIN_REMAINING = float(os.getenv("SIGNED_URL_CACHE_MIN_REMAINING", "0.5"))
+
+# Playlist URL signing: "storage" asks Supabase to sign each object, "api"
+# mints HMAC-signed /media URLs locally (no network calls per page)
+SIGNED_URL_MODE = os.getenv("SIGNED_URL_MODE", "storage")
+MEDIA_URL_SECRET = os.getenv("MEDIA_URL_SECRET", JWT_SECRET)
+# Public origin of this API, prefixed to /media URLs (empty = relative)
+API_PUBLIC_URL = os.getenv("API_PUBLIC_URL", "").rstrip("/")
+# "stream" serves the object from the API, "redirect" sends a storage URL
+MEDIA_DELIVERY = os.getenv("MEDIA_DELIVERY", "stream")
+
+# Object storage backend: "supabase", "local" or "s3"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", os.path.join(tempfile.gettempdir(), "audio-book-storage"))
+S3_BUCKET = os.getenv("S3_BUCKET", SUPABASE_BUCKET)
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+S3_REGION = os.getenv("S3_REGION")
+
+# Uploads above this size use the backend's chunked/resumable path
+RESUMABLE_UPLOAD_THRESHOLD = int(os.getenv("RESUMABLE_UPLOAD_THRESHOLD", str(6 * 1024 * 1024)))
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", "5"))
+
+# Bulk deletes: objects per remove call (Supabase caps it at 1000) and
+# how many remove calls run at once
+DELETE_BATCH_SIZE = int(os.getenv("DELETE_BATCH_SIZE", "1000"))
+STORAGE_DELETE_WORKERS = int(os.getenv("STORAGE_DELETE_WORKERS", "4"))
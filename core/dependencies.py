@@ -2,14 +2,14 @@ from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 import os
-from mongo import users_collection
+from mongo import users_collection, async_users_collection
 
 JWT_SECRET = os.getenv("JWT_SECRET", "token-secret-change-me")
 JWT_ALGO = "HS256"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+def _token_email(token: str) -> str:
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
         email = payload.get("sub")
@@ -17,9 +17,25 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
             raise HTTPException(401, "Invalid token")
     except JWTError:
         raise HTTPException(401, "Invalid token")
+    return email
+
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    email = _token_email(token)
 
     user = users_collection.find_one({"email": email})
     if not user:
         raise HTTPException(401, "User not found")
 
     return user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme)):
+    """
+    Same as get_current_user, for async handlers: no threadpool hop.
+    """
+    email = _token_email(token)
+
+    user = await async_users_collection.find_one({"email": email})
+    if not user:
+        raise HTTPException(401, "User not found")
+
+    return user
@@ -2,8 +2,11 @@ import os
 import hashlib
 import hmac
 import base64
+import time
 from datetime import datetime, timedelta
+from urllib.parse import quote
 from jose import jwt
+from core.config import API_PUBLIC_URL, MEDIA_URL_SECRET
 
 JWT_SECRET = os.getenv("JWT_SECRET", "token-secret-change-me")
 JWT_ALGO = "HS256"
@@ -66,3 +69,42 @@ def create_refresh_token(email: str) -> str:
 
 def hash_refresh_token(token: str) -> str:
     return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _media_signature(path: str, expires_at: int, method: str = "GET", version: str = None) -> str:
+    # Upload URLs sign the method too, so a download link can't be replayed as one
+    message = f"{path}\n{expires_at}" if method == "GET" else f"{method}\n{path}\n{expires_at}"
+    if version is not None:
+        message += f"\n{version}"
+    digest = hmac.new(
+        MEDIA_URL_SECRET.encode("utf-8"),
+        message.encode("utf-8"),
+        hashlib.sha256
+    ).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+
+def media_url(path: str, expires_at: int, version: str = None) -> str:
+    """
+    Short-lived URL for a storage object, served by GET /media/{path}.
+    A `version` is signed in and lets /media use the page cache.
+    """
+    sig = _media_signature(path, expires_at, version=version)
+    url = f"{API_PUBLIC_URL}/media/{quote(path)}?expires={expires_at}&sig={sig}"
+    if version is not None:
+        url += f"&v={quote(version)}"
+    return url
+
+
+def media_upload_url(path: str, expires_at: int) -> str:
+    """
+    Short-lived URL to create a storage object, accepted by PUT /media/{path}.
+    """
+    sig = _media_signature(path, expires_at, "PUT")
+    return f"{API_PUBLIC_URL}/media/{quote(path)}?expires={expires_at}&sig={sig}"
+
+
+def verify_media_signature(path: str, expires_at: int, sig: str, method: str = "GET", version: str = None) -> bool:
+    if expires_at < time.time():
+        return False
+    return hmac.compare_digest(_media_signature(path, expires_at, method, version), sig or "")
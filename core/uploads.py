@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import AsyncIterator
+
+from fastapi import HTTPException, Request, UploadFile
+from core.config import UPLOAD_READ_CHUNK_SIZE, UPLOAD_SPOOL_DIR
+
+PDF_MAGIC = b"%PDF"
+
+
+class SpooledUpload:
+    """
+    An upload copied to a named temp file, with its size and SHA-256.
+    The file is deleted on close(); use as a context manager.
+    """
+
+    def __init__(self, file, size: int, sha256: str):
+        self.file = file
+        self.size = size
+        self.sha256 = sha256
+
+    @property
+    def path(self) -> str:
+        return self.file.name
+
+    def open(self):
+        """
+        The spooled content rewound to the start.
+        """
+        self.file.seek(0)
+        return self.file
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        try:
+            os.unlink(self.file.name)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def _upload_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(UPLOAD_READ_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def spool_upload(file: UploadFile, max_size: int = None, require_pdf: bool = False) -> SpooledUpload:
+    """
+    Copy a form upload to disk in UPLOAD_READ_CHUNK_SIZE chunks (see
+    spool_stream).
+    """
+    # Starlette knows the part's size once the form is parsed
+    if max_size is not None and (getattr(file, "size", None) or 0) > max_size:
+        raise HTTPException(400, "File too large")
+    return await spool_stream(_upload_chunks(file), max_size, require_pdf)
+
+
+async def spool_request(request: Request, max_size: int = None, require_pdf: bool = False) -> SpooledUpload:
+    """
+    Copy a raw request body to disk as it arrives (see spool_stream). A
+    declared Content-Length over `max_size` is rejected before reading.
+    """
+    if max_size is not None:
+        try:
+            declared = int(request.headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPException(400, "Invalid Content-Length")
+        if declared > max_size:
+            raise HTTPException(400, "File too large")
+    return await spool_stream(request.stream(), max_size, require_pdf)
+
+
+async def spool_stream(chunks: AsyncIterator[bytes], max_size: int = None, require_pdf: bool = False) -> SpooledUpload:
+    """
+    Copy a byte stream to a temp file, hashing as it goes. Rejects it as
+    soon as it crosses `max_size`, or (with `require_pdf`) as soon as its
+    first bytes aren't the PDF signature, without reading the rest.
+    """
+    digest = hashlib.sha256()
+    tmp = tempfile.NamedTemporaryFile(prefix="upload-", dir=UPLOAD_SPOOL_DIR, delete=False)
+    upload = SpooledUpload(tmp, 0, "")
+    try:
+        head = b""
+        async for chunk in chunks:
+            if require_pdf and len(head) < len(PDF_MAGIC):
+                head += bytes(chunk[:len(PDF_MAGIC) - len(head)])
+                if not PDF_MAGIC.startswith(head):
+                    raise HTTPException(400, "Invalid PDF file")
+            upload.size += len(chunk)
+            if max_size is not None and upload.size > max_size:
+                raise HTTPException(400, "File too large")
+            digest.update(chunk)
+            await asyncio.to_thread(tmp.write, chunk)
+
+        if require_pdf and head != PDF_MAGIC:
+            raise HTTPException(400, "Invalid PDF file")
+        await asyncio.to_thread(tmp.flush)
+    except BaseException:
+        upload.close()
+        raise
+    finally:
+        if hasattr(chunks, "aclose"):
+            await chunks.aclose()
+
+    upload.sha256 = digest.hexdigest()
+    return upload
@@ -1,6 +1,6 @@
 from datetime import datetime, date
 from fastapi import HTTPException
-from mongo import users_collection
+from mongo import users_collection, async_users_collection
 
 
 UPLOAD_COST = 10
@@ -32,6 +32,16 @@ def deduct_credits_atomic(user_id, amount):
         raise HTTPException(403, "Insufficient credits")
 
 
+async def deduct_credits_atomic_async(user_id, amount):
+    result = await async_users_collection.update_one(
+        {"_id": user_id, "credits": {"$gte": amount}},
+        {"$inc": {"credits": -amount}}
+    )
+
+    if result.modified_count == 0:
+        raise HTTPException(403, "Insufficient credits")
+
+
 def add_credits(user_id: str, amount: int):
     users_collection.update_one(
         {"_id": user_id},
@@ -0,0 +1,188 @@
+import fcntl
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Optional
+
+_HEADER = struct.Struct("<4sd")  # magic + created_at
+_MAGIC = b"DC01"
+RESCAN_EVERY_PUTS = 64
+
+
+class DiskCache:
+    """
+    Read-through byte cache on local disk, shared by every worker process on
+    the host.
+
+    Entries are written to a temp file and renamed into place, so readers
+    never see partial data. The file mtime is the last-use time (touched on
+    every hit) and eviction removes least-recently-used files until the
+    directory is back under budget. Eviction runs under an flock so two
+    workers don't evict concurrently; counters are per process.
+
+    A key can hold several versions side by side (each its own file, named
+    after the key's digest); invalidate() drops every one of them.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_age: int = 0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.enabled = max_bytes > 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+        self._lock = threading.Lock()
+        self._approx_size = None
+        self._puts_since_scan = 0
+
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    def _entry_path(self, key: str, version: str = None) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        name = digest if version is None else f"{digest}.{hashlib.sha256(version.encode()).hexdigest()[:16]}"
+        return os.path.join(self.directory, digest[:2], name)
+
+    def get(self, key: str, version: str = None) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+
+        path = self._entry_path(key, version)
+        try:
+            with open(path, "rb") as f:
+                magic, created_at = _HEADER.unpack(f.read(_HEADER.size))
+                data = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, struct.error):
+            self.errors += 1
+            self.misses += 1
+            self._remove(path)
+            return None
+
+        if magic != _MAGIC or (self.max_age and time.time() - created_at > self.max_age):
+            self.misses += 1
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes, version: str = None):
+        if not self.enabled or len(data) > self.max_bytes // 4:
+            return
+
+        path = self._entry_path(key, version)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(_HEADER.pack(_MAGIC, time.time()))
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                self._remove(tmp_path)
+                raise
+        except OSError:
+            self.errors += 1
+            return
+
+        with self._lock:
+            if self._approx_size is not None:
+                self._approx_size += len(data) + _HEADER.size
+            self._puts_since_scan += 1
+            needs_scan = (
+                self._approx_size is None
+                or self._approx_size > self.max_bytes
+                or self._puts_since_scan >= RESCAN_EVERY_PUTS
+            )
+        if needs_scan:
+            self.evict()
+
+    def invalidate(self, key: str):
+        """
+        Drop the key and every version of it.
+        """
+        if not self.enabled:
+            return
+        path = self._entry_path(key)
+        name = os.path.basename(path)
+        try:
+            entries = list(os.scandir(os.path.dirname(path)))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name == name or entry.name.startswith(name + "."):
+                self._remove(entry.path)
+
+    def evict(self):
+        """
+        Drop least-recently-used entries until the cache fits 90% of budget.
+        """
+        lock_path = os.path.join(self.directory, ".evict.lock")
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                entries = []
+                total = 0
+                for shard in os.scandir(self.directory):
+                    if not shard.is_dir():
+                        continue
+                    for entry in os.scandir(shard.path):
+                        if entry.name.startswith(".tmp-"):
+                            continue
+                        try:
+                            st = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+                        total += st.st_size
+
+                if total > self.max_bytes:
+                    target = int(self.max_bytes * 0.9)
+                    entries.sort()
+                    for _, size, path in entries:
+                        if total <= target:
+                            break
+                        if self._remove(path):
+                            total -= size
+                            self.evictions += 1
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        with self._lock:
+            self._approx_size = total
+            self._puts_since_scan = 0
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "approx_bytes": self._approx_size,
+            "max_bytes": self.max_bytes,
+        }
@@ -1,6 +1,11 @@
 from fastapi import APIRouter
 from datetime import datetime
 from mongo import client
+from supabase_client import page_cache, signed_url_cache
+from pdf_utils import pdf_pool
+from storage.breaker import OPEN, storage_breaker
+from storage.metrics import storage_metrics
+from storage.service import get_storage
 
 router = APIRouter(prefix="/health", tags=["Health"])
 
@@ -38,8 +43,31 @@ def readiness_check():
     except Exception:
         mongo_ok = False
 
+    # --- Storage circuit breaker (no network call) ---
+    storage = storage_breaker.snapshot()
+    storage_ok = storage["state"] != OPEN
+
     return {
-        "ready": mongo_ok,
+        "ready": mongo_ok and storage_ok,
         "mongo": mongo_ok,
+        "storage": storage,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+# ------------------------------------
+# 3️⃣ RUNTIME METRICS
+# ------------------------------------
+@router.get("/metrics")
+def runtime_metrics():
+    """
+    Per-process cache, storage transport and PDF pool counters for capacity tuning.
+    """
+    return {
+        "storage_backend": get_storage().name,
+        "page_cache": page_cache.stats(),
+        "signed_url_cache": signed_url_cache.stats(),
+        "storage": storage_metrics.snapshot(),
+        "pdf_pool": pdf_pool.stats(),
         "timestamp": datetime.utcnow().isoformat()
     }
@@ -1,26 +1,41 @@
+import asyncio
 import uuid
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Query, Request, UploadFile, File, HTTPException, Depends, Form
 
 from core.rate_limiter import rate_limit
-from core.dependencies import get_current_user
+from core.dependencies import get_current_user, get_current_user_async
 from credits.service import  (
     UPLOAD_COST,
     add_credits,
-    deduct_credits_atomic,
+    deduct_credits_atomic_async,
     PAGE_COST
 )
-from supabase_client import delete_file, upload_bytes
-from pdf_utils import get_num_pages_from_bytes
-from mongo import jobs_collection
+from core.uploads import PDF_MAGIC, spool_request, spool_stream, spool_upload
+from pdf_store import LocalPdf, acquire_pdf, adopt_pdf, pdf_page_count, release_job_pdf, release_pdf
+from page_text import ensure_text_index, estimate, plan_page_tasks
+from mongo import (
+    async_jobs_collection,
+    async_pending_uploads_collection,
+    jobs_collection,
+    pending_uploads_collection
+)
+from supabase_client import adownload_range, adownload_stream, aobject_size, create_signed_upload, delete_file
+from storage.base import ObjectNotFound
+from audio.service import discard_artifacts
 from celery import Celery
-from core.config import MAX_PAGES_PER_JOB, MAX_UPLOAD_SIZE, MAX_PAGES
+from core.config import DIRECT_UPLOAD_TTL, MAX_PAGES_PER_JOB, MAX_UPLOAD_SIZE, MAX_PAGES
 import os
 from dotenv import load_dotenv
 from pydantic import BaseModel
 
 class UpdateJobRequest(BaseModel):
     title: str
+
+class UploadInitRequest(BaseModel):
+    title: str
+    file_name: str
+    size: int | None = None
 # -----------------------------
 # Utilities for TTS sync
 # -----------------------------
@@ -35,57 +50,47 @@ celery = Celery("worker")
 celery.config_from_object("celeryconfig")
 
 
-@router.post("/upload")
-async def upload_pdf(
-    request: Request,
-    title: str = Form(...),
-    file: UploadFile = File(...),
-    user=Depends(get_current_user)
-):
-    rate_limit(
+def _content_type(request: Request) -> str:
+    return (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+
+
+async def _check_upload_rate(request: Request, user):
+    await asyncio.to_thread(
+        rate_limit,
         key=f"upload:{user['_id']}:{request.client.host}",
         limit=3,
         window_seconds=60
     )
-    if not file.filename.lower().endswith(".pdf"):
-        raise HTTPException(400, "Only PDF allowed")
-
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Only PDF allowed")
-
-    pdf_bytes = await file.read()
 
-    if not pdf_bytes.startswith(b"%PDF"):
-        raise HTTPException(400, "Invalid PDF file")
-
-    if len(pdf_bytes) > MAX_UPLOAD_SIZE:
-        raise HTTPException(400, "File too large")
 
+async def _create_job(user, title: str, file_name: str, upload) -> dict:
+    """
+    Charge the upload and create a job for a spooled PDF.
+    """
     job_id = str(uuid.uuid4())
     created_at = datetime.utcnow()
     expires_at = created_at + timedelta(days=5)
 
     folder = f"{created_at.strftime('%Y%m%d')}_{job_id}"
-    remote_pdf = f"pdfs/{folder}/original.pdf"
-
-    original_file_name = file.filename
 
-    
-    pages = get_num_pages_from_bytes(pdf_bytes)
+    pages = await pdf_page_count(upload)
     if pages > MAX_PAGES:
         raise HTTPException(400, "Page limit exceeded")
 
-    deduct_credits_atomic(user["_id"], UPLOAD_COST)
+    await deduct_credits_atomic_async(user["_id"], UPLOAD_COST)
 
+    blob = None
     try:
-        upload_bytes(remote_pdf, pdf_bytes, "application/pdf")
-        jobs_collection.insert_one({
+        # Identical content is stored once and shared between jobs
+        blob = await asyncio.to_thread(acquire_pdf, upload, pages)
+        await async_jobs_collection.insert_one({
             "job_id": job_id,
             "user_id": str(user["_id"]),
             "email": user["email"],
             "title": title,
-            "file_name": original_file_name,
-            "remote_pdf_path": remote_pdf,
+            "file_name": file_name,
+            "remote_pdf_path": blob["path"],
+            "pdf_sha256": upload.sha256,
             "folder_name": folder,
             "num_pages": pages,
             "digits": len(str(pages)),
@@ -94,19 +99,233 @@ async def upload_pdf(
             "status": "uploaded"
         })
     except Exception:
-        add_credits(user["_id"], UPLOAD_COST)
+        if blob:
+            await asyncio.to_thread(release_pdf, upload.sha256)
+        await asyncio.to_thread(add_credits, user["_id"], UPLOAD_COST)
         raise
 
-
-
     return {
         "job_id": job_id,
         "pages": pages,
         "title": title,
-        "file_name": original_file_name,
+        "file_name": file_name,
         "expires_at": expires_at
     }
 
+
+@router.post("/upload")
+async def upload_pdf(
+    request: Request,
+    title: str = Form(...),
+    file: UploadFile = File(...),
+    user=Depends(get_current_user_async)
+):
+    # Everything blocking below runs in threads, async clients or the PDF
+    # process pool, so a big upload never stalls the event loop
+    await _check_upload_rate(request, user)
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(400, "Only PDF allowed")
+
+    if file.content_type != "application/pdf":
+        raise HTTPException(400, "Only PDF allowed")
+
+    # Spooled to a temp file; size and %PDF checks happen while reading
+    with await spool_upload(file, MAX_UPLOAD_SIZE, require_pdf=True) as upload:
+        return await _create_job(user, title, file.filename, upload)
+
+
+@router.post("/upload/raw")
+async def upload_raw_pdf(
+    request: Request,
+    title: str = Query(...),
+    file_name: str = Query(...),
+    user=Depends(get_current_user_async)
+):
+    """
+    Same as /upload with the PDF as the request body (Content-Type:
+    application/pdf) instead of a multipart form. The body is spooled as it
+    arrives, so oversized or non-PDF uploads are refused before or while
+    reading, with no multipart parse in between.
+    """
+    await _check_upload_rate(request, user)
+    if not file_name.lower().endswith(".pdf"):
+        raise HTTPException(400, "Only PDF allowed")
+
+    if _content_type(request) != "application/pdf":
+        raise HTTPException(400, "Only PDF allowed")
+
+    with await spool_request(request, MAX_UPLOAD_SIZE, require_pdf=True) as upload:
+        return await _create_job(user, title, file_name, upload)
+
+
+# -----------------------------
+# Direct-to-storage uploads: the PDF bytes never pass through the API
+# -----------------------------
+@router.post("/upload/init")
+async def init_direct_upload(
+    request: Request,
+    payload: UploadInitRequest,
+    user=Depends(get_current_user_async)
+):
+    """
+    Step 1: reserve a job and return a signed URL the client uploads the
+    PDF to. Nothing is charged until finalize.
+    """
+    await asyncio.to_thread(
+        rate_limit,
+        key=f"upload:{user['_id']}:{request.client.host}",
+        limit=3,
+        window_seconds=60
+    )
+    if not payload.file_name.lower().endswith(".pdf"):
+        raise HTTPException(400, "Only PDF allowed")
+
+    if payload.size is not None and payload.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(400, "File too large")
+
+    job_id = str(uuid.uuid4())
+    created_at = datetime.utcnow()
+    folder = f"{created_at.strftime('%Y%m%d')}_{job_id}"
+    remote_pdf = f"pdfs/{folder}/original.pdf"
+
+    upload = await asyncio.to_thread(create_signed_upload, remote_pdf, DIRECT_UPLOAD_TTL, "application/pdf")
+    expires_at = created_at + timedelta(seconds=DIRECT_UPLOAD_TTL)
+
+    await async_pending_uploads_collection.insert_one({
+        "_id": job_id,
+        "user_id": str(user["_id"]),
+        "title": payload.title,
+        "file_name": payload.file_name,
+        "folder_name": folder,
+        "remote_pdf_path": remote_pdf,
+        "status": "pending",
+        "created_at": created_at,
+        "expires_at": expires_at
+    })
+
+    return {
+        "job_id": job_id,
+        "upload": upload,
+        "expires_at": expires_at
+    }
+
+
+async def _reopen_pending(job_id: str):
+    # Transient failure: the client may call finalize again
+    await async_pending_uploads_collection.update_one({"_id": job_id}, {"$set": {"status": "pending"}})
+
+
+async def _reject_pending(job_id: str, remote_pdf: str = None):
+    # Invalid upload: drop the object and the slot; the client starts over
+    if remote_pdf:
+        await asyncio.to_thread(delete_file, remote_pdf)
+    await async_pending_uploads_collection.delete_one({"_id": job_id})
+
+
+@router.post("/upload/{job_id}/finalize")
+async def finalize_direct_upload(
+    job_id: str,
+    user=Depends(get_current_user_async)
+):
+    """
+    Step 2, after the client's upload: validate the object in storage,
+    then charge credits and create the job as /upload does.
+    """
+    # Expired slots are left to cleanup_expired_files, which may already be
+    # deleting the object
+    pending = await async_pending_uploads_collection.find_one_and_update(
+        {
+            "_id": job_id,
+            "user_id": str(user["_id"]),
+            "status": "pending",
+            "expires_at": {"$gt": datetime.utcnow()}
+        },
+        {"$set": {"status": "finalizing"}}
+    )
+    if not pending:
+        if await async_pending_uploads_collection.find_one({"_id": job_id, "user_id": str(user["_id"]), "status": "pending"}):
+            raise HTTPException(410, "Upload link expired")
+        raise HTTPException(404, "Upload not found")
+
+    remote_pdf = pending["remote_pdf_path"]
+
+    # 1. Size and signature from metadata and a ranged read, before
+    # pulling the whole file
+    try:
+        size = await aobject_size(remote_pdf)
+        if size > MAX_UPLOAD_SIZE:
+            raise HTTPException(400, "File too large")
+        if await adownload_range(remote_pdf, 0, len(PDF_MAGIC) - 1) != PDF_MAGIC:
+            raise HTTPException(400, "Invalid PDF file")
+        upload = await spool_stream(adownload_stream(remote_pdf), MAX_UPLOAD_SIZE, require_pdf=True)
+    except ObjectNotFound:
+        await _reopen_pending(job_id)
+        raise HTTPException(400, "File has not been uploaded yet")
+    except HTTPException:
+        await _reject_pending(job_id, remote_pdf)
+        raise
+    except Exception:
+        await _reopen_pending(job_id)
+        raise
+
+    with upload:
+        # 2. Page count (process pool) and page limit
+        try:
+            pages = await pdf_page_count(upload)
+            if pages > MAX_PAGES:
+                raise HTTPException(400, "Page limit exceeded")
+        except HTTPException as e:
+            if e.status_code == 400:
+                await _reject_pending(job_id, remote_pdf)
+            else:
+                await _reopen_pending(job_id)
+            raise
+
+        # 3. Charge and create the job; the uploaded object becomes the
+        # stored copy of this content unless an identical one exists
+        try:
+            await deduct_credits_atomic_async(user["_id"], UPLOAD_COST)
+        except HTTPException:
+            await _reopen_pending(job_id)
+            raise
+
+        blob = None
+        try:
+            blob = await asyncio.to_thread(adopt_pdf, remote_pdf, upload.sha256, upload.size, pages)
+            created_at = datetime.utcnow()
+            await async_jobs_collection.insert_one({
+                "job_id": job_id,
+                "user_id": str(user["_id"]),
+                "email": user["email"],
+                "title": pending["title"],
+                "file_name": pending["file_name"],
+                "remote_pdf_path": blob["path"],
+                "pdf_sha256": upload.sha256,
+                "folder_name": pending["folder_name"],
+                "num_pages": pages,
+                "digits": len(str(pages)),
+                "created_at": created_at,
+                "expires_at": created_at + timedelta(days=5),
+                "status": "uploaded",
+                "direct_upload": True
+            })
+        except Exception:
+            if blob:
+                await asyncio.to_thread(release_pdf, upload.sha256)
+            await asyncio.to_thread(add_credits, user["_id"], UPLOAD_COST)
+            await _reject_pending(job_id, None if blob else remote_pdf)
+            raise
+
+    await async_pending_uploads_collection.delete_one({"_id": job_id})
+
+    return {
+        "job_id": job_id,
+        "pages": pages,
+        "title": pending["title"],
+        "file_name": pending["file_name"],
+        "expires_at": created_at + timedelta(days=5)
+    }
+
 @router.get("/job/{job_id}")
 async def get_job(
     job_id: str,
@@ -128,14 +347,42 @@ async def get_job(
         "created_at": job["created_at"],
     }
 
+@router.get("/job/{job_id}/estimate")
+async def estimate_job(
+    job_id: str,
+    start: int = 1,
+    end: int | None = None,
+    user=Depends(get_current_user_async)
+):
+    """
+    Credits and rough processing time for a page range, from the job's
+    extracted text (indexed on first request).
+    """
+    job = await async_jobs_collection.find_one({
+        "job_id": job_id,
+        "user_id": str(user["_id"])
+    })
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    end = end or job["num_pages"]
+    if start < 1 or end > job["num_pages"] or start > end:
+        raise HTTPException(400, "Invalid page range")
+
+    with LocalPdf(job["remote_pdf_path"]) as local:
+        index = await ensure_text_index(job, local)
+
+    return {"job_id": job_id, "start": start, "end": end, **estimate(index, list(range(start, end + 1)))}
+
 @router.post("/job/{job_id}/reupload")
 async def reupload_pdf(
     request: Request,
     job_id: str,
     file: UploadFile = File(...),
-    user=Depends(get_current_user)
+    user=Depends(get_current_user_async)
 ):
-    rate_limit(
+    await asyncio.to_thread(
+        rate_limit,
         key=f"upload:{user['_id']}:{request.client.host}",
         limit=2,
         window_seconds=60
@@ -148,16 +395,8 @@ async def reupload_pdf(
     if file.content_type != "application/pdf":
         raise HTTPException(400, "Only PDF allowed")
 
-    pdf_bytes = await file.read()
-
-    if not pdf_bytes.startswith(b"%PDF"):
-        raise HTTPException(400, "Invalid PDF file")
-
-    if len(pdf_bytes) > MAX_UPLOAD_SIZE:
-        raise HTTPException(400, "File too large")
-
-    # 2. Find job (ownership check)
-    job = jobs_collection.find_one({
+    # 2. Find job (ownership check) before reading the body
+    job = await async_jobs_collection.find_one({
         "job_id": job_id,
         "user_id": str(user["_id"])
     })
@@ -165,31 +404,44 @@ async def reupload_pdf(
     if not job:
         raise HTTPException(404, "Job not found")
 
-    # 3. Upload to SAME folder & SAME path
-    pages = get_num_pages_from_bytes(pdf_bytes)
+    # 3. Point the job at the new content (stored once per hash)
+    with await spool_upload(file, MAX_UPLOAD_SIZE, require_pdf=True) as upload:
+        pages = await pdf_page_count(upload)
 
-    if pages > MAX_PAGES:
-        raise HTTPException(400, "Page limit exceeded")
-    
-    remote_pdf = job["remote_pdf_path"]
-    deduct_credits_atomic(user["_id"], UPLOAD_COST)
+        if pages > MAX_PAGES:
+            raise HTTPException(400, "Page limit exceeded")
 
-    try:
-        upload_bytes(remote_pdf, pdf_bytes, "application/pdf")
-        jobs_collection.update_one(
-            {"job_id": job_id},
-            {"$set": {
-                "file_name": file.filename,
-                "num_pages": pages,
-                "digits": len(str(pages)),
-                "updated_at": datetime.utcnow(),
-                "reuploaded": True,
-                "status": "uploaded"
-            }}
-        )
-    except Exception:
-        add_credits(user["_id"], UPLOAD_COST)
-        raise
+        await deduct_credits_atomic_async(user["_id"], UPLOAD_COST)
+
+        blob = None
+        try:
+            blob = await asyncio.to_thread(acquire_pdf, upload, pages)
+            await async_jobs_collection.update_one(
+                {"job_id": job_id},
+                {"$set": {
+                    "remote_pdf_path": blob["path"],
+                    "pdf_sha256": upload.sha256,
+                    "pdf_released": False,
+                    "file_name": file.filename,
+                    "num_pages": pages,
+                    "digits": len(str(pages)),
+                    "updated_at": datetime.utcnow(),
+                    "reuploaded": True,
+                    "status": "uploaded"
+                },
+                "$inc": {"audio_generation": 1}}
+            )
+        except Exception:
+            if blob:
+                await asyncio.to_thread(release_pdf, upload.sha256)
+            await asyncio.to_thread(add_credits, user["_id"], UPLOAD_COST)
+            raise
+
+    # 4. Drop the job's reference to the old PDF; previously assembled
+    # audio no longer matches the new one
+    if not job.get("pdf_released"):
+        await asyncio.to_thread(release_job_pdf, job)
+    await asyncio.to_thread(discard_artifacts, job)
 
 
 
@@ -220,18 +472,19 @@ async def update_job(
     return {"message": "Job updated successfully"}
 
 @router.post("/start")
-def start_job(
+async def start_job(
     job_id: str,
     start: int = 1,
     end: int | None = None,
-    user=Depends(get_current_user)
+    user=Depends(get_current_user_async)
 ):
-    rate_limit(
+    await asyncio.to_thread(
+        rate_limit,
         key=f"start:{user['_id']}",
         limit=5,
         window_seconds=3600
     )
-    job = jobs_collection.find_one_and_update(
+    job = await async_jobs_collection.find_one_and_update(
         {
             "job_id": job_id,
             "user_id": str(user["_id"]),
@@ -241,7 +494,9 @@ def start_job(
             "$set": {
                 "status": "processing",
                 "started_at": datetime.utcnow()
-            }
+            },
+            # Page audio is rewritten in place; retires cached copies
+            "$inc": {"audio_generation": 1}
         }
     )
 
@@ -252,39 +507,56 @@ def start_job(
     total = job["num_pages"]
     end = end or total
     pages = end - start + 1
-    total_cost = PAGE_COST * pages
     if start < 1 or end > total or start > end:
         raise HTTPException(400, "Invalid page range")
 
     if pages > MAX_PAGES_PER_JOB:
         raise HTTPException(400, "Page limit exceeded")
 
-    deduct_credits_atomic(user["_id"], total_cost)
+    # Index the text (empty pages are neither charged nor dispatched) and
+    # split pages so each task downloads one small page, not the whole PDF
+    try:
+        plan = await plan_page_tasks(job, list(range(start, end + 1)))
+        if not plan["tasks"]:
+            raise HTTPException(400, "Selected pages have no text")
+    except Exception:
+        await async_jobs_collection.update_one(
+            {"job_id": job_id, "status": "processing"},
+            {"$set": {"status": "uploaded"}}
+        )
+        raise
+
+    total_cost = PAGE_COST * len(plan["tasks"])
+    await deduct_credits_atomic_async(user["_id"], total_cost)
     
 
     task_ids = []
     try:
-        for page in range(start, end + 1):
-            res =celery.send_task(
+        for page, path, kwargs in plan["tasks"]:
+            res = await asyncio.to_thread(
+                celery.send_task,
                 "tasks.process_page",
-                args=[job_id, job["remote_pdf_path"], page]
+                args=[job_id, path, page],
+                kwargs=kwargs
             )
             task_ids.append(res.id)
-        jobs_collection.update_one(
-            {"job_id": job_id, "status": "uploaded"},
+        await async_jobs_collection.update_one(
+            {"job_id": job_id, "status": "processing"},
             {"$set": {
-                "status": "processing",
                 "started_at": datetime.utcnow(),
-                "task_ids": task_ids
+                "task_ids": task_ids,
+                "skipped_pages": plan["skipped"]
             }}
         )
     except Exception:
-        add_credits(user["_id"], total_cost)
+        await asyncio.to_thread(add_credits, user["_id"], total_cost)
         raise
 
     return {
         "status": "processing", 
         "pages": pages,
+        "skipped_pages": plan["skipped"],
+        "cost": total_cost,
         "job_id": job_id,
         "task_ids": task_ids,
     }
@@ -361,31 +633,59 @@ def cleanup_expired_files(key: str = Query(..., description="Secret key to autho
     """
     Delete expired PDF files from Supabase.
     Only expires_at < now. Does NOT delete MongoDB records.
+    Shared (deduplicated) PDFs are only deleted with their last reference.
     Use secret key to call from external cron.
     """
     if key != CLEANUP_SECRET_KEY:
         raise HTTPException(403, "Not authorized")
 
     now = datetime.utcnow()
-    expired_jobs = jobs_collection.find({"expires_at": {"$lt": now}})
+    expired_jobs = jobs_collection.find({"expires_at": {"$lt": now}, "pdf_released": {"$ne": True}})
     
     deleted_count = 0
     errors = []
 
     for job in expired_jobs:
-        remote_path = job.get("remote_pdf_path")
-        if not remote_path:
+        if not job.get("remote_pdf_path"):
+            continue
+
+        # Claim the release first so a rerun never drops a reference twice
+        claimed = jobs_collection.update_one(
+            {"job_id": job["job_id"], "pdf_released": {"$ne": True}},
+            {"$set": {"pdf_released": True}}
+        )
+        if not claimed.modified_count:
             continue
-        
+
         try:
-            delete_file(remote_path)
+            release_job_pdf(job)
             deleted_count += 1
         except Exception as e:
+            if not job.get("pdf_sha256"):
+                # Plain file delete is safe to retry on the next run
+                jobs_collection.update_one({"job_id": job["job_id"]}, {"$unset": {"pdf_released": ""}})
             errors.append({"job_id": job.get("job_id"), "error": str(e)})
             continue
 
+    # Direct uploads that were never finalized. Each slot is removed before
+    # its object, atomically and only while no finalize holds it
+    abandoned = 0
+    while True:
+        pending = pending_uploads_collection.find_one_and_delete({"status": "pending", "expires_at": {"$lt": now}})
+        if not pending:
+            break
+        try:
+            delete_file(pending["remote_pdf_path"])
+            abandoned += 1
+        except Exception as e:
+            # Put the slot back so the next run retries the delete
+            pending_uploads_collection.insert_one(pending)
+            errors.append({"job_id": pending["_id"], "error": str(e)})
+            break
+
     return {
         "status": "done",
         "deleted_files": deleted_count,
+        "abandoned_uploads": abandoned,
         "errors": errors
     }
@@ -1,4 +1,7 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from core.cors import setup_cors
 
 from auth.router import router as auth_router
@@ -9,16 +12,39 @@ from health.router import router as health_router
 from admin.router import router as admin_router
 from admin.public_router import public_router
 from payments.paystack import router as payments_router
+from media.router import router as media_router
 
 from mongo import ensure_indexes
+from supabase_client import close_async_http
+from pdf_utils import pdf_pool
+from storage.base import StorageUnavailable
 
 ensure_indexes()
 
-app = FastAPI(title="Document → Audio API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Shutdown
+    await close_async_http()
+    pdf_pool.shutdown()
+
+
+app = FastAPI(title="Document → Audio API", lifespan=lifespan)
 
 setup_cors(app)
 
 
+@app.exception_handler(StorageUnavailable)
+async def storage_unavailable(request: Request, exc: StorageUnavailable):
+    # Storage circuit breaker is open: fail fast instead of queueing
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Storage temporarily unavailable"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 app.include_router(auth_router)
 app.include_router(credits_router)
 app.include_router(jobs_router)
@@ -26,4 +52,5 @@ app.include_router(audio_router)
 app.include_router(health_router)
 app.include_router(admin_router)
 app.include_router(public_router)
-app.include_router(payments_router)
\ No newline at end of file
+app.include_router(payments_router)
+app.include_router(media_router)
\ No newline at end of file
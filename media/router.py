@@ -0,0 +1,83 @@
+import asyncio
+import mimetypes
+import time
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from core.config import MAX_UPLOAD_SIZE, MEDIA_DELIVERY
+from core.security import verify_media_signature
+from core.uploads import spool_stream
+from supabase_client import _asafe_create_signed_url, adownload_stream, aobject_size, upload_file
+from storage.base import ObjectExists, ObjectNotFound
+from storage.service import get_storage
+from audio.service import parse_range_header
+
+router = APIRouter(prefix="/media", tags=["Media"])
+
+
+def _content_type(path: str) -> str:
+    if path.endswith(".wav"):
+        return "audio/wav"
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+@router.get("/{path:path}")
+async def get_media(path: str, request: Request, expires: int = Query(...), sig: str = Query(...), v: str = Query(None)):
+    """
+    Serve a storage object behind a URL minted by core.security.media_url.
+    The signature is checked locally; no user lookup. The object (or the
+    requested range) is streamed, and only URLs carrying a version are
+    served from the page cache.
+    """
+    if not verify_media_signature(path, expires, sig, version=v):
+        raise HTTPException(403, "Invalid or expired link")
+
+    remaining = max(expires - int(time.time()), 1)
+
+    if MEDIA_DELIVERY == "redirect" and get_storage().external_urls:
+        url = await _asafe_create_signed_url(path, remaining)
+        if not url:
+            raise HTTPException(502, "Could not sign storage URL")
+        return RedirectResponse(url, status_code=307)
+
+    try:
+        total = await aobject_size(path)
+    except ObjectNotFound:
+        raise HTTPException(404, "Object not found")
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"private, max-age={remaining}"
+    }
+    byte_range = parse_range_header(request.headers.get("range"), total)
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            adownload_stream(path, start=start, end=end, version=v),
+            status_code=206,
+            media_type=_content_type(path),
+            headers=headers
+        )
+
+    headers["Content-Length"] = str(total)
+    return StreamingResponse(adownload_stream(path, version=v), media_type=_content_type(path), headers=headers)
+
+
+@router.put("/{path:path}")
+async def put_media(path: str, request: Request, expires: int = Query(...), sig: str = Query(...)):
+    """
+    Receive a direct upload for backends without their own signed upload
+    URLs (see LocalStorage.sign_upload). Existing objects are never replaced.
+    """
+    if not verify_media_signature(path, expires, sig, "PUT"):
+        raise HTTPException(403, "Invalid or expired link")
+
+    with await spool_stream(request.stream(), MAX_UPLOAD_SIZE) as upload:
+        try:
+            await asyncio.to_thread(upload_file, upload.path, path, request.headers.get("content-type") or _content_type(path))
+        except ObjectExists:
+            raise HTTPException(409, "Object already exists")
+
+    return Response(status_code=201)
@@ -4,8 +4,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from pymongo import MongoClient, ASCENDING
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 
+from core.config import PAGE_TEXT_TTL_DAYS
+
 MONGO_URL = os.getenv("MONGO_URL")
 MONGO_DB = os.getenv("MONGO_DB", "pdf_audio")
 
@@ -16,6 +19,18 @@ db = client[MONGO_DB]
 jobs_collection = db["jobs"]
 users_collection = db["users"]
 payments_collection = db["payments"]  # ✅ NEW
+pdf_blobs_collection = db["pdf_blobs"]  # sha256 -> stored PDF + refcount
+pending_uploads_collection = db["pending_uploads"]  # direct uploads awaiting finalize
+page_texts_collection = db["page_texts"]  # page content hash -> extracted text
+
+# Async access for handlers that must not block the event loop
+async_client = AsyncIOMotorClient(MONGO_URL)
+async_db = async_client[MONGO_DB]
+async_jobs_collection = async_db["jobs"]
+async_users_collection = async_db["users"]
+async_pdf_blobs_collection = async_db["pdf_blobs"]
+async_pending_uploads_collection = async_db["pending_uploads"]
+async_page_texts_collection = async_db["page_texts"]
 
 
 def ensure_indexes():
@@ -29,6 +44,13 @@ def ensure_indexes():
     jobs_collection.create_index(
         [("created_at", ASCENDING)]
     )
+    pending_uploads_collection.create_index(
+        [("expires_at", ASCENDING)]
+    )
+    page_texts_collection.create_index(
+        [("last_used_at", ASCENDING)],
+        expireAfterSeconds=PAGE_TEXT_TTL_DAYS * 86400
+    )
 
     # -------------------
     # Users
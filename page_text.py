@@ -0,0 +1,182 @@
+# page_text.py
+# Text of every PDF page, extracted once with PyMuPDF. `page_texts` holds one
+# document per page content hash (shared across jobs and reuploads); a job's
+# `text_index` lists each page's hash with its character count and flags, so
+# empty pages never reach a worker and, from page task version 3 on (see
+# plan_page_tasks), workers read the text instead of parsing the PDF.
+import logging
+import math
+from datetime import datetime
+from typing import Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from core.config import ESTIMATE_CHARS_PER_SECOND, PAGE_TASK_VERSION
+from credits.service import PAGE_COST
+from mongo import async_jobs_collection, async_page_texts_collection
+from pdf_store import LocalPdf, page_sources
+from pdf_utils import PAGE_HASH_VERSION, extract_page_texts, page_content_hashes, pdf_pool
+
+logger = logging.getLogger("pdf")
+
+INDEX_FIELDS = ("chars", "blank", "image_only")
+
+
+def is_empty(entry: dict) -> bool:
+    """
+    Nothing to read on the page. Image-only pages (scans) still go to a
+    worker.
+    """
+    return entry["blank"] and not entry["image_only"]
+
+
+async def _touch(hashes: set, now: datetime) -> int:
+    """
+    Keep cached texts alive; returns how many of them still exist.
+    """
+    result = await async_page_texts_collection.update_many(
+        {"_id": {"$in": list(hashes)}},
+        {"$set": {"last_used_at": now}}
+    )
+    return result.matched_count
+
+
+async def _build_index(local: LocalPdf, now: datetime) -> list:
+    path = await local.path()
+    hashes = await pdf_pool.run(page_content_hashes, path)
+
+    cached = {}
+    async for doc in async_page_texts_collection.find({"_id": {"$in": list(set(hashes))}}, {"text": 0}):
+        cached[doc["_id"]] = doc
+
+    # Only pages with unseen content are parsed, each distinct one once
+    first_seen = {}
+    for page, sha256 in enumerate(hashes, start=1):
+        if sha256 not in cached:
+            first_seen.setdefault(sha256, page)
+
+    if first_seen:
+        extracted = await pdf_pool.run(extract_page_texts, path, list(first_seen.values()))
+        ops = []
+        for sha256, page in first_seen.items():
+            entry = extracted[page]
+            cached[sha256] = entry
+            ops.append(UpdateOne(
+                {"_id": sha256},
+                {"$set": {"last_used_at": now}, "$setOnInsert": {**entry, "created_at": now}},
+                upsert=True
+            ))
+        try:
+            await async_page_texts_collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Concurrent builds inserting the same page; same text either way
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+        logger.info("[PageText] Extracted %d of %d pages of %s", len(first_seen), len(hashes), local.pdf_path)
+
+    await _touch(set(hashes) - set(first_seen), now)
+    return [
+        {"sha256": sha256, **{field: cached[sha256][field] for field in INDEX_FIELDS}}
+        for sha256 in hashes
+    ]
+
+
+async def ensure_text_index(job: dict, local: LocalPdf) -> Optional[list]:
+    """
+    The job's text index, one {"sha256", "chars", "blank", "image_only"}
+    per page, built on first use and rebuilt when the job's PDF or the page
+    hash changed or its cached texts expired. Returns None when the PDF
+    can't be indexed; callers then treat every page as having text.
+    """
+    now = datetime.utcnow()
+    index = job.get("text_index") or {}
+    try:
+        if index.get("source") == job["remote_pdf_path"] and index.get("hash_version") == PAGE_HASH_VERSION:
+            pages = index["pages"]
+            hashes = {entry["sha256"] for entry in pages}
+            if await _touch(hashes, now) == len(hashes):
+                return pages
+
+        pages = await _build_index(local, now)
+        # A reupload in the meantime points the job elsewhere; leave it be
+        await async_jobs_collection.update_one(
+            {"job_id": job["job_id"], "remote_pdf_path": job["remote_pdf_path"]},
+            {"$set": {"text_index": {
+                "source": job["remote_pdf_path"],
+                "hash_version": PAGE_HASH_VERSION,
+                "pages": pages,
+                "built_at": now
+            }}}
+        )
+        return pages
+    except Exception as e:
+        logger.warning("[PageText] Indexing %s failed: %s", job["remote_pdf_path"], e)
+        return None
+
+
+async def plan_page_tasks(job: dict, pages: list) -> dict:
+    """
+    Prepare page tasks for `pages`: index the text, skip empty pages and,
+    for workers that read them, split the rest into single-page PDFs.
+    Returns {"tasks": [(page, path, kwargs)], "skipped": [page, ...]}.
+
+    Tasks are sent as args=[job_id, path, page], where `path` is always
+    the job's whole PDF, so workers of every version can run them. What
+    goes into `kwargs` depends on PAGE_TASK_VERSION:
+
+    - 1: nothing.
+    - 2: "task_version", and "page_pdf_path" (the page split into its own
+      PDF) when splitting worked. A worker reads that instead of the whole
+      PDF and falls back to `path` without it.
+    - 3: also "text_sha256" when the PDF is indexed. A worker reads the
+      page's text from page_texts[text_sha256]["text"] instead of
+      extracting it, and extracts it as before when the entry is gone
+      (it expires PAGE_TEXT_TTL_DAYS after a job last used it).
+
+    Empty pages are skipped whatever the version.
+    """
+    split = PAGE_TASK_VERSION >= 2
+    with LocalPdf(job["remote_pdf_path"]) as local:
+        index = await ensure_text_index(job, local)
+        if index is not None and len(index) < max(pages):
+            index = None
+
+        skipped = [page for page in pages if index and is_empty(index[page - 1])]
+        todo = [page for page in pages if page not in skipped]
+        sources = await page_sources(local, todo) if todo and split else {}
+
+    tasks = []
+    for page in todo:
+        kwargs = {}
+        if split:
+            kwargs["task_version"] = PAGE_TASK_VERSION
+            page_pdf_path, single_page = sources[page]
+            if single_page:
+                kwargs["page_pdf_path"] = page_pdf_path
+        if index and PAGE_TASK_VERSION >= 3:
+            kwargs["text_sha256"] = index[page - 1]["sha256"]
+        tasks.append((page, job["remote_pdf_path"], kwargs))
+    return {"tasks": tasks, "skipped": skipped}
+
+
+def estimate(index: Optional[list], pages: list) -> dict:
+    """
+    Cost and rough processing time for `pages` from the text index.
+    """
+    if index is None or len(index) < max(pages):
+        return {"pages": len(pages), "cost": PAGE_COST * len(pages), "indexed": False}
+
+    entries = [index[page - 1] for page in pages]
+    billable = [entry for entry in entries if not is_empty(entry)]
+    chars = sum(entry["chars"] for entry in billable)
+    return {
+        "pages": len(pages),
+        "text_pages": sum(1 for entry in billable if not entry["blank"]),
+        "image_only_pages": sum(1 for entry in entries if entry["image_only"]),
+        "empty_pages": len(entries) - len(billable),
+        "chars": chars,
+        "cost": PAGE_COST * len(billable),
+        "eta_seconds": math.ceil(chars / ESTIMATE_CHARS_PER_SECOND),
+        "indexed": True,
+    }
@@ -0,0 +1,220 @@
+# pdf_store.py
+# Content-addressed storage for uploaded PDFs. Identical files (by SHA-256)
+# share one stored object; `pdf_blobs` holds one document per hash with the
+# object path and a refcount of the jobs pointing at it.
+#
+# Page tasks read single-page PDFs split from the stored copy, kept in a
+# "pages" folder beside it and deleted with it.
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from core.config import PAGE_SPLIT_UPLOAD_WORKERS, UPLOAD_SPOOL_DIR
+from core.uploads import SpooledUpload, spool_stream
+from mongo import async_pdf_blobs_collection, pdf_blobs_collection
+from pdf_utils import count_pages, split_pages
+from supabase_client import adownload_stream, afile_sizes, delete_file, delete_folder, upload_file
+
+logger = logging.getLogger("pdf")
+
+PDF_BLOB_FOLDER = "pdfs/blobs"
+
+
+def find_pdf_blob(sha256: str) -> Optional[dict]:
+    return pdf_blobs_collection.find_one({"_id": sha256})
+
+
+async def pdf_page_count(upload: SpooledUpload) -> int:
+    """
+    Page count, read from the blob index when this content is known and
+    parsed in the PDF process pool otherwise.
+    """
+    blob = await async_pdf_blobs_collection.find_one({"_id": upload.sha256}, {"num_pages": 1})
+    if blob and blob.get("num_pages"):
+        return blob["num_pages"]
+    return await count_pages(upload.path)
+
+
+def acquire_pdf(upload: SpooledUpload, num_pages: int) -> dict:
+    """
+    Take a reference on the stored copy of this content, uploading it if
+    it isn't stored yet. Returns {"path", "sha256", "deduplicated"};
+    "deduplicated" is for logs only and never goes back to the client.
+
+    Each upload goes to a fresh object path and the index entry is created
+    with an upsert, so concurrent uploads of the same content converge on
+    one entry (the loser deletes its copy), and an entry being released to
+    zero can never have its object deleted under a new reference.
+    """
+    sha256 = upload.sha256
+    blob = pdf_blobs_collection.find_one_and_update(
+        {"_id": sha256},
+        {"$inc": {"refcount": 1}, "$set": {"last_used_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if blob:
+        logger.info("[PdfStore] Reusing %s (%s refs)", blob["path"], blob["refcount"])
+        return {"path": blob["path"], "sha256": sha256, "deduplicated": True}
+
+    path = f"{PDF_BLOB_FOLDER}/{sha256}/{uuid.uuid4().hex[:12]}.pdf"
+    # Streamed from the spool file, resumable above RESUMABLE_UPLOAD_THRESHOLD
+    upload_file(upload.path, path, "application/pdf")
+    return adopt_pdf(path, sha256, upload.size, num_pages)
+
+
+def adopt_pdf(path: str, sha256: str, size: int, num_pages: int) -> dict:
+    """
+    Register an object that is already in storage (uploaded by us or
+    directly by a client) as the copy of its content and take a reference.
+    If the content is stored already, the reference goes to that copy and
+    `path` is deleted. `path` must not be shared with anything else.
+    """
+    now = datetime.utcnow()
+    update = {
+        "$inc": {"refcount": 1},
+        "$set": {"last_used_at": now},
+        "$setOnInsert": {"path": path, "size": size, "num_pages": num_pages, "created_at": now},
+    }
+    try:
+        blob = pdf_blobs_collection.find_one_and_update(
+            {"_id": sha256}, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Lost an upsert race; the winner's document exists now
+        blob = pdf_blobs_collection.find_one_and_update(
+            {"_id": sha256}, update, return_document=ReturnDocument.AFTER
+        )
+
+    if blob["path"] != path:
+        delete_file(path)
+        logger.info("[PdfStore] Reusing %s (%s refs)", blob["path"], blob["refcount"])
+        return {"path": blob["path"], "sha256": sha256, "deduplicated": True}
+    return {"path": path, "sha256": sha256, "deduplicated": False}
+
+
+def release_pdf(sha256: str) -> bool:
+    """
+    Drop one reference; the object is deleted with its last reference.
+    Returns True when the object was deleted.
+    """
+    blob = pdf_blobs_collection.find_one_and_update(
+        {"_id": sha256, "refcount": {"$gt": 0}},
+        {"$inc": {"refcount": -1}, "$set": {"released_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not blob or blob["refcount"] > 0:
+        return False
+
+    # Only one releaser can remove the entry; anyone acquiring after this
+    # uploads to a new path
+    removed = pdf_blobs_collection.find_one_and_delete({"_id": sha256, "refcount": {"$lte": 0}})
+    if not removed:
+        return False
+    delete_file(removed["path"])
+    delete_folder(page_folder(removed["path"]))
+    logger.info("[PdfStore] Deleted %s (no references left)", removed["path"])
+    return True
+
+
+def release_job_pdf(job: dict) -> bool:
+    """
+    Release a job's PDF: drop its blob reference, or delete the file for
+    jobs stored before deduplication. Returns True if anything was released.
+    """
+    if job.get("pdf_sha256"):
+        release_pdf(job["pdf_sha256"])
+        return True
+    if job.get("remote_pdf_path"):
+        delete_folder(page_folder(job["remote_pdf_path"]))
+        return delete_file(job["remote_pdf_path"])
+    return False
+
+
+# -------------------------
+# Per-page objects
+# -------------------------
+def page_folder(pdf_path: str) -> str:
+    """
+    Folder holding the single-page PDFs split from `pdf_path`. Each stored
+    copy gets its own, so pages share its lifetime and its references.
+    """
+    return f"{os.path.splitext(pdf_path)[0]}/pages"
+
+
+class LocalPdf:
+    """
+    A stored PDF, downloaded to a spool file on first use so the stages
+    preparing a job share one download. Deleted on close().
+    """
+
+    def __init__(self, pdf_path: str):
+        self.pdf_path = pdf_path
+        self._upload = None
+
+    async def path(self) -> str:
+        if self._upload is None:
+            self._upload = await spool_stream(adownload_stream(self.pdf_path))
+        return self._upload.path
+
+    def close(self):
+        if self._upload is not None:
+            self._upload.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def ensure_page_pdfs(local: LocalPdf, pages: list) -> dict:
+    """
+    Single-page PDFs for `pages` of a stored PDF, splitting and uploading
+    the ones not stored yet. Returns {page: remote_path}.
+    """
+    pdf_path = local.pdf_path
+    folder = page_folder(pdf_path)
+    stored = await afile_sizes(folder)
+    paths = {page: f"{folder}/{page}.pdf" for page in pages}
+    missing = [page for page in pages if f"{page}.pdf" not in stored]
+    if not missing:
+        return paths
+
+    out_dir = tempfile.mkdtemp(prefix="pages-", dir=UPLOAD_SPOOL_DIR)
+    try:
+        split = await split_pages(await local.path(), missing, out_dir)
+
+        uploads = asyncio.Semaphore(PAGE_SPLIT_UPLOAD_WORKERS)
+
+        async def put(page: int):
+            async with uploads:
+                # Same content either way if a concurrent start got here first
+                await asyncio.to_thread(upload_file, split[page], paths[page], "application/pdf", True)
+
+        await asyncio.gather(*(put(page) for page in missing))
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    logger.info("[PdfStore] Split %d pages of %s", len(missing), pdf_path)
+    return paths
+
+
+async def page_sources(local: LocalPdf, pages: list) -> dict:
+    """
+    What each page task should read: {page: (path, single_page)}. Falls
+    back to the whole PDF when splitting fails; it's only an optimization.
+    """
+    try:
+        split = await ensure_page_pdfs(local, pages)
+        return {page: (split[page], True) for page in pages}
+    except Exception as e:
+        logger.warning("[PdfStore] Splitting %s failed, tasks read the whole PDF: %s", local.pdf_path, e)
+        return {page: (local.pdf_path, False) for page in pages}
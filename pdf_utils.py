@@ -1,4 +1,18 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 import fitz  # PyMuPDF
+from fastapi import HTTPException
+
+from core.config import PDF_POOL_MAX_QUEUE, PDF_POOL_WORKERS
+from storage.metrics import LatencyHistogram
 
 
 def get_num_pages_from_bytes(pdf_bytes: bytes) -> int:
@@ -8,3 +22,218 @@ def get_num_pages_from_bytes(pdf_bytes: bytes) -> int:
     with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
         return doc.page_count
 
+
+def get_num_pages_from_file(path: str) -> int:
+    """
+    Return the number of pages in a PDF on disk (without reading it into memory).
+    """
+    with fitz.open(path, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def split_pdf_pages(path: str, pages: list, out_dir: str) -> dict:
+    """
+    Write each of `pages` (1-based) of a PDF on disk as its own single-page
+    PDF in `out_dir`. Returns {page: local_path}.
+    """
+    out = {}
+    with fitz.open(path, filetype="pdf") as doc:
+        for page in pages:
+            local = os.path.join(out_dir, f"{page}.pdf")
+            with fitz.open() as single:
+                single.insert_pdf(doc, from_page=page - 1, to_page=page - 1)
+                single.save(local, garbage=3, deflate=True)
+            out[page] = local
+    return out
+
+
+# Indirect references in an object's source; page tree back-links are
+# dropped so hashing a page never walks into its siblings
+PDF_REF = re.compile(r"(\d+) (\d+) R")
+PDF_BACK_LINK = re.compile(r"/(?:Parent|P)\s+\d+\s+\d+\s+R")
+
+# Bumped whenever page_content_hashes changes, so text indexes built with
+# older hashes are rebuilt
+PAGE_HASH_VERSION = 2
+
+
+def _source_digest(doc, source: str, memo: dict, active: set) -> str:
+    source = PDF_BACK_LINK.sub("", source)
+    return PDF_REF.sub(lambda m: _object_digest(doc, int(m.group(1)), memo, active), source)
+
+
+def _object_digest(doc, xref: int, memo: dict, active: set) -> str:
+    """
+    SHA-256 of an object's definition and raw stream bytes, with every
+    reference it makes replaced by the referenced object's digest (so the
+    same content hashes the same in any document).
+    """
+    if xref in memo:
+        return memo[xref]
+    if xref in active:
+        return "cycle"
+    active.add(xref)
+    digest = hashlib.sha256(_source_digest(doc, doc.xref_object(xref, compressed=True), memo, active).encode())
+    if doc.xref_is_stream(xref):
+        digest.update(doc.xref_stream_raw(xref) or b"")
+    active.discard(xref)
+    memo[xref] = digest.hexdigest()
+    return memo[xref]
+
+
+def _page_resources(doc, xref: int) -> str:
+    # /Resources may be inherited from the page tree
+    while True:
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind != "null":
+            return value
+        kind, value = doc.xref_get_key(xref, "Parent")
+        if kind != "xref":
+            return ""
+        xref = int(value.split()[0])
+
+
+def page_content_hashes(path: str) -> list:
+    """
+    SHA-256 per page of everything its text depends on: the content
+    streams, the visible area and rotation, and every object reachable from
+    its resources (fonts with their embedded files and ToUnicode maps, form
+    XObjects, images). Pages only share a hash when they render the same,
+    so a cached text is never served for another document's page.
+    """
+    hashes = []
+    with fitz.open(path, filetype="pdf") as doc:
+        memo = {}
+        for page in doc:
+            digest = hashlib.sha256(page.read_contents())
+            digest.update(repr((page.rotation, tuple(page.mediabox), tuple(page.cropbox))).encode())
+            digest.update(_source_digest(doc, _page_resources(doc, page.xref), memo, set()).encode())
+            hashes.append(digest.hexdigest())
+    return hashes
+
+
+def extract_page_texts(path: str, pages: list) -> dict:
+    """
+    Text of each of `pages` (1-based). Returns {page: {"text", "chars",
+    "blank", "image_only"}}; blank pages have no text, image-only pages are
+    blank pages with images on them (scans).
+    """
+    out = {}
+    with fitz.open(path, filetype="pdf") as doc:
+        for number in pages:
+            page = doc.load_page(number - 1)
+            text = page.get_text("text").strip()
+            out[number] = {
+                "text": text,
+                "chars": len(text),
+                "blank": not text,
+                "image_only": not text and bool(page.get_images()),
+            }
+    return out
+
+
+# -------------------------
+# Process pool for PDF parsing off the event loop
+# -------------------------
+class PdfProcessPool:
+    """
+    Bounded process pool for CPU-bound PyMuPDF work. At most `workers`
+    jobs run at once and at most `max_queue` more wait; beyond that calls
+    are refused with 503 instead of piling up behind a large PDF.
+    """
+
+    def __init__(self, workers: int = PDF_POOL_WORKERS, max_queue: int = PDF_POOL_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.latency = LatencyHistogram()
+
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Not fork: by now the API holds Mongo and HTTP client threads
+                # whose locks a forked child could inherit mid-acquire
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(503, "PDF processing is busy, try again shortly", headers={"Retry-After": "5"})
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+
+        started = time.perf_counter()
+        ok = False
+        executor = self.executor()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            ok = True
+            return result
+        except BrokenProcessPool:
+            # A worker died (OOM, crash in MuPDF); start a fresh pool next time
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise HTTPException(503, "PDF processing is busy, try again shortly", headers={"Retry-After": "5"})
+        finally:
+            with self._lock:
+                self.pending -= 1
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                # Includes time spent queued for a worker
+                self.latency.observe((time.perf_counter() - started) * 1000, ok)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": min(self.pending, self.workers),
+                "queued": max(0, self.pending - self.workers),
+                "peak_pending": self.peak_pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "latency": self.latency.snapshot(),
+            }
+
+
+pdf_pool = PdfProcessPool()
+
+
+async def count_pages(path: str) -> int:
+    """
+    Page count of a PDF on disk, parsed in the process pool.
+    """
+    try:
+        return await pdf_pool.run(get_num_pages_from_file, path)
+    except (RuntimeError, ValueError):
+        # PyMuPDF's FileDataError and friends: not a readable PDF
+        raise HTTPException(400, "Invalid PDF file")
+
+
+async def split_pages(path: str, pages: list, out_dir: str) -> dict:
+    """
+    split_pdf_pages in the process pool.
+    """
+    return await pdf_pool.run(split_pdf_pages, path, pages, out_dir)
@@ -0,0 +1,104 @@
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger("storage")
+
+
+class SignedUrlCache:
+    """
+    Signed URLs shared through Redis by every worker, keyed by storage path
+    and requested TTL.
+
+    A URL signed for `ttl` seconds is handed out again until less than
+    `min_remaining_ratio * ttl` of its lifetime is left; the Redis key expires
+    at that point, so no reader ever sees a URL that is about to die. Values
+    are "<expires_at>|<url>" so callers can report the real expiry. Redis
+    errors are counted and treated as misses; counters are per process.
+    """
+
+    def __init__(self, client, min_remaining_ratio: float = 0.5, prefix: str = "su"):
+        self.client = client
+        self.min_remaining_ratio = min_remaining_ratio
+        self.prefix = prefix
+        self.enabled = client is not None and min_remaining_ratio < 1
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, path: str, ttl: int) -> str:
+        return f"{self.prefix}:{ttl}:{path}"
+
+    def get_many(self, paths: list, ttl: int) -> dict:
+        """
+        {path: (url, expires_at)} for the paths with a reusable URL.
+        """
+        if not self.enabled or not paths:
+            self.misses += len(paths)
+            return {}
+
+        try:
+            values = self.client.mget([self._key(p, ttl) for p in paths])
+        except Exception as e:
+            logger.warning("[SignedURLCache] Read failed: %s", e)
+            self.errors += 1
+            self.misses += len(paths)
+            return {}
+
+        now = time.time()
+        min_remaining = ttl * self.min_remaining_ratio
+        found = {}
+        for path, value in zip(paths, values):
+            entry = self._decode(value)
+            if entry and entry[1] - now >= min_remaining:
+                found[path] = entry
+        self.hits += len(found)
+        self.misses += len(paths) - len(found)
+        return found
+
+    def put_many(self, signed: dict, ttl: int):
+        """
+        Store {path: (url, expires_at)}; failed signatures are skipped.
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        min_remaining = ttl * self.min_remaining_ratio
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for path, entry in signed.items():
+                if not entry or not entry[0]:
+                    continue
+                url, expires_at = entry
+                reusable_for = int(expires_at - now - min_remaining)
+                if reusable_for > 0:
+                    pipe.set(self._key(path, ttl), f"{expires_at}|{url}", ex=reusable_for)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("[SignedURLCache] Write failed: %s", e)
+            self.errors += 1
+
+    @staticmethod
+    def _decode(value) -> Optional[tuple]:
+        if not value:
+            return None
+        if isinstance(value, bytes):
+            value = value.decode()
+        expires_at, _, url = value.partition("|")
+        try:
+            return url, int(expires_at)
+        except ValueError:
+            return None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "errors": self.errors,
+            "min_remaining_ratio": self.min_remaining_ratio,
+        }
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator, Optional
+
+from core.config import RESUMABLE_UPLOAD_THRESHOLD, SIGNED_URL_FALLBACK_WORKERS
+
+CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger("storage")
+
+
+def batched(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def file_size(fileobj) -> int:
+    position = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell() - position
+    fileobj.seek(position)
+    return size
+
+
+def upload_report(path: str, size: int, started: float, chunks: int = 1, retries: int = 0) -> dict:
+    """
+    Log and return per-upload throughput.
+    """
+    seconds = max(time.perf_counter() - started, 1e-6)
+    report = {
+        "path": path,
+        "bytes": size,
+        "seconds": round(seconds, 3),
+        "mb_per_s": round(size / seconds / 1e6, 2),
+        "chunks": chunks,
+        "retries": retries,
+    }
+    logger.info(
+        "[Upload] %s: %.1f MB in %.2fs (%.2f MB/s, %d chunks, %d retries)",
+        path, size / 1e6, seconds, report["mb_per_s"], chunks, retries
+    )
+    return report
+
+
+def range_header(start: int, end: int = None) -> dict:
+    if not start and end is None:
+        return {}
+    return {"Range": f"bytes={start}-{'' if end is None else end}"}
+
+
+def trim_chunks(chunks: Iterator[bytes], skip: int, limit: int = None) -> Iterator[bytes]:
+    """
+    Apply a byte range client-side, for servers that answered 200 to a
+    Range request.
+    """
+    for chunk in chunks:
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        chunk = chunk[skip:]
+        skip = 0
+        if limit is not None:
+            chunk = chunk[:limit]
+            limit -= len(chunk)
+        if chunk:
+            yield chunk
+        if limit == 0:
+            return
+
+
+async def atrim_chunks(chunks: AsyncIterator[bytes], skip: int, limit: int = None) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        chunk = chunk[skip:]
+        skip = 0
+        if limit is not None:
+            chunk = chunk[:limit]
+            limit -= len(chunk)
+        if chunk:
+            yield chunk
+        if limit == 0:
+            return
+
+
+class StorageError(Exception):
+    pass
+
+
+class ObjectNotFound(StorageError):
+    pass
+
+
+class ObjectExists(StorageError):
+    pass
+
+
+class StorageUnavailable(StorageError):
+    """
+    Raised without calling the backend while the circuit breaker is open.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Storage unavailable, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class StorageBackend(ABC):
+    """
+    Object storage used for PDFs, page audio and assembled artifacts.
+
+    Paths are bucket-relative ("folder/page_1.wav"). Backends implement the
+    sync primitives; the async methods default to running those in a thread
+    and are overridden where the backend has a native async client.
+    """
+
+    name = "base"
+    # False when sign() returns URLs served by this API (see /media), so the
+    # media endpoint must stream instead of redirecting to itself
+    external_urls = True
+
+    # ---- Primitives ----
+
+    @abstractmethod
+    def upload(self, path: str, data: bytes, content_type: str = "application/octet-stream", upsert: bool = False) -> str:
+        ...
+
+    @abstractmethod
+    def download(self, path: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def stream(self, path: str, chunk_size: int = CHUNK_SIZE, start: int = 0, end: int = None) -> Iterator[bytes]:
+        """
+        Yield the object's bytes as they arrive, optionally only the
+        inclusive byte range [start, end].
+        """
+
+    @abstractmethod
+    def size(self, path: str) -> int:
+        ...
+
+    @abstractmethod
+    def sign(self, path: str, ttl: int) -> Optional[str]:
+        """
+        Time-limited GET URL for `path`, or None when signing failed.
+        """
+
+    @abstractmethod
+    def list(self, folder: str, limit: int = 1000, offset: int = 0) -> list:
+        """
+        Direct children of `folder` sorted by name, as
+        {"name": ..., "size": bytes or None for sub-folders}.
+        """
+
+    @abstractmethod
+    def remove_many(self, paths: list) -> dict:
+        """
+        Remove objects; returns {"deleted": [...], "failed": [...]}.
+        Missing objects count as deleted.
+        """
+
+    # ---- Derived operations ----
+
+    def upload_stream(self, path: str, fileobj, size: int = None, content_type: str = "application/octet-stream", upsert: bool = False) -> dict:
+        """
+        Upload from a seekable file object from its current position.
+        Backends with a chunked/resumable protocol override this to keep
+        memory bounded and resume after transient failures. Returns the
+        upload report.
+        """
+        started = time.perf_counter()
+        data = fileobj.read() if size is None else fileobj.read(size)
+        self.upload(path, data, content_type, upsert)
+        return upload_report(path, len(data), started)
+
+    def upload_file(self, local_path: str, path: str, content_type: str = "application/octet-stream", upsert: bool = False) -> str:
+        with open(local_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size > RESUMABLE_UPLOAD_THRESHOLD:
+                self.upload_stream(path, f, size, content_type, upsert)
+            else:
+                self.upload(path, f.read(), content_type, upsert)
+        return path
+
+    def sign_many(self, paths: list, ttl: int) -> dict:
+        """
+        {path: url or None}.
+        """
+        paths = list(dict.fromkeys(p for p in paths if p))
+        if not paths:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(SIGNED_URL_FALLBACK_WORKERS, len(paths))) as pool:
+            return dict(zip(paths, pool.map(lambda p: self.sign(p, ttl), paths)))
+
+    def sizes(self, folder: str, page_size: int = 1000) -> dict:
+        """
+        {file_name: size} for every object directly in `folder`.
+        """
+        sizes = {}
+        offset = 0
+        while True:
+            batch = self.list(folder, page_size, offset)
+            for item in batch:
+                if item["size"] is not None:
+                    sizes[item["name"]] = item["size"]
+            if len(batch) < page_size:
+                return sizes
+            offset += page_size
+
+    def remove(self, path: str) -> bool:
+        return path in self.remove_many([path])["deleted"]
+
+    def sign_upload(self, path: str, ttl: int, content_type: str = "application/octet-stream") -> dict:
+        """
+        Time-limited URL a client can upload `path` to directly, as
+        {"url", "method", "headers"}. Never overwrites an existing object.
+        """
+        raise StorageError(f"{self.name} storage does not support direct uploads")
+
+    # ---- Async ----
+
+    async def adownload(self, path: str) -> bytes:
+        return await asyncio.to_thread(self.download, path)
+
+    async def astream(self, path: str, chunk_size: int = CHUNK_SIZE, start: int = 0, end: int = None) -> AsyncIterator[bytes]:
+        chunks = await asyncio.to_thread(self.stream, path, chunk_size, start, end)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+
+    async def asize(self, path: str) -> int:
+        return await asyncio.to_thread(self.size, path)
+
+    async def asign(self, path: str, ttl: int) -> Optional[str]:
+        return await asyncio.to_thread(self.sign, path, ttl)
+
+    async def asign_many(self, paths: list, ttl: int) -> dict:
+        return await asyncio.to_thread(self.sign_many, paths, ttl)
+
+    async def asizes(self, folder: str, page_size: int = 1000) -> dict:
+        return await asyncio.to_thread(self.sizes, folder, page_size)
+
+    async def aclose(self):
+        pass
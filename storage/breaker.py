@@ -0,0 +1,183 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from core.config import (
+    STORAGE_BREAKER_COOLDOWN,
+    STORAGE_BREAKER_FAILURE_RATE,
+    STORAGE_BREAKER_HALF_OPEN_CALLS,
+    STORAGE_BREAKER_MIN_CALLS,
+    STORAGE_BREAKER_SLOW_MS,
+    STORAGE_BREAKER_WINDOW
+)
+from storage.base import ObjectExists, ObjectNotFound, StorageUnavailable
+
+logger = logging.getLogger("storage")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Answers from a healthy store, not signs of an outage
+EXPECTED_ERRORS = (ObjectNotFound, ObjectExists)
+
+
+class _Call:
+    failed = False
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass and their outcomes fill a rolling window; once at
+    least `min_calls` are recorded and the share of errors and slow calls
+    reaches `failure_rate`, the breaker opens.
+
+    Open: calls raise StorageUnavailable immediately for `cooldown` seconds.
+
+    Half-open: up to `half_open_calls` probes go through; if they all
+    succeed the breaker closes, the first bad one reopens it.
+    """
+
+    def __init__(
+        self,
+        window: int = STORAGE_BREAKER_WINDOW,
+        min_calls: int = STORAGE_BREAKER_MIN_CALLS,
+        failure_rate: float = STORAGE_BREAKER_FAILURE_RATE,
+        slow_ms: float = STORAGE_BREAKER_SLOW_MS,
+        cooldown: float = STORAGE_BREAKER_COOLDOWN,
+        half_open_calls: int = STORAGE_BREAKER_HALF_OPEN_CALLS
+    ):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_ms = slow_ms
+        self.cooldown = cooldown
+        self.half_open_calls = half_open_calls
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = None
+        self._probes = 0
+        self._probe_successes = 0
+        self.rejected = 0
+        self.trips = 0
+
+    # ---- State ----
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self.opened_at = now
+        self.trips += 1
+        self._outcomes.clear()
+        logger.warning("[StorageBreaker] Open for %.0fs", self.cooldown)
+
+    def _close(self):
+        self.state = CLOSED
+        self.opened_at = None
+        self._outcomes.clear()
+        logger.info("[StorageBreaker] Closed")
+
+    def retry_after(self) -> int:
+        if self.state != OPEN:
+            return 0
+        return max(1, math.ceil(self.opened_at + self.cooldown - time.monotonic()))
+
+    def before_call(self) -> bool:
+        """
+        Admit or reject a call. Returns True when the call is a half-open
+        probe.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    self.rejected += 1
+                    raise StorageUnavailable(self.retry_after())
+                self.state = HALF_OPEN
+                self._probes = 0
+                self._probe_successes = 0
+                logger.info("[StorageBreaker] Half-open, probing")
+
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    self.rejected += 1
+                    raise StorageUnavailable(1)
+                self._probes += 1
+                return True
+            return False
+
+    def record(self, ok: bool, ms: float = 0.0, probe: bool = False):
+        bad = not ok or ms > self.slow_ms
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN and probe:
+                if bad:
+                    self._open(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_calls:
+                        self._close()
+                return
+            if self.state != CLOSED:
+                return
+
+            self._outcomes.append(bad)
+            if len(self._outcomes) >= self.min_calls and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def _abandon(self, probe: bool):
+        with self._lock:
+            if probe and self.state == HALF_OPEN:
+                self._probes -= 1
+
+    # ---- Guards ----
+
+    @contextmanager
+    def call(self, timed: bool = True):
+        """
+        Guard one storage call. Set `timed=False` for streams, where
+        duration depends on the consumer rather than the store. Calls that
+        report failure by return value instead of raising set
+        `call.failed = True` on the yielded handle.
+        """
+        probe = self.before_call()
+        started = time.perf_counter()
+        call = _Call()
+        try:
+            yield call
+        except StorageUnavailable:
+            # Rejected further down; says nothing new about the store
+            self._abandon(probe)
+            raise
+        except EXPECTED_ERRORS:
+            self.record(True, probe=probe)
+            raise
+        except GeneratorExit:
+            # Consumer stopped reading a stream early
+            self.record(True, probe=probe)
+            raise
+        except Exception:
+            self.record(False, probe=probe)
+            raise
+        except BaseException:
+            # Cancelled: no verdict, but hand the probe slot back
+            self._abandon(probe)
+            raise
+        self.record(not call.failed, (time.perf_counter() - started) * 1000 if timed else 0.0, probe=probe)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            outcomes = list(self._outcomes)
+            return {
+                "state": self.state,
+                "retry_after": self.retry_after(),
+                "window_calls": len(outcomes),
+                "window_failure_rate": round(sum(outcomes) / len(outcomes), 3) if outcomes else 0.0,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+
+storage_breaker = CircuitBreaker()
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+from core.config import (
+    STORAGE_CONNECT_TIMEOUT,
+    STORAGE_HTTP2,
+    STORAGE_KEEPALIVE_EXPIRY,
+    STORAGE_MAX_CONNECTIONS,
+    STORAGE_MAX_KEEPALIVE,
+    STORAGE_POOL_TIMEOUT,
+    STORAGE_READ_TIMEOUT,
+    STORAGE_RETRIES,
+    STORAGE_RETRY_BACKOFF,
+    STORAGE_RETRY_BACKOFF_MAX
+)
+from storage.metrics import storage_metrics
+
+logger = logging.getLogger("storage")
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Errors raised before the request reached the server; safe to retry even
+# for non-idempotent calls
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _http2_available() -> bool:
+    if not STORAGE_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("[StorageHTTP] STORAGE_HTTP2 is set but h2 is not installed; using HTTP/1.1")
+        return False
+
+
+def _client_options(base_url: str, headers: dict) -> dict:
+    return {
+        "base_url": base_url,
+        "headers": headers,
+        "http2": _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=STORAGE_MAX_CONNECTIONS,
+            max_keepalive_connections=STORAGE_MAX_KEEPALIVE,
+            keepalive_expiry=STORAGE_KEEPALIVE_EXPIRY
+        ),
+        "timeout": httpx.Timeout(
+            STORAGE_READ_TIMEOUT,
+            connect=STORAGE_CONNECT_TIMEOUT,
+            pool=STORAGE_POOL_TIMEOUT
+        ),
+    }
+
+
+def sync_client(base_url: str, headers: dict) -> httpx.Client:
+    storage_metrics.register_pool("sync", STORAGE_MAX_CONNECTIONS)
+    return httpx.Client(**_client_options(base_url, headers))
+
+
+def async_client(base_url: str, headers: dict) -> httpx.AsyncClient:
+    storage_metrics.register_pool("async", STORAGE_MAX_CONNECTIONS)
+    return httpx.AsyncClient(**_client_options(base_url, headers))
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Full-jitter exponential backoff: uniform in [0, base * 2^attempt].
+    """
+    return random.uniform(0, min(STORAGE_RETRY_BACKOFF_MAX, STORAGE_RETRY_BACKOFF * 2 ** attempt))
+
+
+def _should_retry(attempt: int, idempotent: bool, error: Exception = None, response: httpx.Response = None) -> bool:
+    if attempt >= STORAGE_RETRIES:
+        return False
+    if error is not None:
+        return isinstance(error, NOT_SENT_ERRORS) or (idempotent and isinstance(error, httpx.TransportError))
+    return idempotent and response.status_code in RETRY_STATUS
+
+
+def send(client: httpx.Client, pool: str, op: str, method: str, url: str, idempotent: bool = True, stream: bool = False, **kwargs) -> httpx.Response:
+    """
+    Send a storage request with retries and metrics. With stream=True the
+    caller must close the response (and call storage_metrics.release).
+    """
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        storage_metrics.acquire(pool)
+        try:
+            res = client.send(client.build_request(method, url, **kwargs), stream=stream)
+        except httpx.TransportError as e:
+            storage_metrics.release(pool)
+            storage_metrics.observe(op, (time.perf_counter() - started) * 1000, ok=False)
+            if isinstance(e, httpx.PoolTimeout):
+                storage_metrics.pool_timeout(pool)
+            if not _should_retry(attempt, idempotent, error=e):
+                raise
+        else:
+            if not _should_retry(attempt, idempotent, response=res):
+                if not stream:
+                    storage_metrics.release(pool)
+                storage_metrics.observe(op, (time.perf_counter() - started) * 1000, ok=res.status_code < 500)
+                return res
+            res.close()
+            storage_metrics.release(pool)
+            storage_metrics.observe(op, (time.perf_counter() - started) * 1000, ok=False)
+
+        storage_metrics.retry(op)
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+async def asend(client: httpx.AsyncClient, pool: str, op: str, method: str, url: str, idempotent: bool = True, stream: bool = False, **kwargs) -> httpx.Response:
+    """
+    Async twin of send.
+    """
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        storage_metrics.acquire(pool)
+        try:
+            res = await client.send(client.build_request(method, url, **kwargs), stream=stream)
+        except httpx.TransportError as e:
+            storage_metrics.release(pool)
+            storage_metrics.observe(op, (time.perf_counter() - started) * 1000, ok=False)
+            if isinstance(e, httpx.PoolTimeout):
+                storage_metrics.pool_timeout(pool)
+            if not _should_retry(attempt, idempotent, error=e):
+                raise
+        else:
+            if not _should_retry(attempt, idempotent, response=res):
+                if not stream:
+                    storage_metrics.release(pool)
+                storage_metrics.observe(op, (time.perf_counter() - started) * 1000, ok=res.status_code < 500)
+                return res
+            await res.aclose()
+            storage_metrics.release(pool)
+            storage_metrics.observe(op, (time.perf_counter() - started) * 1000, ok=False)
+
+        storage_metrics.retry(op)
+        await asyncio.sleep(backoff_delay(attempt))
+        attempt += 1
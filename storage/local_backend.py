@@ -0,0 +1,165 @@
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+
+from core.security import media_upload_url, media_url
+from storage.base import CHUNK_SIZE, ObjectExists, ObjectNotFound, StorageBackend, StorageError, upload_report
+
+logger = logging.getLogger("storage")
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalStorage(StorageBackend):
+    """
+    Objects as files under `root`, for development, load tests and a
+    single-host deployment.
+
+    Writes go to a temp file in the target directory, are fsynced and then
+    renamed into place (hard-linked without upsert, so an existing object
+    is never replaced), so concurrent readers never see partial objects and
+    a crash never leaves a truncated one. Paths are confined to `root`.
+    Signed URLs are the API's own HMAC /media URLs.
+    """
+
+    name = "local"
+    external_urls = False
+
+    def __init__(self, root: str):
+        self.root = os.path.realpath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _resolve(self, path: str) -> str:
+        full = os.path.realpath(os.path.join(self.root, path.lstrip("/")))
+        if full != self.root and not full.startswith(self.root + os.sep):
+            raise StorageError(f"Path escapes storage root: {path}")
+        return full
+
+    def _write(self, path: str, upsert: bool, write) -> int:
+        full = self._resolve(path)
+        if not upsert and os.path.exists(full):
+            raise ObjectExists(path)
+
+        directory = os.path.dirname(full)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                written = write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            if upsert:
+                os.replace(tmp_path, full)
+            else:
+                # link() fails if the name exists, so a concurrent writer
+                # that got there first is never replaced
+                try:
+                    os.link(tmp_path, full)
+                except FileExistsError:
+                    raise ObjectExists(path)
+                os.unlink(tmp_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return written
+
+    def upload(self, path: str, data: bytes, content_type: str = "application/octet-stream", upsert: bool = False) -> str:
+        self._write(path, upsert, lambda f: f.write(data))
+        return path
+
+    def upload_stream(self, path: str, fileobj, size: int = None, content_type: str = "application/octet-stream", upsert: bool = False) -> dict:
+        started = time.perf_counter()
+        chunks = 0
+
+        def copy(f) -> int:
+            nonlocal chunks
+            remaining = size
+            written = 0
+            while remaining is None or remaining > 0:
+                chunk = fileobj.read(COPY_CHUNK_SIZE if remaining is None else min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                written += len(chunk)
+                chunks += 1
+                if remaining is not None:
+                    remaining -= len(chunk)
+            return written
+
+        written = self._write(path, upsert, copy)
+        return upload_report(path, written, started, chunks)
+
+    def download(self, path: str) -> bytes:
+        try:
+            with open(self._resolve(path), "rb") as f:
+                return f.read()
+        except (FileNotFoundError, IsADirectoryError):
+            raise ObjectNotFound(path)
+
+    def stream(self, path: str, chunk_size: int = CHUNK_SIZE, start: int = 0, end: int = None):
+        try:
+            f = open(self._resolve(path), "rb")
+        except (FileNotFoundError, IsADirectoryError):
+            raise ObjectNotFound(path)
+        with f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def size(self, path: str) -> int:
+        try:
+            return os.stat(self._resolve(path)).st_size
+        except FileNotFoundError:
+            raise ObjectNotFound(path)
+
+    def sign(self, path: str, ttl: int) -> Optional[str]:
+        return media_url(path, int(time.time()) + ttl)
+
+    def sign_upload(self, path: str, ttl: int, content_type: str = "application/octet-stream") -> dict:
+        # Received by PUT /media, so uploads still pass through the API here
+        return {
+            "url": media_upload_url(path, int(time.time()) + ttl),
+            "method": "PUT",
+            "headers": {"Content-Type": content_type},
+        }
+
+    def list(self, folder: str, limit: int = 1000, offset: int = 0) -> list:
+        try:
+            entries = sorted(os.scandir(self._resolve(folder)), key=lambda e: e.name)
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+
+        items = []
+        for entry in entries:
+            if entry.name.startswith(".tmp-"):
+                continue
+            try:
+                size = None if entry.is_dir() else entry.stat().st_size
+            except FileNotFoundError:
+                continue
+            items.append({"name": entry.name, "size": size})
+        return items[offset:offset + limit]
+
+    def remove_many(self, paths: list) -> dict:
+        deleted, failed = [], []
+        for path in paths:
+            try:
+                os.unlink(self._resolve(path))
+                deleted.append(path)
+            except FileNotFoundError:
+                deleted.append(path)
+            except (OSError, StorageError) as e:
+                logger.warning("[LocalStorage] Failed to delete %s: %s", path, e)
+                failed.append(path)
+        return {"deleted": deleted, "failed": failed}
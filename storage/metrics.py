@@ -0,0 +1,125 @@
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram; percentiles are bucket upper bounds.
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.errors = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float, ok: bool = True):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if not ok:
+            self.errors += 1
+
+    def percentile(self, q: float):
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return round(self.max_ms, 1)
+
+    def snapshot(self) -> dict:
+        labels = [f"le_{b}" for b in self.buckets] + ["le_inf"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.sum_ms / self.count, 1) if self.count else None,
+            "max_ms": round(self.max_ms, 1),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class StorageMetrics:
+    """
+    Per-process storage call metrics: latency per operation, retries, and
+    connection pool pressure per HTTP client.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.retries = {}
+        self.pools = {}
+
+    def register_pool(self, name: str, max_connections: int):
+        with self._lock:
+            self.pools.setdefault(name, {
+                "max_connections": max_connections,
+                "in_flight": 0,
+                "peak_in_flight": 0,
+                "saturated": 0,
+                "pool_timeouts": 0,
+            })
+
+    def observe(self, op: str, ms: float, ok: bool = True):
+        with self._lock:
+            self.latency.setdefault(op, LatencyHistogram()).observe(ms, ok)
+
+    def retry(self, op: str):
+        with self._lock:
+            self.retries[op] = self.retries.get(op, 0) + 1
+
+    def pool_timeout(self, pool: str):
+        with self._lock:
+            self.pools[pool]["pool_timeouts"] += 1
+
+    def acquire(self, pool: str):
+        with self._lock:
+            stats = self.pools[pool]
+            if stats["in_flight"] >= stats["max_connections"]:
+                # This request will queue for a connection
+                stats["saturated"] += 1
+            stats["in_flight"] += 1
+            stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+
+    def release(self, pool: str):
+        with self._lock:
+            self.pools[pool]["in_flight"] -= 1
+
+    @contextmanager
+    def timed(self, op: str):
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.observe(op, (time.perf_counter() - started) * 1000, ok)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "latency": {op: h.snapshot() for op, h in sorted(self.latency.items())},
+                "retries": dict(self.retries),
+                "pools": {name: dict(stats) for name, stats in self.pools.items()},
+            }
+
+
+storage_metrics = StorageMetrics()
@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from storage.base import CHUNK_SIZE, ObjectExists, ObjectNotFound, StorageBackend, batched, upload_report
+
+logger = logging.getLogger("storage")
+
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Folder listings kept for walks in progress (see S3Storage.list)
+LISTING_CACHE_SIZE = 8
+
+
+class S3Storage(StorageBackend):
+    """
+    S3-compatible bucket (AWS, R2, MinIO...). boto3 is only needed when this
+    backend is selected; credentials come from the usual AWS env/config chain.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket: str, endpoint_url: str = None, region: str = None):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs boto3 installed")
+
+        self.bucket = bucket
+        self._client_error = ClientError
+        self._listings = OrderedDict()
+        self._listings_lock = threading.Lock()
+        # Parts are retried individually, so a failure only resends one part
+        self._transfer = TransferConfig(
+            multipart_threshold=MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=MULTIPART_CHUNK_SIZE,
+            max_concurrency=4
+        )
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            config=Config(max_pool_connections=64, retries={"max_attempts": 3, "mode": "standard"})
+        )
+
+    def _missing(self, e) -> bool:
+        return e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404", "NotFound")
+
+    def upload(self, path: str, data: bytes, content_type: str = "application/octet-stream", upsert: bool = False) -> str:
+        extra = {}
+        if not upsert:
+            # Conditional write: fails if the key exists (S3 and most compatibles)
+            extra["IfNoneMatch"] = "*"
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=path, Body=data, ContentType=content_type, **extra)
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") == "PreconditionFailed":
+                raise ObjectExists(path)
+            raise
+        return path
+
+    def upload_stream(self, path: str, fileobj, size: int = None, content_type: str = "application/octet-stream", upsert: bool = False) -> dict:
+        """
+        Upload from a seekable `fileobj`: one conditional PUT up to
+        MULTIPART_CHUNK_SIZE, multipart read part by part above it.
+
+        Without `upsert`, the single PUT can't replace an existing key
+        (If-None-Match). boto3's multipart transfer has no such condition,
+        so there the existence check is best-effort: a concurrent writer
+        between the check and completion can still be overwritten.
+        """
+        started = time.perf_counter()
+        if size is None:
+            position = fileobj.tell()
+            size = fileobj.seek(0, 2) - position
+            fileobj.seek(position)
+
+        if size <= MULTIPART_CHUNK_SIZE:
+            data = fileobj.read(size)
+            self.upload(path, data, content_type, upsert)
+            return upload_report(path, len(data), started)
+
+        if not upsert and self._exists(path):
+            raise ObjectExists(path)
+
+        sent = 0
+
+        def progress(count):
+            nonlocal sent
+            sent += count
+
+        self.client.upload_fileobj(
+            fileobj, self.bucket, path,
+            ExtraArgs={"ContentType": content_type},
+            Config=self._transfer,
+            Callback=progress
+        )
+        parts = max(1, -(-sent // MULTIPART_CHUNK_SIZE))
+        return upload_report(path, sent, started, parts)
+
+    def _exists(self, path: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=path)
+            return True
+        except self._client_error as e:
+            if self._missing(e):
+                return False
+            raise
+
+    def _get(self, path: str, start: int = 0, end: int = None):
+        extra = {}
+        if start or end is not None:
+            extra["Range"] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=path, **extra)["Body"]
+        except self._client_error as e:
+            if self._missing(e):
+                raise ObjectNotFound(path)
+            if e.response.get("Error", {}).get("Code") == "InvalidRange":
+                return None
+            raise
+
+    def download(self, path: str) -> bytes:
+        return self._get(path).read()
+
+    def stream(self, path: str, chunk_size: int = CHUNK_SIZE, start: int = 0, end: int = None):
+        body = self._get(path, start, end)
+        if body is None:
+            return
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def size(self, path: str) -> int:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=path)["ContentLength"]
+        except self._client_error as e:
+            if self._missing(e):
+                raise ObjectNotFound(path)
+            raise
+
+    def sign(self, path: str, ttl: int) -> Optional[str]:
+        try:
+            return self.client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": path},
+                ExpiresIn=ttl
+            )
+        except Exception as e:
+            logger.warning("[SignedURL] Failed for %s: %s", path, e)
+            return None
+
+    def sign_upload(self, path: str, ttl: int, content_type: str = "application/octet-stream") -> dict:
+        # If-None-Match is signed in, so the PUT can't replace an existing key
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": self.bucket, "Key": path, "ContentType": content_type, "IfNoneMatch": "*"},
+            ExpiresIn=ttl
+        )
+        return {"url": url, "method": "PUT", "headers": {"Content-Type": content_type, "If-None-Match": "*"}}
+
+    def sign_many(self, paths: list, ttl: int) -> dict:
+        # Presigning is local computation, no need for a thread pool
+        return {p: self.sign(p, ttl) for p in dict.fromkeys(p for p in paths if p)}
+
+    def _iter_children(self, folder: str):
+        prefix = folder.strip("/") + "/" if folder.strip("/") else ""
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter="/"):
+            for sub in page.get("CommonPrefixes", []):
+                yield {"name": sub["Prefix"][len(prefix):].rstrip("/"), "size": None}
+            for obj in page.get("Contents", []):
+                yield {"name": obj["Key"][len(prefix):], "size": obj["Size"]}
+
+    def list(self, folder: str, limit: int = 1000, offset: int = 0) -> list:
+        """
+        S3 pages by continuation token, not offset. The first page of a walk
+        (offset 0) lists the whole folder once; later offsets are served
+        from that listing until the walk reaches its end, so walking a
+        folder costs one listing rather than one per page.
+        """
+        key = folder.strip("/")
+        with self._listings_lock:
+            items = self._listings.get(key) if offset else None
+        if items is None:
+            items = sorted(self._iter_children(folder), key=lambda item: item["name"])
+
+        with self._listings_lock:
+            if offset + limit <= len(items):
+                self._listings[key] = items
+                self._listings.move_to_end(key)
+                while len(self._listings) > LISTING_CACHE_SIZE:
+                    self._listings.popitem(last=False)
+            else:
+                self._listings.pop(key, None)
+        return items[offset:offset + limit]
+
+    def sizes(self, folder: str, page_size: int = 1000) -> dict:
+        return {item["name"]: item["size"] for item in self._iter_children(folder) if item["size"] is not None}
+
+    def remove_many(self, paths: list) -> dict:
+        deleted, failed = [], []
+        for chunk in batched(list(paths), 1000):
+            try:
+                res = self.client.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={"Objects": [{"Key": p} for p in chunk], "Quiet": True}
+                )
+            except Exception as e:
+                logger.warning("[S3] Failed to delete %d objects: %s", len(chunk), e)
+                failed.extend(chunk)
+                continue
+            errors = {err["Key"] for err in res.get("Errors", [])}
+            failed.extend(p for p in chunk if p in errors)
+            deleted.extend(p for p in chunk if p not in errors)
+        return {"deleted": deleted, "failed": failed}
@@ -0,0 +1,46 @@
+import threading
+
+from core.config import (
+    S3_BUCKET,
+    S3_ENDPOINT_URL,
+    S3_REGION,
+    STORAGE_BACKEND,
+    STORAGE_LOCAL_ROOT
+)
+from storage.base import StorageBackend
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(kind: str) -> StorageBackend:
+    if kind == "supabase":
+        from storage.supabase_backend import SupabaseStorage
+        return SupabaseStorage()
+    if kind == "local":
+        from storage.local_backend import LocalStorage
+        return LocalStorage(STORAGE_LOCAL_ROOT)
+    if kind == "s3":
+        from storage.s3_backend import S3Storage
+        return S3Storage(S3_BUCKET, S3_ENDPOINT_URL, S3_REGION)
+    raise RuntimeError(f"Unknown STORAGE_BACKEND: {kind}")
+
+
+def get_storage() -> StorageBackend:
+    """
+    The process-wide backend selected by STORAGE_BACKEND, created on first use.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage(STORAGE_BACKEND)
+    return _storage
+
+
+def set_storage(backend: StorageBackend):
+    """
+    Swap the backend (benchmarks and load tests).
+    """
+    global _storage
+    _storage = backend
@@ -0,0 +1,387 @@
+import asyncio
+import base64
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import quote
+
+import httpx
+from core.config import (
+    SIGNED_URL_BATCH_SIZE,
+    SIGNED_URL_FALLBACK_WORKERS,
+    UPLOAD_MAX_RETRIES
+)
+from storage.base import (
+    CHUNK_SIZE,
+    ObjectExists,
+    ObjectNotFound,
+    StorageBackend,
+    StorageError,
+    atrim_chunks,
+    batched,
+    file_size,
+    range_header,
+    trim_chunks,
+    upload_report
+)
+from storage.http import asend, async_client, send, sync_client
+from storage.metrics import storage_metrics
+
+logger = logging.getLogger("storage")
+
+# Supabase's TUS endpoint requires exactly 6 MB chunks (except the last)
+TUS_CHUNK_SIZE = 6 * 1024 * 1024
+TUS_VERSION = "1.0.0"
+MISSING_STATUS = (400, 404)
+
+
+class SupabaseStorage(StorageBackend):
+    """
+    Supabase Storage bucket over its REST API. Sync and async calls each
+    share one tuned connection pool per process (see storage/http.py).
+    """
+
+    name = "supabase"
+
+    def __init__(self, url: str = None, key: str = None, bucket: str = None):
+        self.url = url or os.getenv("SUPABASE_URL")
+        self.key = key or os.getenv("SUPABASE_KEY")
+        self.bucket = bucket or os.getenv("SUPABASE_BUCKET", "reading_app")
+        self.api = f"{self.url}/storage/v1"
+        self.headers = {"apikey": self.key, "Authorization": f"Bearer {self.key}"}
+        self._sync = None
+        self._async = None
+
+    # ---- Transport ----
+
+    def client(self) -> httpx.Client:
+        if self._sync is None:
+            self._sync = sync_client(self.api, self.headers)
+        return self._sync
+
+    def http(self) -> httpx.AsyncClient:
+        if self._async is None:
+            self._async = async_client(self.api, self.headers)
+        return self._async
+
+    def _send(self, op: str, method: str, url, **kwargs) -> httpx.Response:
+        return send(self.client(), "sync", op, method, url, **kwargs)
+
+    async def _asend(self, op: str, method: str, url, **kwargs) -> httpx.Response:
+        return await asend(self.http(), "async", op, method, url, **kwargs)
+
+    async def aclose(self):
+        if self._async is not None:
+            await self._async.aclose()
+            self._async = None
+        if self._sync is not None:
+            self._sync.close()
+            self._sync = None
+
+    def _object_url(self, path: str) -> str:
+        return f"/object/{self.bucket}/{quote(path)}"
+
+    def _absolute(self, url: str) -> str:
+        return f"{self.api}{url}" if url.startswith("/") else url
+
+    def _list_body(self, folder: str, limit: int, offset: int) -> dict:
+        return {
+            "prefix": folder.rstrip("/"),
+            "limit": limit,
+            "offset": offset,
+            "sortBy": {"column": "name", "order": "asc"}
+        }
+
+    def _signed_items(self, items: list) -> dict:
+        signed = {}
+        for item in items:
+            url = item.get("signedURL") or item.get("signedUrl")
+            if item.get("error") or not url:
+                logger.warning("[SignedURL] Failed for %s: %s", item.get("path"), item.get("error"))
+                signed[item.get("path")] = None
+            else:
+                signed[item.get("path")] = self._absolute(url)
+        return signed
+
+    # ---- Sync ----
+
+    def upload(self, path: str, data: bytes, content_type: str = "application/octet-stream", upsert: bool = False) -> str:
+        res = self._send(
+            "upload", "POST", self._object_url(path),
+            content=data,
+            headers={"Content-Type": content_type, "x-upsert": "true" if upsert else "false"},
+            idempotent=upsert
+        )
+        if res.status_code == 409 or (res.status_code == 400 and "exists" in res.text.lower()):
+            raise ObjectExists(path)
+        res.raise_for_status()
+        return path
+
+    def upload_stream(self, path: str, fileobj, size: int = None, content_type: str = "application/octet-stream", upsert: bool = False) -> dict:
+        """
+        Resumable upload over the storage TUS endpoint. Only one chunk is in
+        memory at a time; after a failed PATCH the server's offset is read
+        back and the upload continues from there.
+        """
+        started = time.perf_counter()
+        base = fileobj.tell()
+        size = file_size(fileobj) if size is None else size
+        metadata = {
+            "bucketName": self.bucket,
+            "objectName": path,
+            "contentType": content_type,
+            "cacheControl": "3600",
+        }
+
+        res = self._send(
+            "upload", "POST", "/upload/resumable",
+            headers={
+                "Tus-Resumable": TUS_VERSION,
+                "Upload-Length": str(size),
+                "Upload-Metadata": ",".join(
+                    f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in metadata.items()
+                ),
+                "x-upsert": "true" if upsert else "false",
+            },
+            idempotent=False
+        )
+        if res.status_code == 409:
+            raise ObjectExists(path)
+        res.raise_for_status()
+        location = httpx.URL(f"{self.api}/upload/resumable").join(res.headers["Location"])
+
+        chunks = 0
+        retries = 0
+        offset = 0
+        while offset < size:
+            fileobj.seek(base + offset)
+            chunk = fileobj.read(min(TUS_CHUNK_SIZE, size - offset))
+            try:
+                # Not retried by the transport: a resend needs the server's offset first
+                res = self._send(
+                    "upload_chunk", "PATCH", location,
+                    content=chunk,
+                    headers={
+                        "Tus-Resumable": TUS_VERSION,
+                        "Upload-Offset": str(offset),
+                        "Content-Type": "application/offset+octet-stream",
+                    },
+                    idempotent=False
+                )
+                res.raise_for_status()
+                offset = int(res.headers.get("Upload-Offset", offset + len(chunk)))
+                chunks += 1
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500 and e.response.status_code != 409:
+                    raise
+                retries += 1
+                if retries > UPLOAD_MAX_RETRIES:
+                    raise StorageError(f"Upload of {path} failed after {retries - 1} retries: {e}")
+                time.sleep(min(0.5 * 2 ** (retries - 1), 8))
+                offset = self._tus_offset(location, offset)
+
+        return upload_report(path, size, started, chunks, retries)
+
+    def _tus_offset(self, location: httpx.URL, fallback: int) -> int:
+        try:
+            res = self._send("upload_offset", "HEAD", location, headers={"Tus-Resumable": TUS_VERSION})
+            res.raise_for_status()
+            return int(res.headers["Upload-Offset"])
+        except Exception as e:
+            logger.warning("[Upload] Could not read resume offset: %s", e)
+            return fallback
+
+    def download(self, path: str) -> bytes:
+        res = self._send("download", "GET", self._object_url(path))
+        if res.status_code in MISSING_STATUS:
+            raise ObjectNotFound(path)
+        res.raise_for_status()
+        return res.content
+
+    def stream(self, path: str, chunk_size: int = CHUNK_SIZE, start: int = 0, end: int = None):
+        # Latency recorded for "stream" is time to response headers
+        res = self._send("stream", "GET", self._object_url(path), headers=range_header(start, end), stream=True)
+        try:
+            if res.status_code in MISSING_STATUS:
+                raise ObjectNotFound(path)
+            if res.status_code == 416:
+                return
+            res.raise_for_status()
+            chunks = res.iter_bytes(chunk_size)
+            if res.status_code == 200 and (start or end is not None):
+                chunks = trim_chunks(chunks, start, None if end is None else end - start + 1)
+            yield from chunks
+        finally:
+            res.close()
+            storage_metrics.release("sync")
+
+    def size(self, path: str) -> int:
+        res = self._send("size", "HEAD", self._object_url(path))
+        if res.status_code in MISSING_STATUS:
+            raise ObjectNotFound(path)
+        res.raise_for_status()
+        return int(res.headers["Content-Length"])
+
+    def sign(self, path: str, ttl: int) -> Optional[str]:
+        try:
+            res = self._send("sign", "POST", f"/object/sign/{self.bucket}/{quote(path)}", json={"expiresIn": ttl})
+            res.raise_for_status()
+            signed = res.json().get("signedURL") or res.json().get("signed_url")
+            return self._absolute(signed) if signed else None
+        except Exception as e:
+            logger.warning("[SignedURL] Failed for %s: %s", path, e)
+            return None
+
+    def sign_upload(self, path: str, ttl: int, content_type: str = "application/octet-stream") -> dict:
+        """
+        Signed upload URL from the storage API. Supabase fixes its lifetime
+        (two hours) server-side, so `ttl` only bounds it on our side.
+        """
+        res = self._send("sign_upload", "POST", f"/object/upload/sign/{self.bucket}/{quote(path)}", headers={"x-upsert": "false"})
+        res.raise_for_status()
+        return {
+            "url": self._absolute(res.json()["url"]),
+            "method": "PUT",
+            "headers": {"Content-Type": content_type, "x-upsert": "false"},
+        }
+
+    def sign_many(self, paths: list, ttl: int) -> dict:
+        """
+        Bulk signing API, SIGNED_URL_BATCH_SIZE paths per call. A chunk whose
+        bulk call fails is signed one by one, concurrently.
+        """
+        paths = list(dict.fromkeys(p for p in paths if p))
+        signed = {}
+        retry = []
+
+        for chunk in batched(paths, SIGNED_URL_BATCH_SIZE):
+            try:
+                res = self._send("sign_many", "POST", f"/object/sign/{self.bucket}", json={"expiresIn": ttl, "paths": chunk})
+                res.raise_for_status()
+                items = res.json() or []
+            except Exception as e:
+                logger.warning("[SignedURL] Bulk sign of %d paths failed: %s", len(chunk), e)
+                retry.extend(chunk)
+                continue
+            signed.update(self._signed_items(items))
+
+        # Paths the bulk response didn't mention get signed individually too
+        answered = set(signed).union(retry)
+        retry.extend(p for p in paths if p not in answered)
+        if retry:
+            with ThreadPoolExecutor(max_workers=min(SIGNED_URL_FALLBACK_WORKERS, len(retry))) as pool:
+                signed.update(zip(retry, pool.map(lambda p: self.sign(p, ttl), retry)))
+
+        return {p: signed.get(p) for p in paths}
+
+    def list(self, folder: str, limit: int = 1000, offset: int = 0) -> list:
+        res = self._send("list", "POST", f"/object/list/{self.bucket}", json=self._list_body(folder, limit, offset))
+        res.raise_for_status()
+        return [_list_item(item) for item in res.json() or [] if item.get("name")]
+
+    def remove_many(self, paths: list) -> dict:
+        deleted, failed = [], []
+        for chunk in batched(list(paths), 1000):
+            try:
+                res = self._send("remove", "DELETE", f"/object/{self.bucket}", json={"prefixes": chunk})
+                res.raise_for_status()
+                deleted.extend(chunk)
+            except Exception as e:
+                logger.warning("[Supabase] Failed to delete %d objects: %s", len(chunk), e)
+                failed.extend(chunk)
+        return {"deleted": deleted, "failed": failed}
+
+    # ---- Async ----
+
+    async def adownload(self, path: str) -> bytes:
+        res = await self._asend("download", "GET", self._object_url(path))
+        if res.status_code in MISSING_STATUS:
+            raise ObjectNotFound(path)
+        res.raise_for_status()
+        return res.content
+
+    async def astream(self, path: str, chunk_size: int = CHUNK_SIZE, start: int = 0, end: int = None):
+        res = await self._asend("stream", "GET", self._object_url(path), headers=range_header(start, end), stream=True)
+        try:
+            if res.status_code in MISSING_STATUS:
+                raise ObjectNotFound(path)
+            if res.status_code == 416:
+                return
+            res.raise_for_status()
+            chunks = res.aiter_bytes(chunk_size)
+            if res.status_code == 200 and (start or end is not None):
+                chunks = atrim_chunks(chunks, start, None if end is None else end - start + 1)
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await res.aclose()
+            storage_metrics.release("async")
+
+    async def asize(self, path: str) -> int:
+        res = await self._asend("size", "HEAD", self._object_url(path))
+        if res.status_code in MISSING_STATUS:
+            raise ObjectNotFound(path)
+        res.raise_for_status()
+        return int(res.headers["Content-Length"])
+
+    async def asizes(self, folder: str, page_size: int = 1000) -> dict:
+        sizes = {}
+        offset = 0
+        while True:
+            res = await self._asend("list", "POST", f"/object/list/{self.bucket}", json=self._list_body(folder, page_size, offset))
+            res.raise_for_status()
+            batch = res.json() or []
+            for item in batch:
+                item = _list_item(item)
+                if item["name"] and item["size"] is not None:
+                    sizes[item["name"]] = item["size"]
+            if len(batch) < page_size:
+                return sizes
+            offset += page_size
+
+    async def asign(self, path: str, ttl: int) -> Optional[str]:
+        try:
+            res = await self._asend("sign", "POST", f"/object/sign/{self.bucket}/{quote(path)}", json={"expiresIn": ttl})
+            res.raise_for_status()
+            signed = res.json().get("signedURL") or res.json().get("signed_url")
+            return self._absolute(signed) if signed else None
+        except Exception as e:
+            logger.warning("[SignedURL] Failed for %s: %s", path, e)
+            return None
+
+    async def asign_many(self, paths: list, ttl: int) -> dict:
+        paths = list(dict.fromkeys(p for p in paths if p))
+        signed = {}
+        retry = []
+
+        for chunk in batched(paths, SIGNED_URL_BATCH_SIZE):
+            try:
+                res = await self._asend("sign_many", "POST", f"/object/sign/{self.bucket}", json={"expiresIn": ttl, "paths": chunk})
+                res.raise_for_status()
+                items = res.json() or []
+            except Exception as e:
+                logger.warning("[SignedURL] Bulk sign of %d paths failed: %s", len(chunk), e)
+                retry.extend(chunk)
+                continue
+            signed.update(self._signed_items(items))
+
+        answered = set(signed).union(retry)
+        retry.extend(p for p in paths if p not in answered)
+        if retry:
+            slots = asyncio.Semaphore(SIGNED_URL_FALLBACK_WORKERS)
+
+            async def sign_one(path):
+                async with slots:
+                    return await self.asign(path, ttl)
+
+            signed.update(zip(retry, await asyncio.gather(*(sign_one(p) for p in retry))))
+
+        return {p: signed.get(p) for p in paths}
+
+
+def _list_item(item: dict) -> dict:
+    # Folders come back without an id or metadata
+    size = (item.get("metadata") or {}).get("size")
+    return {"name": item.get("name"), "size": int(size) if size is not None else None}
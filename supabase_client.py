@@ -1,56 +1,129 @@
 # supabase_client.py
+# Cached storage helpers used across the API. The object store itself is
+# whichever backend storage.service.get_storage() selects (Supabase by default).
+# Every backend call runs under storage_breaker, so during a storage outage
+# these raise StorageUnavailable (served as 503) instead of hanging.
+import asyncio
+import io
+import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from dotenv import load_dotenv
 load_dotenv()
 
-import httpx
-from supabase import create_client, Client
+from core.config import (
+    DELETE_BATCH_SIZE,
+    PAGE_CACHE_DIR,
+    PAGE_CACHE_MAX_AGE,
+    PAGE_CACHE_MAX_BYTES,
+    RESUMABLE_UPLOAD_THRESHOLD,
+    SIGNED_URL_CACHE_MIN_REMAINING,
+    SIGNED_URL_MODE,
+    STORAGE_DELETE_WORKERS
+)
+from core.rate_limiter import redis_client
+from core.security import media_url
+from disk_cache import DiskCache
+from signed_url_cache import SignedUrlCache
+from storage.breaker import storage_breaker
+from storage.service import get_storage
+from utils import ordered_pages, page_cache_version
+
+logger = logging.getLogger("storage")
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "reading_app")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Objects are rewritten in place (workers regenerate page audio at the same
+# path on other hosts), so reads are only cached under a caller-supplied
+# version, e.g. utils.page_cache_version; unversioned reads bypass the cache.
+# Writes and deletes through this module drop every cached version of a path.
+page_cache = DiskCache(PAGE_CACHE_DIR, PAGE_CACHE_MAX_BYTES, PAGE_CACHE_MAX_AGE)
+signed_url_cache = SignedUrlCache(redis_client, SIGNED_URL_CACHE_MIN_REMAINING)
+
+
+def _cache_get(path: str, version: Optional[str]) -> Optional[bytes]:
+    return None if version is None else page_cache.get(path, version)
+
+
+def _cache_put(path: str, version: Optional[str], data: bytes):
+    if version is not None:
+        page_cache.put(path, data, version)
 
 def create_signed_url(path: str, expires_in: int = 300) -> str:
     """
-    Create a signed URL for a private Supabase object.
+    Create a signed URL for a private storage object.
     """
-    res = supabase.storage.from_(SUPABASE_BUCKET).create_signed_url(
-        path,
-        expires_in
-    )
+    with storage_breaker.call():
+        url = get_storage().sign(path, expires_in)
+        if not url:
+            raise RuntimeError("Failed to create signed URL")
+    return url
 
-    if isinstance(res, dict):
-        return res.get("signedURL") or res.get("signed_url")
+def create_signed_upload(path: str, expires_in: int, content_type="application/octet-stream") -> dict:
+    """
+    Let a client upload `path` straight to storage: {"url", "method", "headers"}.
+    """
+    with storage_breaker.call():
+        return get_storage().sign_upload(path, expires_in, content_type)
+
+def upload_bytes(path: str, data: bytes, content_type="application/octet-stream", upsert: bool = False):
+    with storage_breaker.call(timed=False):
+        if len(data) > RESUMABLE_UPLOAD_THRESHOLD:
+            # Chunked so a transient failure resends one chunk, not the file
+            get_storage().upload_stream(path, io.BytesIO(data), len(data), content_type, upsert)
+        else:
+            get_storage().upload(path, data, content_type, upsert)
+    page_cache.invalidate(path)
+    return path  # RETURN PATH, NOT URL
 
-    raise RuntimeError("Failed to create signed URL")
 
-def upload_bytes(path: str, data: bytes, content_type="application/octet-stream"):
-    supabase.storage.from_(SUPABASE_BUCKET).upload(
-        path,
-        data,
-        {"content-type": content_type}
-    )
-    return path  # RETURN PATH, NOT URL
+def upload_fileobj(path: str, fileobj, size: int = None, content_type="application/octet-stream", upsert: bool = False) -> dict:
+    """
+    Chunked/resumable upload from a seekable file object with bounded
+    memory. Returns the throughput report.
+    """
+    with storage_breaker.call(timed=False):
+        report = get_storage().upload_stream(path, fileobj, size, content_type, upsert)
+    page_cache.invalidate(path)
+    return report
 
 
-def upload_file(local_path: str, remote_path: str, content_type="application/octet-stream") -> str:
-    with open(local_path, "rb") as f:
-        data = f.read()
-    return upload_bytes(remote_path, data, content_type)
+def upload_file(local_path: str, remote_path: str, content_type="application/octet-stream", upsert: bool = False) -> str:
+    with storage_breaker.call(timed=False):
+        get_storage().upload_file(local_path, remote_path, content_type, upsert)
+    page_cache.invalidate(remote_path)
+    return remote_path
 
-def download_to_bytes(remote_path: str) -> bytes:
-    res = supabase.storage.from_(SUPABASE_BUCKET).download(remote_path)
-    # handle possible return shapes
-    if isinstance(res, (bytes, bytearray)):
-        return bytes(res)
-    if hasattr(res, "content"):
-        return res.content
-    if hasattr(res, "read"):
-        return res.read()
-    raise RuntimeError("Unsupported supabase download response type")
+def download_to_bytes(remote_path: str, version: str = None) -> bytes:
+    cached = _cache_get(remote_path, version)
+    if cached is not None:
+        return cached
+
+    with storage_breaker.call():
+        data = get_storage().download(remote_path)
+    _cache_put(remote_path, version, data)
+    return data
+
+def _cached_slices(data: bytes, chunk_size: int, start: int, end: int = None):
+    view = memoryview(data)[start:None if end is None else end + 1]
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset:offset + chunk_size]
+
+
+def download_stream(remote_path: str, chunk_size: int = 64 * 1024, start: int = 0, end: int = None, version: str = None):
+    """
+    Yield an object's bytes as they arrive instead of materializing it,
+    optionally only the inclusive byte range [start, end]. Served from the
+    disk cache when the object is there under `version`.
+    """
+    cached = _cache_get(remote_path, version)
+    if cached is not None:
+        yield from _cached_slices(cached, chunk_size, start, end)
+        return
+    with storage_breaker.call(timed=False):
+        yield from get_storage().stream(remote_path, chunk_size, start, end)
 
 # def get_url(remote_path: str) -> str:
 #     resp = supabase.storage.from_(SUPABASE_BUCKET).get_public_url(remote_path)
@@ -59,102 +132,165 @@ def download_to_bytes(remote_path: str) -> bytes:
 #         return resp.get("publicUrl") or resp.get("public_url") or resp.get("publicURL")
 #     return str(resp)
 
-import time
-from typing import Optional
-
 def _safe_create_signed_url(path: str, ttl: int) -> Optional[str]:
     """
-    Create a signed URL safely with minimal retry.
-    Returns None if it fails.
+    Signed URL from the storage backend, or None if signing failed. What it
+    points at is backend-dependent: Supabase and S3 sign their own URLs,
+    while LocalStorage hands out an HMAC-signed /media URL served by this
+    API.
     """
-    try:
-        res = supabase.storage.from_(SUPABASE_BUCKET).create_signed_url(path, ttl)
-        return res.get("signedURL") or res.get("signed_url")
-    except Exception:
-        # One lightweight retry (new TLS connection)
-        try:
-            res = supabase.storage.from_(SUPABASE_BUCKET).create_signed_url(path, ttl)
-            return res.get("signedURL") or res.get("signed_url")
-        except Exception as e:
-            print(f"[SignedURL] Failed for {path}: {e}")
-            return None
+    with storage_breaker.call() as call:
+        url = get_storage().sign(path, ttl)
+        call.failed = url is None
+    return url
 
 
-def build_playlist_response(job: dict, signed_url_ttl: int = 300):
-    pages = job.get("pages", {})
+def create_signed_urls(paths: list, ttl: int) -> dict:
+    """
+    Sign many objects at once (bulk API where the backend has one).
+    Returns {path: url or None}.
+    """
+    with storage_breaker.call() as call:
+        signed = get_storage().sign_many(paths, ttl)
+        call.failed = bool(signed) and not any(signed.values())
+    return signed
 
-    def page_sort_key(k: str) -> int:
-        return int(k.split("_")[-1])
 
-    ordered_keys = sorted(pages.keys(), key=page_sort_key)
+def self_signed_urls(paths: list, ttl: int, versions: dict = None) -> dict:
+    """
+    {path: (url, expires_at)} as HMAC-signed /media URLs; no network calls.
+    `versions` ({path: version}) are signed into the URLs so /media can
+    serve those objects from the page cache.
+    """
+    # Rounded up to the minute so repeated playlists hand out identical,
+    # browser-cacheable URLs
+    expires_at = -(-(int(time.time()) + ttl) // 60) * 60
+    versions = versions or {}
+    return {p: (media_url(p, expires_at, versions.get(p)), expires_at) for p in paths if p}
 
-    now = int(time.time())
-    expires_at = now + signed_url_ttl
 
-    playlist = []
+def signed_urls(paths: list, ttl: int, versions: dict = None) -> dict:
+    """
+    {path: (url, expires_at)}, reusing cached URLs and bulk-signing the rest.
+    Paths that could not be signed map to None.
+    """
+    if SIGNED_URL_MODE == "api":
+        return self_signed_urls(paths, ttl, versions)
+    paths = list(dict.fromkeys(p for p in paths if p))
+    found = signed_url_cache.get_many(paths, ttl)
+    missing = [p for p in paths if p not in found]
+    if missing:
+        expires_at = int(time.time()) + ttl
+        fresh = {p: (url, expires_at) if url else None for p, url in create_signed_urls(missing, ttl).items()}
+        signed_url_cache.put_many(fresh, ttl)
+        found.update(fresh)
+    return found
+
+
+def playlist_entries(job: dict, signed: dict, keys=None) -> tuple:
+    """
+    Build playlist rows from signed_urls() output, in page order (or `keys`
+    order). Pages whose audio URL failed are left out. Returns
+    (rows, failed_url_count).
+    """
+    pages = job.get("pages", {})
+    if keys is None:
+        keys = [key for key, _ in ordered_pages(pages)]
 
-    for key in ordered_keys:
+    playlist = []
+    failed = 0
+    for key in keys:
         page = pages[key]
-
         audio_path = page.get("audio_path")
         if not audio_path:
             continue
 
-        audio_url = _safe_create_signed_url(audio_path, signed_url_ttl)
-        if not audio_url:
+        sync_path = page.get("sync_path")
+        sync = signed.get(sync_path) if sync_path else None
+        if sync_path and not sync:
+            failed += 1
+
+        audio = signed.get(audio_path)
+        if not audio:
             # Skip page if audio URL fails
+            failed += 1
             continue
 
-        sync_url = None
-        sync_path = page.get("sync_path")
-        if sync_path:
-            sync_url = _safe_create_signed_url(sync_path, signed_url_ttl)
-
         playlist.append({
             "page": key,
-            "audio_url": audio_url,
-            "sync_url": sync_url,
+            "audio_url": audio[0],
+            "sync_url": sync[0] if sync else None,
             "duration": page.get("duration", 0),
-            "expires_at": expires_at
+            "expires_at": min(audio[1], sync[1]) if sync else audio[1]
         })
+    return playlist, failed
+
+
+def playlist_paths(job: dict, keys=None) -> list:
+    pages = job.get("pages", {})
+    if keys is None:
+        keys = [key for key, _ in ordered_pages(pages)]
+    paths = []
+    for key in keys:
+        page = pages[key]
+        if page.get("audio_path"):
+            paths.append(page["audio_path"])
+            if page.get("sync_path"):
+                paths.append(page["sync_path"])
+    return paths
+
+
+def playlist_versions(job: dict, keys=None) -> dict:
+    """
+    {path: cache version} for the objects in playlist_paths.
+    """
+    pages = job.get("pages", {})
+    if keys is None:
+        keys = list(pages)
+    versions = {}
+    for key in keys:
+        page = pages[key]
+        for field in ("audio_path", "sync_path"):
+            if page.get(field):
+                versions[page[field]] = page_cache_version(job, page)
+    return versions
+
+
+def build_playlist_response(job: dict, signed_url_ttl: int = 300):
+    signed = signed_urls(playlist_paths(job), signed_url_ttl, playlist_versions(job))
+    playlist, failed = playlist_entries(job, signed)
 
     return {
         "job_id": job.get("job_id"),
         "title": job.get("title"),
-        "pages": playlist
+        "pages": playlist,
+        "failed_urls": failed
     }
 
 
 def list_files(folder: str):
     """
-    List files in Supabase storage folder robustly.
-    Returns list of metadata dicts.
+    List every entry in a storage folder, paging through large folders.
+    Returns list of {"name", "size"} dicts (size is None for sub-folders).
     """
-    if not folder.endswith("/"):
-        folder = folder + "/"
-
-    # Try simple list first
-    try:
-        result = supabase.storage.from_(SUPABASE_BUCKET).list(folder)
-        return result or []
-    except Exception:
-        # fallback to paginated listing if client supports 'limit' and 'offset'
-        items = []
-        limit = 1000
-        offset = 0
-        while True:
-            try:
-                batch = supabase.storage.from_(SUPABASE_BUCKET).list(folder, {"limit": limit, "offset": offset})
-            except Exception:
-                # if vendor client doesn't support offset, re-raise original
-                break
-            if not batch:
-                break
-            items.extend(batch)
-            if len(batch) < limit:
-                break
-            offset += limit
-        return items
+    items = []
+    limit = 1000
+    offset = 0
+    while True:
+        with storage_breaker.call():
+            batch = get_storage().list(folder, limit, offset)
+        items.extend(batch)
+        if len(batch) < limit:
+            return items
+        offset += limit
+
+def file_sizes(folder: str, page_size: int = 1000) -> dict:
+    """
+    Return {file_name: size_in_bytes} for every object directly in a folder.
+    Pages through the listing explicitly so large folders are not truncated.
+    """
+    with storage_breaker.call():
+        return get_storage().sizes(folder, page_size)
 
 def extract_storage_path(public_url: str) -> str:
     marker = f"/storage/v1/object/public/{SUPABASE_BUCKET}/"
@@ -164,37 +300,154 @@ def extract_storage_path(public_url: str) -> str:
 
 def delete_file(path: str) -> bool:
     """
-    Delete a single file from Supabase storage.
+    Delete a single file from storage.
     Returns True if deleted successfully, False otherwise.
     """
-    try:
-        # Supabase expects a list of paths
-        res = supabase.storage.from_(SUPABASE_BUCKET).remove([path])
-        # `res` is usually a list of removed file info; empty list means success
-        return True
-    except Exception as e:
-        print(f"[Supabase] Failed to delete {path}: {e}")
-        return False
+    page_cache.invalidate(path)
+    with storage_breaker.call() as call:
+        call.failed = not get_storage().remove(path)
+    return not call.failed
 
 
-def delete_folder(folder: str) -> dict:
+def walk_files(folder: str, recursive: bool = True, name_prefix: str = "") -> list:
+    """
+    Full paths of every object under `folder`, paging through each listing.
+    `name_prefix` restricts the top level, e.g. "202401" under a folder of
+    date-prefixed job folders.
     """
-    Delete all files in a folder from Supabase storage.
-    Returns a dict with {deleted: [...], failed: [...]}.
+    paths = []
+    pending = [(folder.strip("/"), name_prefix)]
+    while pending:
+        current, prefix = pending.pop()
+        for item in list_files(current):
+            if not item["name"].startswith(prefix):
+                continue
+            path = f"{current}/{item['name']}" if current else item["name"]
+            if item["size"] is not None:
+                paths.append(path)
+            elif recursive:
+                pending.append((path, ""))
+    return paths
+
+
+def delete_folder(folder: str, recursive: bool = True, name_prefix: str = "") -> dict:
     """
-    if not folder.endswith("/"):
-        folder = folder + "/"
+    Delete every object under a folder in batches of DELETE_BATCH_SIZE,
+    STORAGE_DELETE_WORKERS batches at a time. The listing is taken in full
+    before anything is removed so offsets don't shift underneath it.
+    Returns {"deleted": count, "failed": count, "failed_paths": [...]}.
+    """
+    paths = walk_files(folder, recursive, name_prefix)
+    for path in paths:
+        page_cache.invalidate(path)
+
+    storage = get_storage()
+
+    def remove_batch(batch: list) -> dict:
+        with storage_breaker.call(timed=False) as call:
+            result = storage.remove_many(batch)
+            call.failed = not result["deleted"]
+        return result
 
-    deleted = []
+    batches = [paths[i:i + DELETE_BATCH_SIZE] for i in range(0, len(paths), DELETE_BATCH_SIZE)]
+    deleted = 0
     failed = []
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(STORAGE_DELETE_WORKERS, len(batches))) as pool:
+            for result in pool.map(remove_batch, batches):
+                deleted += len(result["deleted"])
+                failed.extend(result["failed"])
 
-    files = list_files(folder)
-    for file in files:
-        # Each file item has a 'name' field with the full path relative to bucket
-        file_path = file.get("name") or file.get("path") or file
-        if delete_file(file_path):
-            deleted.append(file_path)
-        else:
-            failed.append(file_path)
+    logger.info("[Storage] Deleted %s objects under %s/%s* (%d failed)", deleted, folder, name_prefix, len(failed))
+    return {"deleted": deleted, "failed": len(failed), "failed_paths": failed}
+
+
+# -------------------------
+# Async storage access
+# -------------------------
+async def close_async_http():
+    await get_storage().aclose()
+
+
+async def adownload_to_bytes(remote_path: str, version: str = None) -> bytes:
+    cached = await asyncio.to_thread(_cache_get, remote_path, version)
+    if cached is not None:
+        return cached
+
+    with storage_breaker.call():
+        data = await get_storage().adownload(remote_path)
+    await asyncio.to_thread(_cache_put, remote_path, version, data)
+    return data
+
+
+async def adownload_stream(remote_path: str, chunk_size: int = 64 * 1024, start: int = 0, end: int = None, version: str = None):
+    """
+    Async twin of download_stream.
+    """
+    cached = await asyncio.to_thread(_cache_get, remote_path, version)
+    if cached is not None:
+        for chunk in _cached_slices(cached, chunk_size, start, end):
+            yield chunk
+        return
+
+    chunks = get_storage().astream(remote_path, chunk_size, start, end)
+    try:
+        with storage_breaker.call(timed=False):
+            async for chunk in chunks:
+                yield chunk
+    finally:
+        await chunks.aclose()
+
+
+async def adownload_range(remote_path: str, start: int, end: int, version: str = None) -> bytes:
+    """
+    Bytes [start, end] of an object; short if the object is smaller.
+    """
+    return b"".join([bytes(c) async for c in adownload_stream(remote_path, 256 * 1024, start, end, version)])
+
+
+async def aobject_size(remote_path: str) -> int:
+    with storage_breaker.call():
+        return await get_storage().asize(remote_path)
+
+
+async def afile_sizes(folder: str, page_size: int = 1000) -> dict:
+    with storage_breaker.call():
+        return await get_storage().asizes(folder, page_size)
 
-    return {"deleted": deleted, "failed": failed}
+
+async def _asafe_create_signed_url(path: str, ttl: int) -> Optional[str]:
+    """
+    Async twin of _safe_create_signed_url.
+    """
+    with storage_breaker.call() as call:
+        url = await get_storage().asign(path, ttl)
+        call.failed = url is None
+    return url
+
+
+async def acreate_signed_urls(paths: list, ttl: int) -> dict:
+    """
+    Async twin of create_signed_urls.
+    """
+    with storage_breaker.call() as call:
+        signed = await get_storage().asign_many(paths, ttl)
+        call.failed = bool(signed) and not any(signed.values())
+    return signed
+
+
+async def asigned_urls(paths: list, ttl: int, versions: dict = None) -> dict:
+    """
+    Async twin of signed_urls.
+    """
+    if SIGNED_URL_MODE == "api":
+        return self_signed_urls(paths, ttl, versions)
+    paths = list(dict.fromkeys(p for p in paths if p))
+    found = await asyncio.to_thread(signed_url_cache.get_many, paths, ttl)
+    missing = [p for p in paths if p not in found]
+    if missing:
+        expires_at = int(time.time()) + ttl
+        fresh = {p: (url, expires_at) if url else None for p, url in (await acreate_signed_urls(missing, ttl)).items()}
+        await asyncio.to_thread(signed_url_cache.put_many, fresh, ttl)
+        found.update(fresh)
+    return found
@@ -0,0 +1,78 @@
+import functools
+import os
+import sys
+
+import pytest
+
+# Modules live at the repo root; make them importable however pytest is run
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Clients are created at import time; nothing below talks to them
+os.environ.setdefault("SUPABASE_URL", "http://storage.test")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+
+class PageStore(dict):
+    """
+    {storage path: bytes}; `downloads` lists every path fetched, `ranges`
+    every (path, start, end) range read and `manifest` the entries recorded
+    by key.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.downloads = []
+        self.ranges = []
+        self.manifest = {}
+
+    async def download(self, path: str, version: str = None) -> bytes:
+        self.downloads.append(path)
+        return self[path]
+
+    async def download_range(self, path: str, start: int, end: int, version: str = None) -> bytes:
+        self.ranges.append((path, start, end))
+        return self[path][start:end + 1]
+
+    async def file_sizes(self, folder: str) -> dict:
+        prefix = folder + "/"
+        return {path[len(prefix):]: len(data) for path, data in self.items() if path.startswith(prefix)}
+
+    async def record_manifest(self, job_id: str, key: str, path: str, wav_bytes: bytes) -> dict:
+        from audio.manifest import manifest_entry
+
+        self.manifest[key] = manifest_entry(key, path, wav_bytes)
+        return self.manifest[key]
+
+
+@pytest.fixture
+def page_store(monkeypatch):
+    """
+    Serve audio.service's storage reads from a PageStore.
+    """
+    import audio.service as service
+
+    store = PageStore()
+    service._plan_cache.clear()
+    monkeypatch.setattr(service, "adownload_to_bytes", store.download)
+    monkeypatch.setattr(service, "adownload_range", store.download_range)
+    monkeypatch.setattr(service, "afile_sizes", store.file_sizes)
+    monkeypatch.setattr(service, "arecord_page_manifest", store.record_manifest)
+    # Its default fetch was bound at import
+    monkeypatch.setattr(service, "prefetch_ordered", functools.partial(service.prefetch_ordered, fetch=store.download))
+    return store
+
+
+@pytest.fixture
+def storage_server(monkeypatch):
+    """
+    Connect a SupabaseStorage to an in-process handler instead of the network.
+    """
+    import httpx
+    from storage.supabase_backend import SupabaseStorage
+
+    def connect(handler) -> SupabaseStorage:
+        client = httpx.Client
+        monkeypatch.setattr(httpx, "Client", lambda **kwargs: client(transport=httpx.MockTransport(handler), **kwargs))
+        return SupabaseStorage("http://storage.test", "test-key")
+
+    return connect
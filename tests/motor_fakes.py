@@ -0,0 +1,25 @@
+class AsyncCollection:
+    """
+    Motor-style async view of a (mongomock) collection.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        async def cursor():
+            for doc in self.collection.find(*args, **kwargs):
+                yield doc
+        return cursor()
+
+    async def bulk_write(self, requests, ordered=True):
+        # mongomock can't take the UpdateOne of current pymongo versions
+        for op in requests:
+            self.collection.update_one(op._filter, op._doc, upsert=op._upsert)
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
@@ -0,0 +1,207 @@
+import asyncio
+import os
+
+import pytest
+
+import audio.service as service
+from wavs import collect
+
+
+def job_of(*pages, **fields) -> dict:
+    return {"job_id": "job", **fields, "pages": {
+        f"page_{n}": {"audio_path": f"audio/job/{name}.wav", "duration": duration}
+        for n, (name, duration) in enumerate(pages, start=1)
+    }}
+
+
+async def chunks_of(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class Jobs:
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+@pytest.fixture
+def artifact_store(monkeypatch):
+    """
+    Run artifact uploads inline and record them.
+    """
+    stored = {}
+    jobs = Jobs()
+
+    def upload_file(local_path, remote_path, content_type, upsert=False):
+        with open(local_path, "rb") as f:
+            stored[remote_path] = f.read()
+
+    class Inline:
+        def submit(self, fn, *args):
+            fn(*args)
+
+    monkeypatch.setattr(service, "_artifact_pool", Inline())
+    monkeypatch.setattr(service, "upload_file", upload_file)
+    monkeypatch.setattr(service, "delete_file", lambda path: stored.pop(path, None))
+    monkeypatch.setattr(service, "jobs_collection", jobs)
+    return stored, jobs
+
+
+def sizes_of(job: dict, size: int = 100) -> dict:
+    return {page["audio_path"]: size for page in job["pages"].values()}
+
+
+def test_digest_tracks_pages_and_format():
+    job = job_of(("a", 1.0), ("b", 2.0))
+    digest = service.assembly_digest(job, sizes_of(job))
+    assert digest == service.assembly_digest(job_of(("a", 1.0), ("b", 2.0)), sizes_of(job))
+    assert digest != service.assembly_digest(job_of(("a", 1.0), ("b", 2.5)), sizes_of(job))
+    assert digest != service.assembly_digest(job_of(("b", 2.0), ("a", 1.0)), sizes_of(job))
+    assert digest != service.assembly_digest(job_of(("a", 1.0)), sizes_of(job))
+    assert digest != service.assembly_digest(job, sizes_of(job), "mp3")
+
+
+def test_digest_tracks_pages_rewritten_in_place():
+    job = job_of(("a", 1.0), ("b", 2.0))
+    assert service.assembly_digest(job, sizes_of(job, 100)) != service.assembly_digest(job, sizes_of(job, 102))
+    # Without a size the key could miss a rewrite, so there is none
+    assert service.assembly_digest(job, {"audio/job/a.wav": 100}) is None
+
+
+def test_complete_download_is_stored(artifact_store):
+    stored, jobs = artifact_store
+    job = job_of(("a", 1.0))
+    digest = service.assembly_digest(job, sizes_of(job))
+    body = asyncio.run(collect(service.tee_to_artifact(chunks_of(b"ab", b"cd"), job, digest)))
+
+    path = service.artifact_path(job, digest)
+    assert path.startswith("audio/job/assembled/")
+    assert stored == {path: body}
+    record = jobs.updates[0][1]["$set"]["assembled_audio.wav"]
+    assert (record["hash"], record["path"], record["size"]) == (digest, path, 4)
+
+
+def test_aborted_download_is_discarded(artifact_store, tmp_path, monkeypatch):
+    stored, jobs = artifact_store
+    monkeypatch.setattr(service.tempfile, "tempdir", str(tmp_path))
+
+    async def abort():
+        chunks = service.tee_to_artifact(chunks_of(b"ab", b"cd"), job_of(("a", 1.0)), "digest")
+        await chunks.__anext__()
+        await chunks.aclose()
+
+    asyncio.run(abort())
+
+    assert stored == {} and jobs.updates == []
+    assert os.listdir(tmp_path) == []
+
+
+def stored_job(*pages) -> dict:
+    job = job_of(*pages)
+    job["assembled_audio"] = {"wav": {
+        "hash": service.assembly_digest(job, sizes_of(job)), "path": "stored.wav", "size": 48
+    }}
+    return job
+
+
+def test_current_artifact_is_streamed(monkeypatch):
+    job = stored_job(("a", 1.0))
+    monkeypatch.setattr(service, "adownload_stream", lambda path: chunks_of(path.encode()))
+
+    chunks, length = service.download_body(job, None, sizes_of(job))
+    assert (asyncio.run(collect(chunks)), length) == (b"stored.wav", 48)
+
+    assert service.cached_artifact(job, sizes_of(job, 90)) is None
+    job["pages"]["page_1"]["duration"] = 1.5
+    assert service.cached_artifact(job, sizes_of(job)) is None
+
+
+def test_artifact_hit_skips_planning(page_store, monkeypatch):
+    async def get_wav_plan(job):
+        raise AssertionError("planned despite a stored artifact")
+
+    monkeypatch.setattr(service, "get_wav_plan", get_wav_plan)
+    job = stored_job(("a", 1.0))
+    page_store["audio/job/a.wav"] = bytes(100)
+
+    assert asyncio.run(service.download_plan(job)) == (None, sizes_of(job))
+    assert asyncio.run(service.download_plan(job, "mp3"))[0] is None
+    assert page_store.downloads == []
+
+
+def test_compressed_download_encodes_the_stored_wav(artifact_store, monkeypatch):
+    job = stored_job(("a", 1.0))
+    monkeypatch.setattr(service, "adownload_stream", lambda path: chunks_of(path.encode()))
+
+    async def transcode_stream(chunks, fmt):
+        async for chunk in chunks:
+            yield fmt.encode() + b":" + chunk
+
+    monkeypatch.setattr(service, "transcode_stream", transcode_stream)
+
+    chunks, length = service.download_body(job, None, sizes_of(job), "mp3")
+    assert (asyncio.run(collect(chunks)), length) == (b"mp3:stored.wav", None)
+    stored, _ = artifact_store
+    assert list(stored.values()) == [b"mp3:stored.wav"]
+
+
+class Credits:
+    def __init__(self):
+        self.balance = 100
+
+    def adjust(self, amount: int):
+        async def apply():
+            self.balance += amount
+        return apply
+
+
+async def failing(*chunks):
+    for chunk in chunks:
+        yield chunk
+    raise RuntimeError("storage down")
+
+
+def test_download_is_charged_once_it_starts():
+    credits = Credits()
+
+    async def run():
+        body = await service.charge_when_started(chunks_of(b"ab", b"cd"), credits.adjust(-20), credits.adjust(20))
+        assert credits.balance == 80
+        return await collect(body)
+
+    assert asyncio.run(run()) == b"abcd"
+    assert credits.balance == 80
+
+
+def test_body_that_cannot_start_is_not_charged():
+    credits = Credits()
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.charge_when_started(failing(), credits.adjust(-20), credits.adjust(20)))
+    assert credits.balance == 100
+
+
+def test_body_failing_midway_is_refunded():
+    credits = Credits()
+
+    async def run():
+        body = await service.charge_when_started(failing(b"ab"), credits.adjust(-20), credits.adjust(20))
+        await collect(body)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+    assert credits.balance == 100
+
+
+def test_client_leaving_midway_stays_charged():
+    credits = Credits()
+
+    async def run():
+        body = await service.charge_when_started(chunks_of(b"ab", b"cd"), credits.adjust(-20), credits.adjust(20))
+        await body.__anext__()
+        await body.aclose()
+
+    asyncio.run(run())
+    assert credits.balance == 80
@@ -0,0 +1,85 @@
+import asyncio
+import io
+import wave
+
+import pytest
+from fastapi import HTTPException
+
+import audio.service as service
+from utils import wav_header
+from wavs import audio_pages, collect, read_wav
+
+
+def assemble(pages: dict) -> bytes:
+    async def run():
+        plan = await service.plan_wav_assembly(pages, {})
+        body = await collect(service.iter_wav_stream(plan))
+        assert len(body) == service.wav_content_length(plan)
+        return body
+    return asyncio.run(run())
+
+
+def test_wav_header_matches_wave_module():
+    header = wav_header(2, 2, 22050, 400)
+    assert len(header) == 44
+    assert header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+    with wave.open(io.BytesIO(header + bytes(400)), "rb") as w:
+        assert (w.getnchannels(), w.getsampwidth(), w.getframerate(), w.getnframes()) == (2, 2, 22050, 100)
+
+
+def test_fit_pcm():
+    assert bytes(service.fit_pcm(memoryview(b"abcd"), 2)) == b"ab"
+    assert bytes(service.fit_pcm(memoryview(b"ab"), 4)) == b"ab\0\0"
+
+
+def test_pages_in_numeric_order(page_store):
+    pages = audio_pages(page_store, {"page_10": b"\3\0" * 5, "page_2": b"\2\0" * 10, "page_1": b"\1\0" * 20})
+    params, pcm = read_wav(assemble(pages))
+    assert params == (1, 2, 24000)
+    assert pcm == b"\1\0" * 20 + b"\2\0" * 10 + b"\3\0" * 5
+
+
+def test_works_without_listing(page_store, monkeypatch):
+    pages = audio_pages(page_store, {"page_1": b"\1\0" * 4, "page_2": b"\2\0" * 6})
+
+    async def unavailable(folder):
+        raise RuntimeError("listing down")
+
+    monkeypatch.setattr(service, "afile_sizes", unavailable)
+    assert read_wav(assemble(pages))[1] == b"\1\0" * 4 + b"\2\0" * 6
+
+
+def test_no_audio_pages(page_store):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(service.plan_wav_assembly({"page_1": {}}, {}))
+    assert exc.value.status_code == 404
+
+
+def test_unreadable_page_is_streamed_as_silence(page_store):
+    pages = audio_pages(page_store, {"page_1": b"\1\0" * 10, "page_2": b"\2\0" * 10, "page_3": b"\3\0" * 10})
+    plan = asyncio.run(service.plan_wav_assembly(pages, {}))
+    page_store["audio/job/page_2.wav"] = b"not a wav at all" + bytes(44)
+
+    body = asyncio.run(collect(service.iter_wav_stream(plan)))
+    assert len(body) == service.wav_content_length(plan)
+    assert read_wav(body)[1] == b"\1\0" * 10 + bytes(20) + b"\3\0" * 10
+
+
+def test_page_with_extra_chunks_keeps_its_own_layout(page_store):
+    pages = audio_pages(page_store, {"page_1": b"\1\0" * 10, "page_2": b"\2\0" * 10})
+    # A LIST chunk ahead of `data` pushes page 2's PCM back 20 bytes
+    info = b"INFOsoftware"
+    page_store["audio/job/page_2.wav"] = (
+        wav_header(1, 2, 24000, 20)[:36] + b"LIST" + len(info).to_bytes(4, "little") + info
+        + wav_header(1, 2, 24000, 20)[36:] + b"\2\0" * 10
+    )
+    assert read_wav(assemble(pages))[1] == b"\1\0" * 10 + b"\2\0" * 10
+
+
+def test_mixed_formats_are_refused(page_store):
+    pages = audio_pages(page_store, {"page_1": b"\1\0" * 10})
+    pages.update(audio_pages(page_store, {"page_2": b"\2\0" * 10}, rate=16000))
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(service.get_wav_plan({"job_id": "mixed", "pages": pages}))
+    assert exc.value.status_code == 422
@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+
+from storage.base import ObjectNotFound, StorageUnavailable
+from storage.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+def breaker(**kwargs) -> CircuitBreaker:
+    options = dict(window=10, min_calls=4, failure_rate=0.5, slow_ms=1000, cooldown=30, half_open_calls=2)
+    return CircuitBreaker(**{**options, **kwargs})
+
+
+def fail(cb: CircuitBreaker):
+    with pytest.raises(RuntimeError):
+        with cb.call():
+            raise RuntimeError("boom")
+
+
+def succeed(cb: CircuitBreaker):
+    with cb.call():
+        pass
+
+
+def test_opens_at_failure_rate(clock):
+    cb = breaker()
+    succeed(cb)
+    fail(cb)
+    succeed(cb)
+    assert cb.state == CLOSED  # below min_calls
+    fail(cb)
+    assert cb.state == OPEN
+
+    with pytest.raises(StorageUnavailable):
+        succeed(cb)
+    assert cb.rejected == 1
+    assert cb.retry_after() == 30
+
+
+def test_expected_errors_and_slow_calls(clock):
+    cb = breaker()
+    for _ in range(4):
+        with pytest.raises(ObjectNotFound):
+            with cb.call():
+                raise ObjectNotFound("missing")
+    assert cb.state == CLOSED
+
+    for _ in range(4):
+        cb.record(True, ms=5000)
+    assert cb.state == OPEN
+
+
+def test_half_open_closes_after_good_probes(clock):
+    cb = breaker()
+    for _ in range(4):
+        fail(cb)
+    clock.now += 30
+
+    succeed(cb)
+    assert cb.state == HALF_OPEN
+    succeed(cb)
+    assert cb.state == CLOSED
+    assert cb.snapshot()["window_calls"] == 0
+
+
+def test_half_open_reopens_on_bad_probe(clock):
+    cb = breaker()
+    for _ in range(4):
+        fail(cb)
+    clock.now += 30
+
+    fail(cb)
+    assert cb.state == OPEN
+    assert cb.trips == 2
+
+
+def test_half_open_limits_probes(clock):
+    cb = breaker()
+    for _ in range(4):
+        fail(cb)
+    clock.now += 30
+
+    assert cb.before_call() is True
+    assert cb.before_call() is True
+    with pytest.raises(StorageUnavailable):
+        cb.before_call()
+
+
+def test_cancelled_probe_hands_its_slot_back(clock):
+    cb = breaker(half_open_calls=1)
+    for _ in range(4):
+        fail(cb)
+    clock.now += 30
+
+    with pytest.raises(asyncio.CancelledError):
+        with cb.call():
+            raise asyncio.CancelledError()
+    assert cb.state == HALF_OPEN
+    assert cb.before_call() is True
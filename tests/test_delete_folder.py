@@ -0,0 +1,46 @@
+import pytest
+
+import supabase_client
+from storage.local_backend import LocalStorage
+
+
+class CountingStorage(LocalStorage):
+    def __init__(self, root: str):
+        super().__init__(root)
+        self.batches = []
+
+    def remove_many(self, paths: list) -> dict:
+        self.batches.append(len(paths))
+        return super().remove_many(paths)
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    storage = CountingStorage(str(tmp_path))
+    monkeypatch.setattr(supabase_client, "get_storage", lambda: storage)
+    monkeypatch.setattr(supabase_client, "DELETE_BATCH_SIZE", 3)
+    for folder in ("20240101_a", "20240102_b", "20240201_c"):
+        for n in range(2):
+            storage.upload(f"pdfs/{folder}/page_{n}.pdf", b"%PDF")
+        storage.upload(f"pdfs/{folder}/split/page_1.pdf", b"%PDF")
+    return storage
+
+
+def test_walk_descends_into_sub_folders(bucket):
+    paths = supabase_client.walk_files("pdfs/20240101_a")
+    assert sorted(paths) == [
+        "pdfs/20240101_a/page_0.pdf", "pdfs/20240101_a/page_1.pdf", "pdfs/20240101_a/split/page_1.pdf"
+    ]
+    assert supabase_client.walk_files("pdfs/20240101_a", recursive=False) == [
+        "pdfs/20240101_a/page_0.pdf", "pdfs/20240101_a/page_1.pdf"
+    ]
+
+
+def test_delete_folder_removes_in_batches(bucket):
+    result = supabase_client.delete_folder("pdfs", name_prefix="202401")
+
+    assert result == {"deleted": 6, "failed": 0, "failed_paths": []}
+    assert sorted(bucket.batches) == [3, 3]
+    assert sorted(supabase_client.walk_files("pdfs")) == [
+        "pdfs/20240201_c/page_0.pdf", "pdfs/20240201_c/page_1.pdf", "pdfs/20240201_c/split/page_1.pdf"
+    ]
@@ -0,0 +1,108 @@
+import os
+import time
+
+from disk_cache import DiskCache
+
+
+def test_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10_000)
+    assert cache.get("a") is None
+    cache.put("a", b"hello")
+    assert cache.get("a") == b"hello"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+
+def test_versions_are_kept_apart_and_invalidated_together(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10_000)
+    cache.put("audio/p1.wav", b"first", "1")
+    cache.put("audio/p1.wav", b"second", "2")
+    cache.put("audio/p10.wav", b"other", "1")
+    assert (cache.get("audio/p1.wav", "1"), cache.get("audio/p1.wav", "2")) == (b"first", b"second")
+    assert cache.get("audio/p1.wav") is None
+
+    cache.invalidate("audio/p1.wav")
+    assert cache.get("audio/p1.wav", "1") is None and cache.get("audio/p1.wav", "2") is None
+    assert cache.get("audio/p10.wav", "1") == b"other"
+
+
+def test_disabled_without_budget(tmp_path):
+    cache = DiskCache(str(tmp_path / "off"), max_bytes=0)
+    cache.put("a", b"hello")
+    assert cache.get("a") is None
+    assert not os.path.exists(tmp_path / "off")
+
+
+def test_skips_entries_over_a_quarter_of_budget(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    cache.put("big", b"x" * 300)
+    assert cache.get("big") is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    for i, key in enumerate(["old", "used", "new"]):
+        cache.put(key, bytes(200))
+        os.utime(cache._entry_path(key), (1000 + i, 1000 + i))
+    # A hit makes "used" the most recent
+    assert cache.get("used") is not None
+
+    cache.put("last", bytes(200))
+    cache.put("over", bytes(200))
+
+    assert cache.get("old") is None
+    assert cache.get("used") is not None
+    assert cache.evictions >= 1
+
+
+def test_expires_by_age(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_bytes=10_000, max_age=60)
+    cache.put("a", b"hello")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("a") is None
+    assert not os.path.exists(cache._entry_path("a"))
+
+
+def test_storage_reads_go_through_the_cache(tmp_path, monkeypatch):
+    import supabase_client
+
+    fetched = []
+
+    class Backend:
+        def download(self, path):
+            fetched.append(path)
+            return b"audio:" + path.encode()
+
+    monkeypatch.setattr(supabase_client, "page_cache", DiskCache(str(tmp_path), max_bytes=10_000))
+    monkeypatch.setattr(supabase_client, "get_storage", Backend)
+
+    assert supabase_client.download_to_bytes("audio/p1.wav", "1:2.0") == b"audio:audio/p1.wav"
+    assert supabase_client.download_to_bytes("audio/p1.wav", "1:2.0") == b"audio:audio/p1.wav"
+    assert fetched == ["audio/p1.wav"]
+
+    # A regenerated page comes with a new version; unversioned reads skip the cache
+    supabase_client.download_to_bytes("audio/p1.wav", "2:2.5")
+    supabase_client.download_to_bytes("audio/p1.wav")
+    supabase_client.download_to_bytes("audio/p1.wav")
+    assert fetched == ["audio/p1.wav"] * 4
+
+
+def test_writes_drop_every_cached_version(tmp_path, monkeypatch):
+    import supabase_client
+
+    class Backend:
+        def download(self, path):
+            return b"audio"
+
+        def upload(self, path, data, content_type, upsert):
+            pass
+
+    monkeypatch.setattr(supabase_client, "page_cache", DiskCache(str(tmp_path), max_bytes=10_000))
+    monkeypatch.setattr(supabase_client, "get_storage", Backend)
+
+    supabase_client.download_to_bytes("audio/p1.wav", "1:2.0")
+    supabase_client.upload_bytes("audio/p1.wav", b"new", upsert=True)
+    assert supabase_client.page_cache.get("audio/p1.wav", "1:2.0") is None
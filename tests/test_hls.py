@@ -0,0 +1,79 @@
+import pytest
+from fastapi import HTTPException
+
+from audio.hls import build_hls_playlist, page_segments, segment_wav, validate_hls_params
+from utils import wav_header
+from wavs import read_wav
+
+
+def job_with(durations: dict) -> dict:
+    return {"pages": {
+        key: {"audio_path": f"audio/{key}.wav", "duration": duration}
+        for key, duration in durations.items()
+    }}
+
+
+def test_page_segments():
+    assert page_segments(25, 0) == [25]
+    assert page_segments(8, 10) == [8]
+    assert page_segments(25, 10) == [10, 10, 5]
+
+
+def test_playlist_in_page_order():
+    playlist = build_hls_playlist(job_with({"page_10": 3, "page_2": 4}), "aac", 0, {"token": "t"})
+    lines = playlist.splitlines()
+
+    assert lines[0] == "#EXTM3U"
+    assert "#EXT-X-TARGETDURATION:4" in lines
+    uris = [line for line in lines if not line.startswith("#")]
+    assert uris == ["page_2/0.aac?token=t&segment=0", "page_10/0.aac?token=t&segment=0"]
+    assert lines[-1] == "#EXT-X-ENDLIST"
+
+
+def test_discontinuity_before_every_segment():
+    playlist = build_hls_playlist(job_with({"page_1": 25, "page_2": 5}), "mp3", 10, {})
+    lines = playlist.splitlines()
+    body = lines[lines.index("#EXT-X-PLAYLIST-TYPE:VOD") + 1:-1]
+
+    assert [line for line in body if line.startswith("#EXTINF")] == [
+        "#EXTINF:10.000,", "#EXTINF:10.000,", "#EXTINF:5.000,", "#EXTINF:5.000,"
+    ]
+    # Each segment is encoded on its own, so every one after the first
+    # starts a new timeline
+    assert body[0] == "#EXTINF:10.000,"
+    assert body.count("#EXT-X-DISCONTINUITY") == 3
+    uris = [line for line in body if not line.startswith("#")]
+    assert uris[1:] == [body[i + 2] for i, line in enumerate(body) if line == "#EXT-X-DISCONTINUITY"]
+
+
+def test_validate_hls_params():
+    assert validate_hls_params(None, 0) == ("aac", 0)
+    for fmt, segment in (("wav", 0), ("aac", 1), ("aac", 61)):
+        with pytest.raises(HTTPException):
+            validate_hls_params(fmt, segment)
+
+
+def test_playlist_skips_pages_without_audio():
+    job = job_with({"page_1": 5, "page_2": 0})
+    job["pages"]["page_3"] = {"duration": 5}
+    playlist = build_hls_playlist(job, "aac", 0, {})
+    assert "page_2/" not in playlist and "page_3/" not in playlist
+
+    with pytest.raises(HTTPException) as exc:
+        build_hls_playlist(job_with({"page_1": 0}), "aac", 0, {})
+    assert exc.value.status_code == 404
+
+
+def test_segment_wav_last_takes_remainder():
+    rate = 100
+    pcm = bytes(range(250)) * 2  # 250 mono 16-bit frames
+    wav = wav_header(1, 2, rate, len(pcm)) + pcm
+
+    _, first = read_wav(segment_wav(wav, 0, 1, 3))
+    params, last = read_wav(segment_wav(wav, 2, 1, 3))
+    assert params == (1, 2, rate)
+    assert first == pcm[:200]
+    assert last == pcm[400:]
+
+    with pytest.raises(HTTPException):
+        segment_wav(wav, 3, 1, 3)
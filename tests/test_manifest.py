@@ -0,0 +1,74 @@
+import asyncio
+
+import mongomock
+
+import audio.manifest as manifest
+import audio.service as service
+from audio.manifest import current_manifest, manifest_entry, missing_manifest_pages, page_durations
+from motor_fakes import AsyncCollection
+from wavs import audio_pages, make_wav
+
+
+def job_with_manifest(store: dict, pcms: dict) -> dict:
+    pages = audio_pages(store, pcms)
+    manifest = [manifest_entry(key, page["audio_path"], store[page["audio_path"]]) for key, page in pages.items()]
+    return {"job_id": "job", "pages": pages, "audio_manifest": sorted(manifest, key=lambda e: e["page"])}
+
+
+def test_manifest_entry():
+    entry = manifest_entry("page_7", "audio/p7.wav", make_wav(b"\0" * 400, channels=2, rate=16000))
+    assert entry["page"] == 7
+    assert (entry["channels"], entry["sample_width"], entry["sample_rate"]) == (2, 2, 16000)
+    assert (entry["frames"], entry["data_offset"], entry["size"]) == (100, 44, 444)
+
+
+def test_stale_manifest_is_ignored(page_store):
+    job = job_with_manifest(page_store, {"page_1": b"\0" * 20, "page_2": b"\0" * 20})
+    assert current_manifest(job) == job["audio_manifest"]
+
+    job["pages"]["page_2"] = {"audio_path": "audio/job/page_2-v2.wav"}
+    assert current_manifest(job) is None
+    assert missing_manifest_pages(job) == [("page_2", "audio/job/page_2-v2.wav")]
+
+    job["pages"]["page_3"] = {"audio_path": "audio/job/page_3.wav"}
+    assert [key for key, _ in missing_manifest_pages(job)] == ["page_2", "page_3"]
+
+
+def test_durations_prefer_the_manifest(page_store):
+    job = job_with_manifest(page_store, {"page_1": b"\0" * 48000})
+    job["pages"]["page_1"]["duration"] = 3
+    job["pages"]["page_2"] = {"audio_path": "audio/job/page_2.wav", "duration": 2.5}
+    assert page_durations(job) == {"page_1": 1.0, "page_2": 2.5}
+
+
+def test_plan_from_current_manifest_needs_no_storage(page_store):
+    pcms = {"page_2": b"\2\0" * 30, "page_1": b"\1\0" * 10}
+    job = job_with_manifest(page_store, pcms)
+    expected = asyncio.run(service.plan_wav_assembly(job["pages"], {}))
+    page_store.downloads.clear()
+
+    plan = asyncio.run(service.get_wav_plan(job))
+    assert page_store.downloads == []
+    assert [e["data_size"] for e in plan["pages"]] == [e["data_size"] for e in expected["pages"]]
+    assert service.plan_header(plan) == service.plan_header(expected)
+
+
+def test_plan_without_manifest_backfills_it(page_store):
+    pages = audio_pages(page_store, {"page_1": b"\1\0" * 10, "page_2": b"\2\0" * 10})
+    asyncio.run(service.backfill_manifest({"job_id": "fresh", "pages": pages}))
+    assert sorted(page_store.manifest) == ["page_1", "page_2"]
+    assert page_store.manifest["page_2"]["frames"] == 10
+
+
+def test_recorded_entries_replace_and_stay_sorted(monkeypatch):
+    jobs = mongomock.MongoClient().db.jobs
+    jobs.insert_one({"job_id": "job", "audio_manifest": []})
+    monkeypatch.setattr(manifest, "async_jobs_collection", AsyncCollection(jobs))
+
+    async def record():
+        for key, pcm in (("page_10", b"\0" * 4), ("page_2", b"\0" * 4), ("page_10", b"\0" * 8)):
+            await manifest.arecord_page_manifest("job", key, f"audio/{key}.wav", make_wav(pcm))
+
+    asyncio.run(record())
+    entries = jobs.find_one({"job_id": "job"})["audio_manifest"]
+    assert [(e["key"], e["frames"]) for e in entries] == [("page_2", 2), ("page_10", 4)]
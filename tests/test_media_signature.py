@@ -0,0 +1,132 @@
+import time
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import media.router as media
+from core.security import media_upload_url, media_url, verify_media_signature
+from storage.base import ObjectExists, ObjectNotFound
+
+
+def signed(url: str) -> tuple:
+    parsed = urlparse(url)
+    query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+    path = unquote(parsed.path.split("/media/", 1)[1])
+    return path, int(query["expires"]), query["sig"], query.get("v")
+
+
+def test_round_trip():
+    path, expires, sig, version = signed(media_url("audio/job 1/page_1.wav", int(time.time()) + 60))
+    assert path == "audio/job 1/page_1.wav"
+    assert version is None
+    assert verify_media_signature(path, expires, sig)
+
+
+def test_rejects_tampering():
+    path, expires, sig, _ = signed(media_url("audio/a.wav", int(time.time()) + 60))
+    assert not verify_media_signature("audio/b.wav", expires, sig)
+    assert not verify_media_signature(path, expires + 1, sig)
+    assert not verify_media_signature(path, expires, sig[:-1] + ("A" if sig[-1] != "A" else "B"))
+    assert not verify_media_signature(path, expires, "")
+    assert not verify_media_signature(path, expires, None)
+
+
+def test_rejects_expired():
+    path, expires, sig, _ = signed(media_url("audio/a.wav", int(time.time()) - 1))
+    assert not verify_media_signature(path, expires, sig)
+
+
+def test_version_is_signed():
+    path, expires, sig, version = signed(media_url("audio/a.wav", int(time.time()) + 60, "3:12.5"))
+    assert version == "3:12.5"
+    assert verify_media_signature(path, expires, sig, version=version)
+    assert not verify_media_signature(path, expires, sig, version="4:12.5")
+    assert not verify_media_signature(path, expires, sig)
+
+
+def test_download_and_upload_links_are_not_interchangeable():
+    expires = int(time.time()) + 60
+    path, _, get_sig, _ = signed(media_url("pdfs/a.pdf", expires))
+    _, _, put_sig, _ = signed(media_upload_url("pdfs/a.pdf", expires))
+    assert verify_media_signature(path, expires, put_sig, "PUT")
+    assert not verify_media_signature(path, expires, get_sig, "PUT")
+    assert not verify_media_signature(path, expires, put_sig)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    objects = {"audio/a.wav": bytes(range(100))}
+    versions = []
+
+    async def size(path):
+        if path not in objects:
+            raise ObjectNotFound(path)
+        return len(objects[path])
+
+    async def stream(path, chunk_size=64 * 1024, start=0, end=None, version=None):
+        versions.append(version)
+        data = objects[path][start:None if end is None else end + 1]
+        for offset in range(0, len(data), 16):
+            yield data[offset:offset + 16]
+
+    def upload_file(local_path, path, content_type="application/octet-stream", upsert=False):
+        if path in objects:
+            raise ObjectExists(path)
+        with open(local_path, "rb") as f:
+            objects[path] = f.read()
+
+    monkeypatch.setattr(media, "aobject_size", size)
+    monkeypatch.setattr(media, "adownload_stream", stream)
+    monkeypatch.setattr(media, "upload_file", upload_file)
+    app = FastAPI()
+    app.include_router(media.router)
+    client = TestClient(app)
+    client.objects = objects
+    client.versions = versions
+    return client
+
+
+def test_media_endpoint_serves_ranges(client):
+    url = media_url("audio/a.wav", int(time.time()) + 60)
+    path = url[url.index("/media/"):]
+
+    full = client.get(path)
+    assert (full.status_code, full.content) == (200, bytes(range(100)))
+    assert full.headers["content-type"] == "audio/wav"
+
+    part = client.get(path, headers={"Range": "bytes=10-19"})
+    assert (part.status_code, part.content) == (206, bytes(range(10, 20)))
+    assert part.headers["content-range"] == "bytes 10-19/100"
+    assert part.headers["content-length"] == "10"
+    assert client.versions == [None, None]
+
+
+def test_media_endpoint_reads_the_signed_version(client):
+    url = media_url("audio/a.wav", int(time.time()) + 60, "2:4.0")
+    assert client.get(url[url.index("/media/"):]).status_code == 200
+    assert client.versions == ["2:4.0"]
+
+
+def test_media_endpoint_reports_missing_objects(client):
+    url = media_url("audio/gone.wav", int(time.time()) + 60)
+    assert client.get(url[url.index("/media/"):]).status_code == 404
+
+
+def test_media_endpoint_rejects_bad_signature(client):
+    url = media_url("audio/a.wav", int(time.time()) + 60)
+    forged = url[url.index("/media/"):].replace("a.wav", "b.wav")
+    assert client.get(forged).status_code == 403
+
+
+def test_media_upload_creates_the_object_once(client):
+    url = media_upload_url("pdfs/job/original.pdf", int(time.time()) + 60)
+    path = url[url.index("/media/"):]
+
+    assert client.put(path, content=b"%PDF-1.7").status_code == 201
+    assert client.objects["pdfs/job/original.pdf"] == b"%PDF-1.7"
+    assert client.put(path, content=b"%PDF-other").status_code == 409
+
+    download = media_url("pdfs/job/other.pdf", int(time.time()) + 60)
+    assert client.put(download[download.index("/media/"):], content=b"%PDF").status_code == 403
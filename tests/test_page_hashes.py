@@ -0,0 +1,87 @@
+import fitz  # PyMuPDF
+
+from pdf_utils import extract_page_texts, page_content_hashes
+
+
+def save(doc, path) -> str:
+    doc.save(str(path))
+    return str(path)
+
+
+def text_pdf(*texts) -> fitz.Document:
+    doc = fitz.open()
+    for text in texts:
+        doc.new_page().insert_text((72, 72), text)
+    return doc
+
+
+def form_pdf(text: str) -> fitz.Document:
+    """
+    A page whose only content is "draw form XObject /fzFrm0", with `text`
+    inside the form.
+    """
+    doc = fitz.open()
+    page = doc.new_page()
+    page.show_pdf_page(page.rect, text_pdf(text), 0)
+    return doc
+
+
+def to_unicode_pdf(target: str) -> fitz.Document:
+    """
+    Same content stream and font as any other, but a ToUnicode map that
+    reads "A" as `target`.
+    """
+    doc = text_pdf("AAAA")
+    font_xref = doc[0].get_fonts()[0][0]
+    cmap_xref = doc.get_new_xref()
+    doc.update_object(cmap_xref, "<<>>")
+    doc.update_stream(cmap_xref, (
+        "/CIDInit /ProcSet findresource begin 12 dict begin begincmap "
+        "1 begincodespacerange <00> <FF> endcodespacerange "
+        f"1 beginbfchar <41> <{ord(target):04X}> endbfchar "
+        "endcmap CMapName currentdict /CMap defineresource pop end end"
+    ).encode())
+    doc.xref_set_key(font_xref, "ToUnicode", f"{cmap_xref} 0 R")
+    return doc
+
+
+def test_same_content_same_hash_across_documents(tmp_path):
+    first = page_content_hashes(save(text_pdf("same", "other"), tmp_path / "a.pdf"))
+    second = page_content_hashes(save(text_pdf("x", "same"), tmp_path / "b.pdf"))
+    assert first[0] == second[1]
+    assert first[0] != first[1]
+
+
+def test_blank_and_image_only_pages_are_flagged(tmp_path):
+    doc = text_pdf("Chapter one")
+    doc.new_page()
+    scan = doc.new_page()
+    scan.insert_image(fitz.Rect(0, 0, 100, 100), pixmap=fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 4, 4)))
+
+    texts = extract_page_texts(save(doc, tmp_path / "book.pdf"), [1, 2, 3])
+    assert texts[1] == {"text": "Chapter one", "chars": 11, "blank": False, "image_only": False}
+    assert (texts[2]["blank"], texts[2]["image_only"]) == (True, False)
+    assert (texts[3]["blank"], texts[3]["image_only"]) == (True, True)
+
+
+def test_form_xobject_contents_are_hashed(tmp_path):
+    public = save(form_pdf("Hello public"), tmp_path / "public.pdf")
+    private = save(form_pdf("Secret private"), tmp_path / "private.pdf")
+    assert fitz.open(public)[0].read_contents() == fitz.open(private)[0].read_contents()
+
+    assert page_content_hashes(public) != page_content_hashes(private)
+    assert page_content_hashes(public) == page_content_hashes(save(form_pdf("Hello public"), tmp_path / "copy.pdf"))
+
+
+def test_to_unicode_map_is_hashed(tmp_path):
+    first = save(to_unicode_pdf("B"), tmp_path / "a.pdf")
+    second = save(to_unicode_pdf("C"), tmp_path / "b.pdf")
+    assert extract_page_texts(first, [1])[1]["text"] != extract_page_texts(second, [1])[1]["text"]
+    assert page_content_hashes(first) != page_content_hashes(second)
+
+
+def test_visible_area_is_hashed(tmp_path):
+    doc = text_pdf("same")
+    plain = page_content_hashes(save(doc, tmp_path / "plain.pdf"))
+    doc[0].set_cropbox(fitz.Rect(0, 0, 50, 50))
+    assert page_content_hashes(save(doc, tmp_path / "cropped.pdf")) != plain
@@ -0,0 +1,145 @@
+import asyncio
+
+import fitz
+import mongomock
+import pytest
+
+import page_text
+import pdf_store
+import pdf_utils
+from motor_fakes import AsyncCollection
+
+PDF_PATH = "pdfs/blobs/abc/1.pdf"
+
+
+def book_pdf() -> bytes:
+    """
+    Pages: text, blank, image only (a scan), text.
+    """
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Chapter one")
+    doc.new_page()
+    doc.new_page().insert_image(fitz.Rect(0, 0, 100, 100), pixmap=fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 4, 4)))
+    doc.new_page().insert_text((72, 72), "The end")
+    return doc.tobytes()
+
+
+@pytest.fixture
+def library(monkeypatch):
+    """
+    The stored book, its job and mongomock page_texts/jobs collections.
+    """
+    db = mongomock.MongoClient().db
+    stored = {PDF_PATH: book_pdf()}
+    downloads = []
+
+    async def download_stream(path):
+        downloads.append(path)
+        yield stored[path]
+
+    async def file_sizes(folder):
+        prefix = folder + "/"
+        return {p[len(prefix):]: len(data) for p, data in stored.items() if p.startswith(prefix)}
+
+    def upload_file(local_path, path, content_type="application/octet-stream", upsert=False):
+        with open(local_path, "rb") as f:
+            stored[path] = f.read()
+
+    pool = pdf_utils.PdfProcessPool(workers=1, max_queue=8)
+    monkeypatch.setattr(page_text, "pdf_pool", pool)
+    monkeypatch.setattr(pdf_utils, "pdf_pool", pool)
+    monkeypatch.setattr(page_text, "async_page_texts_collection", AsyncCollection(db.page_texts))
+    monkeypatch.setattr(page_text, "async_jobs_collection", AsyncCollection(db.jobs))
+    monkeypatch.setattr(pdf_store, "adownload_stream", download_stream)
+    monkeypatch.setattr(pdf_store, "afile_sizes", file_sizes)
+    monkeypatch.setattr(pdf_store, "upload_file", upload_file)
+
+    job = {"job_id": "job", "remote_pdf_path": PDF_PATH}
+    db.jobs.insert_one(dict(job))
+    yield db, job, downloads
+    pool.shutdown()
+
+
+def test_empty_pages_are_skipped_and_tasks_carry_the_text_hash(library, monkeypatch):
+    db, job, downloads = library
+    monkeypatch.setattr(page_text, "PAGE_TASK_VERSION", 3)
+
+    plan = asyncio.run(page_text.plan_page_tasks(job, [1, 2, 3, 4]))
+
+    assert plan["skipped"] == [2]
+    # The whole PDF stays the positional argument; the split page is extra
+    assert [(page, path, kwargs["page_pdf_path"]) for page, path, kwargs in plan["tasks"]] == [
+        (1, PDF_PATH, "pdfs/blobs/abc/1/pages/1.pdf"),
+        (3, PDF_PATH, "pdfs/blobs/abc/1/pages/3.pdf"),
+        (4, PDF_PATH, "pdfs/blobs/abc/1/pages/4.pdf"),
+    ]
+    assert {kwargs["task_version"] for _, _, kwargs in plan["tasks"]} == {3}
+    texts = {doc["_id"]: doc["text"] for doc in db.page_texts.find()}
+    assert [texts[kwargs["text_sha256"]] for _, _, kwargs in plan["tasks"]] == ["Chapter one", "", "The end"]
+    # Indexing and splitting share one download
+    assert downloads == [PDF_PATH]
+
+
+def test_legacy_workers_get_the_original_task_shape(library, monkeypatch):
+    _, job, _ = library
+
+    async def no_split(*args):
+        raise AssertionError("split pages nobody reads")
+
+    monkeypatch.setattr(page_text, "page_sources", no_split)
+    plan = asyncio.run(page_text.plan_page_tasks(job, [1, 2, 3, 4]))
+
+    assert [(page, path) for page, path, _ in plan["tasks"]] == [(1, PDF_PATH), (3, PDF_PATH), (4, PDF_PATH)]
+    assert [kwargs for _, _, kwargs in plan["tasks"]] == [{}, {}, {}]
+
+
+def test_text_hash_waits_for_task_version_3(library, monkeypatch):
+    _, job, _ = library
+    monkeypatch.setattr(page_text, "PAGE_TASK_VERSION", 2)
+
+    plan = asyncio.run(page_text.plan_page_tasks(job, [1, 3]))
+    assert [sorted(kwargs) for _, _, kwargs in plan["tasks"]] == [["page_pdf_path", "task_version"]] * 2
+
+
+def test_index_is_reused_while_the_pdf_is_unchanged(library, monkeypatch):
+    db, job, _ = library
+    first = asyncio.run(page_text.plan_page_tasks(job, [1]))
+    job = db.jobs.find_one({"job_id": "job"})
+
+    async def no_rebuild(*args):
+        raise AssertionError("index was rebuilt")
+
+    monkeypatch.setattr(page_text, "_build_index", no_rebuild)
+    assert asyncio.run(page_text.plan_page_tasks(job, [1])) == first
+
+
+def test_index_built_with_an_older_hash_is_rebuilt(library, monkeypatch):
+    db, job, _ = library
+    asyncio.run(page_text.plan_page_tasks(job, [1]))
+    job = db.jobs.find_one({"job_id": "job"})
+    assert job["text_index"]["hash_version"] == pdf_utils.PAGE_HASH_VERSION
+    job["text_index"]["hash_version"] -= 1
+
+    rebuilt = []
+    build = page_text._build_index
+
+    async def counting_build(*args):
+        rebuilt.append(True)
+        return await build(*args)
+
+    monkeypatch.setattr(page_text, "_build_index", counting_build)
+    asyncio.run(page_text.plan_page_tasks(job, [1]))
+    assert rebuilt == [True]
+
+
+def test_estimate_bills_only_pages_with_something_to_read():
+    index = [
+        {"chars": 100, "blank": False, "image_only": False},
+        {"chars": 0, "blank": True, "image_only": False},
+        {"chars": 0, "blank": True, "image_only": True},
+    ]
+    result = page_text.estimate(index, [1, 2, 3])
+    assert (result["cost"], result["empty_pages"], result["image_only_pages"], result["chars"]) == (
+        2 * page_text.PAGE_COST, 1, 1, 100
+    )
+    assert page_text.estimate(None, [1, 2])["indexed"] is False
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import time
+
+import fitz
+import pytest
+from fastapi import HTTPException
+
+import pdf_utils
+from pdf_utils import PdfProcessPool
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = PdfProcessPool(workers=1, max_queue=1)
+    monkeypatch.setattr(pdf_utils, "pdf_pool", pool)
+    yield pool
+    pool.shutdown()
+
+
+def test_pages_are_counted_in_the_pool(pool, tmp_path):
+    doc = fitz.open()
+    for _ in range(3):
+        doc.new_page()
+    doc.save(tmp_path / "book.pdf")
+
+    assert asyncio.run(pdf_utils.count_pages(str(tmp_path / "book.pdf"))) == 3
+    assert pool.stats()["completed"] == 1
+
+
+def test_unreadable_pdf_is_a_client_error(pool, tmp_path):
+    (tmp_path / "broken.pdf").write_bytes(b"%PDF-1.7 not really")
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(pdf_utils.count_pages(str(tmp_path / "broken.pdf")))
+    assert exc.value.status_code == 400
+    assert pool.stats()["failed"] == 1
+
+
+def test_crashed_worker_is_replaced(pool, tmp_path):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(pool.run(os._exit, 1))
+    assert exc.value.status_code == 503
+
+    doc = fitz.open()
+    doc.new_page()
+    doc.save(tmp_path / "book.pdf")
+    assert asyncio.run(pdf_utils.count_pages(str(tmp_path / "book.pdf"))) == 1
+
+
+def test_full_pool_refuses_work(pool):
+    async def flood():
+        return await asyncio.gather(*(pool.run(time.sleep, 0.3) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(flood())
+    refused = [r for r in results if isinstance(r, HTTPException)]
+    assert len(refused) == 1 and refused[0].status_code == 503
+    assert refused[0].headers["Retry-After"] == "5"
+    assert pool.stats()["rejected"] == 1 and pool.stats()["peak_pending"] == 2
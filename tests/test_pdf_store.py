@@ -0,0 +1,196 @@
+import asyncio
+
+import fitz
+import mongomock
+import pytest
+
+import pdf_store
+import pdf_utils
+from motor_fakes import AsyncCollection
+from core.uploads import SpooledUpload
+
+
+@pytest.fixture
+def blobs(monkeypatch):
+    """
+    A mongomock pdf_blobs collection and the storage objects behind it.
+    """
+    stored = {}
+    collection = mongomock.MongoClient().db.pdf_blobs
+
+    def upload_file(local_path, path, content_type="application/octet-stream", upsert=False):
+        with open(local_path, "rb") as f:
+            stored[path] = f.read()
+        return path
+
+    monkeypatch.setattr(pdf_store, "pdf_blobs_collection", collection)
+    monkeypatch.setattr(pdf_store, "async_pdf_blobs_collection", AsyncCollection(collection))
+    monkeypatch.setattr(pdf_store, "upload_file", upload_file)
+    def delete_folder(folder):
+        for path in [p for p in stored if p.startswith(folder + "/")]:
+            del stored[path]
+
+    async def file_sizes(folder):
+        prefix = folder + "/"
+        return {p[len(prefix):]: len(data) for p, data in stored.items() if p.startswith(prefix)}
+
+    async def download_stream(path):
+        yield stored[path]
+
+    monkeypatch.setattr(pdf_store, "delete_file", lambda path: stored.pop(path, None) is not None)
+    monkeypatch.setattr(pdf_store, "delete_folder", delete_folder)
+    monkeypatch.setattr(pdf_store, "afile_sizes", file_sizes)
+    monkeypatch.setattr(pdf_store, "adownload_stream", download_stream)
+    return collection, stored
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    """
+    A spooled upload of a small PDF, under the content hash "abc".
+    """
+    path = tmp_path / "upload.pdf"
+    path.write_bytes(b"%PDF")
+    upload = SpooledUpload(open(path, "rb"), 4, "abc")
+    yield upload
+    upload.close()
+
+
+def test_first_acquire_uploads_and_repeats_share_it(blobs, pdf):
+    collection, stored = blobs
+
+    first = pdf_store.acquire_pdf(pdf, 3)
+    second = pdf_store.acquire_pdf(pdf, 3)
+
+    assert (first["deduplicated"], second["deduplicated"]) == (False, True)
+    assert second["path"] == first["path"] and list(stored) == [first["path"]]
+    blob = collection.find_one({"_id": "abc"})
+    assert (blob["refcount"], blob["num_pages"], blob["size"]) == (2, 3, 4)
+    assert asyncio.run(pdf_store.pdf_page_count(pdf)) == 3
+
+
+def test_object_is_deleted_with_its_last_reference(blobs, pdf):
+    collection, stored = blobs
+    path = pdf_store.acquire_pdf(pdf, 1)["path"]
+    pdf_store.acquire_pdf(pdf, 1)
+
+    assert pdf_store.release_pdf("abc") is False
+    assert path in stored
+
+    assert pdf_store.release_pdf("abc") is True
+    assert stored == {} and collection.find_one({"_id": "abc"}) is None
+    # Releasing again never drives the count negative
+    assert pdf_store.release_pdf("abc") is False
+
+
+def test_acquire_after_last_release_uploads_a_new_copy(blobs, pdf):
+    _, stored = blobs
+    old = pdf_store.acquire_pdf(pdf, 1)["path"]
+    pdf_store.release_pdf("abc")
+
+    new = pdf_store.acquire_pdf(pdf, 1)
+    assert new["deduplicated"] is False and new["path"] != old
+    assert list(stored) == [new["path"]]
+
+
+def test_losing_an_upload_race_drops_the_duplicate_copy(blobs, pdf, monkeypatch):
+    collection, stored = blobs
+    find_one_and_update = collection.find_one_and_update
+
+    def racing(query, update, **kwargs):
+        blob = find_one_and_update(query, update, **kwargs)
+        if blob is None and not kwargs.get("upsert"):
+            # Another upload registers the same content in the meantime
+            stored["pdfs/blobs/abc/winner.pdf"] = b"%PDF"
+            collection.insert_one({"_id": "abc", "path": "pdfs/blobs/abc/winner.pdf", "refcount": 1})
+        return blob
+
+    monkeypatch.setattr(collection, "find_one_and_update", racing)
+
+    result = pdf_store.acquire_pdf(pdf, 1)
+    assert result == {"path": "pdfs/blobs/abc/winner.pdf", "sha256": "abc", "deduplicated": True}
+    assert list(stored) == ["pdfs/blobs/abc/winner.pdf"]
+    assert collection.find_one({"_id": "abc"})["refcount"] == 2
+
+
+def test_release_job_pdf(blobs, pdf):
+    _, stored = blobs
+    path = pdf_store.acquire_pdf(pdf, 1)["path"]
+    stored["pdfs/old/original.pdf"] = b"%PDF"
+
+    assert pdf_store.release_job_pdf({"pdf_sha256": "abc", "remote_pdf_path": path}) is True
+    assert pdf_store.release_job_pdf({"remote_pdf_path": "pdfs/old/original.pdf"}) is True
+    assert stored == {}
+    assert pdf_store.release_job_pdf({}) is False
+
+
+def test_adopted_object_is_dropped_when_the_content_is_stored(blobs, pdf):
+    collection, stored = blobs
+    path = pdf_store.acquire_pdf(pdf, 1)["path"]
+    stored["pdfs/direct/original.pdf"] = b"%PDF"
+
+    blob = pdf_store.adopt_pdf("pdfs/direct/original.pdf", "abc", 4, 1)
+    assert blob == {"path": path, "sha256": "abc", "deduplicated": True}
+    assert list(stored) == [path]
+
+    fresh = pdf_store.adopt_pdf("pdfs/direct/other.pdf", "def", 4, 2)
+    assert fresh["deduplicated"] is False
+    assert collection.find_one({"_id": "def"})["path"] == "pdfs/direct/other.pdf"
+
+
+@pytest.fixture
+def book(blobs, tmp_path, monkeypatch):
+    """
+    A stored four-page PDF whose pages can be told apart by their size.
+    """
+    _, stored = blobs
+    doc = fitz.open()
+    for n in range(1, 5):
+        doc.new_page(width=100 * n, height=100)
+    stored["pdfs/blobs/abc/1.pdf"] = doc.tobytes()
+
+    pool = pdf_utils.PdfProcessPool(workers=1, max_queue=4)
+    monkeypatch.setattr(pdf_utils, "pdf_pool", pool)
+    yield stored
+    pool.shutdown()
+
+
+def page_sources(pdf_path: str, pages: list) -> dict:
+    async def run():
+        with pdf_store.LocalPdf(pdf_path) as local:
+            return await pdf_store.page_sources(local, pages)
+    return asyncio.run(run())
+
+
+def page_width(data: bytes) -> float:
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        assert doc.page_count == 1
+        return doc[0].rect.width
+
+
+def test_pages_are_split_once_and_reused(book, monkeypatch):
+    sources = page_sources("pdfs/blobs/abc/1.pdf", [2, 4])
+
+    assert sources == {2: ("pdfs/blobs/abc/1/pages/2.pdf", True), 4: ("pdfs/blobs/abc/1/pages/4.pdf", True)}
+    assert [page_width(book[path]) for path, _ in sources.values()] == [200, 400]
+
+    async def no_split(*args):
+        raise AssertionError("pages were split again")
+
+    monkeypatch.setattr(pdf_store, "split_pages", no_split)
+    assert page_sources("pdfs/blobs/abc/1.pdf", [4]) == {4: ("pdfs/blobs/abc/1/pages/4.pdf", True)}
+
+
+def test_tasks_fall_back_to_the_whole_pdf(book):
+    del book["pdfs/blobs/abc/1.pdf"]
+    sources = page_sources("pdfs/blobs/abc/1.pdf", [1])
+    assert sources == {1: ("pdfs/blobs/abc/1.pdf", False)}
+
+
+def test_split_pages_go_with_the_last_reference(blobs, pdf):
+    _, stored = blobs
+    path = pdf_store.acquire_pdf(pdf, 1)["path"]
+    stored[f"{pdf_store.page_folder(path)}/1.pdf"] = b"%PDF"
+
+    pdf_store.release_pdf("abc")
+    assert stored == {}
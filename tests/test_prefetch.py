@@ -0,0 +1,59 @@
+import asyncio
+
+import audio.service as service
+
+
+class Fetcher:
+    """
+    Fetch that takes longer for earlier paths and records how many
+    downloads were in flight at once.
+    """
+
+    def __init__(self, delays: dict):
+        self.delays = delays
+        self.active = 0
+        self.peak = 0
+        self.fetched = []
+
+    async def __call__(self, path: str) -> bytes:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(path, 0))
+        finally:
+            self.active -= 1
+        self.fetched.append(path)
+        return path.encode()
+
+
+async def fetch_all(paths, window, fetch) -> list:
+    return [item async for item in service.prefetch_ordered(paths, window=window, fetch=fetch)]
+
+
+def test_yields_in_input_order():
+    paths = [f"p{i}" for i in range(8)]
+    fetch = Fetcher({path: 0.01 * (8 - i) for i, path in enumerate(paths)})
+    out = asyncio.run(fetch_all(paths, 4, fetch))
+    assert out == [(path, path.encode()) for path in paths]
+
+
+def test_window_bounds_downloads_in_flight():
+    paths = [f"p{i}" for i in range(12)]
+    fetch = Fetcher({path: 0.01 for path in paths})
+    assert len(asyncio.run(fetch_all(paths, 3, fetch))) == 12
+    assert fetch.peak == 3
+
+
+def test_close_cancels_pending_downloads():
+    paths = [f"p{i}" for i in range(50)]
+    fetch = Fetcher({path: 0.05 for path in paths[1:]})
+
+    async def first_then_close():
+        fetched = service.prefetch_ordered(paths, window=2, fetch=fetch)
+        assert await fetched.__anext__() == ("p0", b"p0")
+        await fetched.aclose()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(first_then_close())
+    assert fetch.fetched == ["p0"]
+    assert fetch.active == 0
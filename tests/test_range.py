@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import audio.service as service
+from audio.manifest import manifest_entry
+from audio.service import parse_range_header
+from utils import page_cache_version
+from wavs import audio_pages, collect
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-2000", (990, 999)),
+    ("bytes= 5 - 10 ", (5, 10)),
+])
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    "items=0-10",
+    "bytes=0-10,20-30",
+    "bytes=abc-",
+    "bytes=10",
+    "bytes=-0",
+])
+def test_parse_range_header_ignored(header):
+    assert parse_range_header(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=50-10"])
+def test_parse_range_header_unsatisfiable(header):
+    with pytest.raises(HTTPException) as exc:
+        parse_range_header(header, 1000)
+    assert exc.value.status_code == 416
+    assert exc.value.headers["Content-Range"] == "bytes */1000"
+
+
+@pytest.fixture
+def book(page_store):
+    pages = audio_pages(page_store, {f"page_{n}": bytes([n, 0]) * 100 for n in range(1, 6)})
+    plan = asyncio.run(service.get_wav_plan({"job_id": "job", "pages": pages}))
+    full = asyncio.run(collect(service.iter_wav_stream(dict(plan))))
+    page_store.downloads.clear()
+    page_store.ranges.clear()
+    return plan, full
+
+
+@pytest.mark.parametrize("start, end", [(0, 10), (0, 43), (40, 300), (44, 243), (500, 1043), (1000, 1043)])
+def test_range_body_matches_full_stream(book, start, end):
+    plan, full = book
+    assert asyncio.run(collect(service.iter_wav_range(dict(plan), start, end))) == full[start:end + 1]
+
+
+def test_range_fetches_only_overlapping_pages(book, page_store):
+    plan, full = book
+    # Page 3 spans bytes 444-643
+    asyncio.run(collect(service.iter_wav_range(dict(plan), 450, 600)))
+    assert page_store.downloads == []
+    assert page_store.ranges == [("audio/job/page_3.wav", 50, 200)]
+
+    asyncio.run(collect(service.iter_wav_range(dict(plan), 444, 643)))
+    assert page_store.downloads == ["audio/job/page_3.wav"]
+
+
+def test_partial_pages_are_fetched_by_byte_range(book, page_store):
+    plan, full = book
+    job = {"job_id": "with-manifest", "pages": {e["key"]: {"audio_path": e["path"]} for e in plan["pages"]}}
+    job["audio_manifest"] = [
+        manifest_entry(key, page["audio_path"], page_store[page["audio_path"]]) for key, page in job["pages"].items()
+    ]
+    manifest_plan = asyncio.run(service.get_wav_plan(job))
+    page_store.downloads.clear()
+
+    # Bytes 450-700 cover the tail of page 3 and the head of page 4
+    assert asyncio.run(collect(service.iter_wav_range(dict(manifest_plan), 450, 700))) == full[450:701]
+    assert page_store.downloads == []
+    assert page_store.ranges == [("audio/job/page_3.wav", 50, 243), ("audio/job/page_4.wav", 44, 100)]
+
+
+def test_plan_is_reused_while_pages_are_unchanged(page_store):
+    pages = audio_pages(page_store, {"page_1": b"\1\0" * 10, "page_2": b"\2\0" * 10})
+    job = {"job_id": "cached", "pages": pages}
+    asyncio.run(service.get_wav_plan(job))
+    page_store.downloads.clear()
+
+    asyncio.run(service.get_wav_plan(job))
+    assert page_store.downloads == []
+
+    job["pages"] = {"page_1": pages["page_1"]}
+    asyncio.run(service.get_wav_plan(job))
+    assert page_store.downloads
+
+
+def test_redispatched_pages_are_planned_again(page_store):
+    pages = audio_pages(page_store, {"page_1": b"\1\0" * 10})
+    job = {"job_id": "regenerated", "pages": pages, "audio_generation": 1}
+    asyncio.run(service.get_wav_plan(job))
+    page_store.downloads.clear()
+
+    job["audio_generation"] = 2
+    plan = asyncio.run(service.get_wav_plan(job))
+    assert page_store.downloads == ["audio/job/page_1.wav"]
+    assert plan["versions"] == {"audio/job/page_1.wav": page_cache_version(job, pages["page_1"])}
+
+
+def test_recorded_size_and_etag_change_the_version():
+    job = {"audio_generation": 1}
+    page = {"audio_path": "audio/job/page_1.wav", "duration": 2.0, "size": 100, "etag": "a"}
+    version = page_cache_version(job, page)
+    assert version != page_cache_version(job, dict(page, size=102))
+    assert version != page_cache_version(job, dict(page, etag="b"))
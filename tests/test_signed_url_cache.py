@@ -0,0 +1,61 @@
+import time
+
+from signed_url_cache import SignedUrlCache
+
+
+class Redis:
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+        self.expiry[key] = ex
+
+    def execute(self):
+        pass
+
+
+class BrokenRedis:
+    def mget(self, keys):
+        raise ConnectionError("redis down")
+
+
+def test_cached_url_is_reused_while_fresh_enough():
+    redis = Redis()
+    cache = SignedUrlCache(redis, min_remaining_ratio=0.5)
+    expires_at = int(time.time()) + 300
+    cache.put_many({"a": ("https://a", expires_at), "b": None}, 300)
+
+    assert cache.get_many(["a", "b"], 300) == {"a": ("https://a", expires_at)}
+    # The key only lives while more than half the TTL is left
+    assert 140 <= redis.expiry["su:300:a"] <= 150
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_url_close_to_expiry_is_a_miss():
+    redis = Redis()
+    cache = SignedUrlCache(redis, min_remaining_ratio=0.5)
+    redis.values["su:300:a"] = f"{int(time.time()) + 100}|https://a".encode()
+
+    assert cache.get_many(["a"], 300) == {}
+
+
+def test_ttl_is_part_of_the_key():
+    cache = SignedUrlCache(Redis())
+    cache.put_many({"a": ("https://a", int(time.time()) + 300)}, 300)
+
+    assert cache.get_many(["a"], 3600) == {}
+
+
+def test_redis_errors_count_as_misses():
+    cache = SignedUrlCache(BrokenRedis())
+
+    assert cache.get_many(["a", "b"], 300) == {}
+    assert cache.stats()["errors"] == 1 and cache.misses == 2
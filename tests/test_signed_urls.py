@@ -0,0 +1,91 @@
+import json
+
+import httpx
+import pytest
+
+import storage.http as storage_http
+import storage.supabase_backend as supabase_backend
+import supabase_client
+from signed_url_cache import SignedUrlCache
+
+
+class Bucket:
+    """
+    Bulk signing endpoint of the storage REST API.
+    """
+
+    def __init__(self, fail_chunks=()):
+        self.calls = []
+        self.fail_chunks = fail_chunks
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        paths = json.loads(request.content)["paths"]
+        self.calls.append(paths)
+        if len(self.calls) in self.fail_chunks:
+            return httpx.Response(503)
+        return httpx.Response(200, json=[
+            {"path": p, "signedURL": f"https://signed/{p}"} for p in paths if "broken" not in p
+        ])
+
+
+@pytest.fixture
+def signing(monkeypatch, storage_server):
+    """
+    Serve signing from a Bucket, two paths per bulk call; returns the paths
+    signed one by one.
+    """
+    monkeypatch.setattr(supabase_backend, "SIGNED_URL_BATCH_SIZE", 2)
+    monkeypatch.setattr(storage_http, "STORAGE_RETRIES", 0)
+    monkeypatch.setattr(supabase_client, "signed_url_cache", SignedUrlCache(None))
+
+    def connect(bucket: Bucket) -> list:
+        singles = []
+        backend = storage_server(bucket)
+
+        def sign_one(path, ttl):
+            singles.append(path)
+            return None if "broken" in path else f"https://single/{path}"
+
+        monkeypatch.setattr(backend, "sign", sign_one)
+        monkeypatch.setattr(supabase_client, "get_storage", lambda: backend)
+        return singles
+
+    return connect
+
+
+def test_paths_are_signed_in_batches(signing):
+    bucket = Bucket()
+    singles = signing(bucket)
+
+    signed = supabase_client.create_signed_urls(["a", "b", "a", None, "c"], 300)
+
+    assert bucket.calls == [["a", "b"], ["c"]]
+    assert signed == {p: f"https://signed/{p}" for p in "abc"}
+    assert singles == []
+
+
+def test_failed_batch_falls_back_to_single_signing(signing):
+    bucket = Bucket(fail_chunks={1})
+    singles = signing(bucket)
+
+    signed = supabase_client.create_signed_urls(["a", "b", "c"], 300)
+
+    assert sorted(singles) == ["a", "b"]
+    assert signed == {"a": "https://single/a", "b": "https://single/b", "c": "https://signed/c"}
+
+
+def test_playlist_skips_pages_without_audio_url(signing):
+    signing(Bucket())
+    job = {"job_id": "job", "title": "Book", "pages": {
+        "page_10": {"audio_path": "a10", "sync_path": "s10", "duration": 2},
+        "page_2": {"audio_path": "a2_broken"},
+        "page_1": {"audio_path": "a1", "sync_path": "s1_broken", "duration": 1},
+        "page_3": {},
+    }}
+
+    response = supabase_client.build_playlist_response(job)
+
+    assert [(row["page"], row["sync_url"]) for row in response["pages"]] == [
+        ("page_1", None), ("page_10", "https://signed/s10")
+    ]
+    assert response["failed_urls"] == 2
@@ -0,0 +1,208 @@
+import io
+import os
+
+import httpx
+import pytest
+
+import storage.supabase_backend as supabase_backend
+from storage.base import ObjectExists, ObjectNotFound, StorageError, trim_chunks
+from storage.local_backend import LocalStorage
+from storage.s3_backend import S3Storage
+from storage.service import create_storage
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalStorage(str(tmp_path / "bucket"))
+
+
+def test_local_round_trip(local):
+    local.upload("audio/job/page_1.wav", b"abc")
+    assert local.download("audio/job/page_1.wav") == b"abc"
+    assert b"".join(local.stream("audio/job/page_1.wav", chunk_size=2)) == b"abc"
+
+
+def test_local_upload_without_upsert_keeps_the_existing_object(local):
+    local.upload("a.wav", b"old")
+    with pytest.raises(StorageError):
+        local.upload("a.wav", b"new")
+    assert local.download("a.wav") == b"old"
+
+    local.upload("a.wav", b"new", upsert=True)
+    assert local.download("a.wav") == b"new"
+
+
+def test_local_upload_without_upsert_loses_a_race_cleanly(local, monkeypatch):
+    local.upload("a.wav", b"first")
+    # Another writer creates the object between the existence check and the write
+    monkeypatch.setattr(os.path, "exists", lambda path: False)
+    with pytest.raises(ObjectExists):
+        local.upload("a.wav", b"second")
+    assert local.download("a.wav") == b"first"
+    assert os.listdir(local.root) == ["a.wav"]
+
+
+def test_local_paths_stay_under_the_root(local):
+    with pytest.raises(StorageError):
+        local.upload("../outside.wav", b"x")
+    with pytest.raises(ObjectNotFound):
+        local.download("missing.wav")
+
+
+def test_local_listing_pages_and_skips_temp_files(local):
+    for n in range(5):
+        local.upload(f"job/page_{n}.wav", bytes(n))
+    local.upload("job/sub/page_9.wav", b"x")
+    open(os.path.join(local.root, "job", ".tmp-partial"), "wb").close()
+
+    names = [item["name"] for item in local.list("job", limit=3)]
+    assert names == ["page_0.wav", "page_1.wav", "page_2.wav"]
+    assert local.list("job", limit=3, offset=3)[-1] == {"name": "sub", "size": None}
+    assert local.sizes("job", page_size=2) == {f"page_{n}.wav": n for n in range(5)}
+
+
+def test_local_remove_counts_missing_objects_as_deleted(local):
+    local.upload("a.wav", b"x")
+    assert local.remove_many(["a.wav", "gone.wav"]) == {"deleted": ["a.wav", "gone.wav"], "failed": []}
+    assert local.list("") == []
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(RuntimeError):
+        create_storage("ftp")
+
+
+def test_local_upload_stream_copies_from_the_current_position(local):
+    source = io.BytesIO(b"headerpayload")
+    source.seek(6)
+
+    report = local.upload_stream("a.bin", source, size=4)
+
+    assert local.download("a.bin") == b"payl"
+    assert (report["bytes"], report["chunks"]) == (4, 1)
+
+
+class TusServer:
+    """
+    Storage TUS endpoint that loses the connection on one PATCH after
+    keeping the first half of its chunk.
+    """
+
+    def __init__(self, fail_on_patch: int):
+        self.data = b""
+        self.patches = 0
+        self.fail_on_patch = fail_on_patch
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            return httpx.Response(201, headers={"Location": "/storage/v1/upload/resumable/upload-1"})
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"Upload-Offset": str(len(self.data))})
+
+        self.patches += 1
+        assert int(request.headers["Upload-Offset"]) == len(self.data)
+        chunk = request.read()
+        if self.patches == self.fail_on_patch:
+            self.data += chunk[:len(chunk) // 2]
+            raise httpx.ReadError("connection reset", request=request)
+        self.data += chunk
+        return httpx.Response(204, headers={"Upload-Offset": str(len(self.data))})
+
+
+def test_tus_upload_resumes_from_the_server_offset(monkeypatch, storage_server):
+    server = TusServer(fail_on_patch=2)
+    monkeypatch.setattr(supabase_backend, "TUS_CHUNK_SIZE", 4)
+    monkeypatch.setattr(supabase_backend.time, "sleep", lambda seconds: None)
+    backend = storage_server(server)
+
+    report = backend.upload_stream("pdfs/a.pdf", io.BytesIO(b"0123456789"))
+
+    assert server.data == b"0123456789"
+    assert report["retries"] == 1
+
+
+def test_local_stream_serves_byte_ranges(local):
+    local.upload("a.bin", bytes(range(10)))
+    assert b"".join(local.stream("a.bin", chunk_size=3, start=2, end=6)) == bytes(range(2, 7))
+    assert b"".join(local.stream("a.bin", start=8)) == bytes([8, 9])
+    assert local.size("a.bin") == 10
+
+
+def test_ignored_range_is_trimmed_client_side():
+    chunks = [b"0123", b"4567", b"89"]
+    assert b"".join(trim_chunks(iter(chunks), 3, 4)) == b"3456"
+    assert b"".join(trim_chunks(iter(chunks), 5)) == b"56789"
+
+
+class FakeS3:
+    """
+    The few S3 client calls S3Storage makes, over a dict of objects.
+    """
+
+    def __init__(self):
+        from botocore.exceptions import ClientError
+
+        self.error = ClientError
+        self.objects = {}
+        self.calls = []
+
+    def put_object(self, Bucket, Key, Body, ContentType, IfNoneMatch=None):
+        self.calls.append("put_object")
+        if IfNoneMatch == "*" and Key in self.objects:
+            raise self.error({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        self.objects[Key] = Body
+
+    def get_paginator(self, operation):
+        self.calls.append(operation)
+        objects = self.objects
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix, Delimiter):
+                keys = sorted(k for k in objects if k.startswith(Prefix))
+                for start in range(0, len(keys), 1000):
+                    yield {"Contents": [{"Key": k, "Size": len(objects[k])} for k in keys[start:start + 1000]]}
+
+        return Paginator()
+
+    def head_object(self, Bucket, Key):
+        self.calls.append("head_object")
+        if Key not in self.objects:
+            raise self.error({"Error": {"Code": "404"}}, "HeadObject")
+        return {"ContentLength": len(self.objects[Key])}
+
+
+@pytest.fixture
+def s3():
+    storage = S3Storage("bucket", region="us-east-1")
+    storage.client = FakeS3()
+    return storage
+
+
+def test_s3_small_upload_is_a_single_conditional_put(s3):
+    s3.upload_stream("a.pdf", io.BytesIO(b"%PDF-1"))
+    with pytest.raises(ObjectExists):
+        s3.upload_stream("a.pdf", io.BytesIO(b"%PDF-2"))
+    assert s3.client.objects["a.pdf"] == b"%PDF-1"
+    assert s3.client.calls == ["put_object", "put_object"]
+
+    report = s3.upload_stream("a.pdf", io.BytesIO(b"%PDF-2"), upsert=True)
+    assert s3.client.objects["a.pdf"] == b"%PDF-2" and report["bytes"] == 6
+
+
+def test_s3_walk_lists_the_folder_once(s3):
+    s3.client.objects = {f"audio/job/page_{n:04}.wav": b"x" for n in range(2500)}
+
+    names = []
+    offset = 0
+    while True:
+        batch = s3.list("audio/job", 1000, offset)
+        names.extend(item["name"] for item in batch)
+        if len(batch) < 1000:
+            break
+        offset += 1000
+
+    assert names == sorted(f"page_{n:04}.wav" for n in range(2500))
+    assert s3.client.calls == ["list_objects_v2"]
+    # The walk is over; the next one lists again
+    s3.list("audio/job")
+    assert s3.client.calls == ["list_objects_v2"] * 2
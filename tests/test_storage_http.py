@@ -0,0 +1,83 @@
+import httpx
+import pytest
+
+import storage.http as storage_http
+from storage.metrics import LatencyHistogram, StorageMetrics
+
+
+class Flaky:
+    """
+    Fails the first `failures` requests with `failure`, then answers 200.
+    """
+
+    def __init__(self, failures: int, failure):
+        self.failures = failures
+        self.failure = failure
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.calls <= self.failures:
+            if isinstance(self.failure, int):
+                return httpx.Response(self.failure)
+            raise self.failure("storage unreachable", request=request)
+        return httpx.Response(200, text="ok")
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    metrics = StorageMetrics()
+    metrics.register_pool("sync", 2)
+    monkeypatch.setattr(storage_http, "storage_metrics", metrics)
+    monkeypatch.setattr(storage_http, "STORAGE_RETRIES", 3)
+    monkeypatch.setattr(storage_http.time, "sleep", lambda seconds: None)
+    return metrics
+
+
+def send(handler, **kwargs) -> httpx.Response:
+    client = httpx.Client(base_url="http://storage.test", transport=httpx.MockTransport(handler))
+    return storage_http.send(client, "sync", "download", "GET", "/object/a", **kwargs)
+
+
+def test_idempotent_calls_retry_server_errors(metrics):
+    server = Flaky(2, 503)
+    assert send(server).status_code == 200
+    assert server.calls == 3
+    assert metrics.retries == {"download": 2}
+    assert metrics.pools["sync"]["in_flight"] == 0
+
+
+def test_retries_give_up_after_the_limit(metrics):
+    server = Flaky(10, 503)
+    assert send(server).status_code == 503
+    assert server.calls == 4
+
+
+def test_non_idempotent_calls_only_retry_unsent_requests(metrics):
+    server = Flaky(1, 503)
+    assert send(server, idempotent=False).status_code == 503
+    assert server.calls == 1
+
+    server = Flaky(1, httpx.ReadError)
+    with pytest.raises(httpx.ReadError):
+        send(server, idempotent=False)
+
+    server = Flaky(1, httpx.ConnectError)
+    assert send(server, idempotent=False).status_code == 200
+    assert server.calls == 2
+
+
+def test_backoff_is_capped(monkeypatch):
+    monkeypatch.setattr(storage_http, "STORAGE_RETRY_BACKOFF", 1.0)
+    monkeypatch.setattr(storage_http, "STORAGE_RETRY_BACKOFF_MAX", 4.0)
+    assert all(0 <= storage_http.backoff_delay(10) <= 4.0 for _ in range(100))
+
+
+def test_histogram_percentiles_are_bucket_bounds():
+    histogram = LatencyHistogram(buckets=(10, 100))
+    for ms in (1, 2, 3, 50, 500):
+        histogram.observe(ms, ok=ms < 500)
+    snapshot = histogram.snapshot()
+    assert (snapshot["p50_ms"], snapshot["p95_ms"]) == (10, 500.0)
+    assert snapshot["buckets"] == {"le_10": 3, "le_100": 1, "le_inf": 1}
+    assert snapshot["errors"] == 1
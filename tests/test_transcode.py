@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from audio import transcode
+from wavs import collect
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    """
+    Stand in for ffmpeg with a command that copies stdin to stdout (or
+    fails), so the pipe handling is tested without an encoder installed.
+    """
+    command = ["cat"]
+    create = asyncio.create_subprocess_exec
+
+    async def fake_exec(*args, **kwargs):
+        return await create(*command, **kwargs)
+
+    monkeypatch.setattr(transcode.asyncio, "create_subprocess_exec", fake_exec)
+    return command
+
+
+class Source:
+    """
+    Endless WAV-ish chunks that count how many were pulled.
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        self.sent += 1
+        return b"\0" * 65536
+
+    async def aclose(self):
+        self.closed = True
+
+
+async def chunks_of(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_validate_format():
+    assert transcode.validate_format(None) == "wav"
+    assert transcode.validate_format("MP3") == "mp3"
+    with pytest.raises(HTTPException):
+        transcode.validate_format("flac")
+    assert transcode.media_type("opus") == "audio/ogg"
+    assert transcode.file_extension("wav") == "wav"
+
+
+def test_output_streams_through(encoder):
+    chunks = [bytes([n]) * 1000 for n in range(50)]
+    out = asyncio.run(collect(transcode.transcode_stream(chunks_of(chunks), "mp3")))
+    assert out == b"".join(chunks)
+
+
+def test_encoder_failure_raises(encoder):
+    encoder[:] = ["sh", "-c", "cat >/dev/null; echo broken >&2; exit 3"]
+    with pytest.raises(RuntimeError, match="broken"):
+        asyncio.run(collect(transcode.transcode_stream(chunks_of([b"x" * 10]), "mp3")))
+
+
+def test_slow_client_stalls_source_and_disconnect_closes_it(encoder):
+    source = Source()
+
+    async def read_one_then_leave():
+        out = transcode.transcode_stream(source, "mp3")
+        await out.__anext__()
+        await asyncio.sleep(0.1)
+        # The client stopped reading: only what fits in the pipes was pulled
+        assert source.sent < 1000
+        await out.aclose()
+
+    asyncio.run(read_one_then_leave())
+    assert source.closed
+
+
+def test_busy_encoder_refuses_free_callers(encoder, monkeypatch):
+    monkeypatch.setattr(transcode, "_transcode_slots", asyncio.Semaphore(1))
+    transcode.ensure_transcode_capacity()
+
+    async def hold_a_slot():
+        out = transcode.transcode_stream(Source(), "mp3")
+        await out.__anext__()
+        with pytest.raises(HTTPException) as exc:
+            transcode.ensure_transcode_capacity()
+        assert exc.value.status_code == 503
+        assert exc.value.headers["Retry-After"]
+        await out.aclose()
+
+    asyncio.run(hold_a_slot())
+    transcode.ensure_transcode_capacity()
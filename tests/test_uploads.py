@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import io
+import os
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from fastapi import HTTPException, UploadFile
+
+import core.uploads as uploads
+
+
+class Body(io.BytesIO):
+    """
+    Upload body that records how much of it was read.
+    """
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.consumed += len(chunk)
+        return chunk
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(uploads, "UPLOAD_READ_CHUNK_SIZE", 4)
+    return tmp_path
+
+
+def spool(body: Body, **kwargs):
+    return asyncio.run(uploads.spool_upload(UploadFile(body, filename="a.pdf"), **kwargs))
+
+
+def test_upload_is_spooled_and_hashed(spool_dir):
+    data = b"%PDF-1.7 " + b"x" * 50
+    with spool(Body(data), max_size=100, require_pdf=True) as upload:
+        assert (upload.size, upload.sha256) == (len(data), hashlib.sha256(data).hexdigest())
+        assert upload.open().read() == data
+        path = upload.path
+    assert not os.path.exists(path)
+
+
+def test_oversize_upload_stops_reading_at_the_limit(spool_dir):
+    body = Body(b"%PDF" + b"x" * 1000)
+    with pytest.raises(HTTPException) as exc:
+        spool(body, max_size=10)
+    assert exc.value.detail == "File too large"
+    assert body.consumed <= 12
+    assert os.listdir(spool_dir) == []
+
+
+def test_non_pdf_is_rejected_on_its_first_bytes(spool_dir):
+    body = Body(b"GIF89a" + b"x" * 1000)
+    with pytest.raises(HTTPException) as exc:
+        spool(body, require_pdf=True)
+    assert exc.value.detail == "Invalid PDF file"
+    assert body.consumed == 4
+    assert os.listdir(spool_dir) == []
+
+
+def test_admin_spooling_skips_the_checks(spool_dir):
+    with spool(Body(b"not a pdf")) as upload:
+        assert upload.size == 9
+
+
+def test_rejected_stream_is_closed(spool_dir):
+    closed = []
+
+    async def chunks():
+        try:
+            for _ in range(100):
+                yield b"GIF8"
+        finally:
+            closed.append(True)
+
+    with pytest.raises(HTTPException):
+        asyncio.run(uploads.spool_stream(chunks(), require_pdf=True))
+    assert closed == [True]
+
+
+@pytest.fixture
+def upload_api(spool_dir, monkeypatch):
+    """
+    The jobs router with auth, rate limits, credits and storage stubbed out;
+    records the jobs it creates.
+    """
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import jobs.router as jobs
+    from core.dependencies import get_current_user_async
+
+    created = []
+
+    async def page_count(upload):
+        return 1
+
+    async def deduct(user_id, amount):
+        pass
+
+    async def insert_one(doc):
+        created.append(doc)
+
+    monkeypatch.setattr(uploads, "UPLOAD_READ_CHUNK_SIZE", 64 * 1024)
+    monkeypatch.setattr(jobs, "rate_limit", lambda **kwargs: None)
+    monkeypatch.setattr(jobs, "pdf_page_count", page_count)
+    monkeypatch.setattr(jobs, "deduct_credits_atomic_async", deduct)
+    monkeypatch.setattr(jobs, "acquire_pdf", lambda upload, pages: {"path": f"pdfs/blobs/{upload.sha256}.pdf"})
+    monkeypatch.setattr(jobs.async_jobs_collection, "insert_one", insert_one)
+    app = FastAPI()
+    app.include_router(jobs.router)
+    app.dependency_overrides[get_current_user_async] = lambda: {"_id": "user", "email": "a@b.c"}
+    client = TestClient(app)
+    client.created = created
+    return client
+
+
+def test_multipart_upload_creates_a_job(upload_api):
+    res = upload_api.post(
+        "/upload",
+        data={"title": "Book"},
+        files={"file": ("book.pdf", b"%PDF-1.7 body", "application/pdf")}
+    )
+    assert res.status_code == 200
+    assert (res.json()["title"], res.json()["file_name"]) == ("Book", "book.pdf")
+    assert upload_api.created[0]["pdf_sha256"] == hashlib.sha256(b"%PDF-1.7 body").hexdigest()
+
+
+def test_raw_upload_creates_the_same_job(upload_api):
+    res = upload_api.post(
+        "/upload/raw",
+        params={"title": "Book", "file_name": "book.pdf"},
+        content=b"%PDF-1.7 body",
+        headers={"Content-Type": "application/pdf"}
+    )
+    assert res.status_code == 200
+    assert (res.json()["title"], res.json()["file_name"]) == ("Book", "book.pdf")
+    assert upload_api.created[0]["pdf_sha256"] == hashlib.sha256(b"%PDF-1.7 body").hexdigest()
+
+
+def test_raw_upload_refuses_a_declared_oversize_body(upload_api, monkeypatch):
+    import jobs.router as jobs
+
+    monkeypatch.setattr(jobs, "MAX_UPLOAD_SIZE", 8)
+    res = upload_api.post(
+        "/upload/raw",
+        params={"title": "Book", "file_name": "book.pdf"},
+        content=b"%PDF-1.7 body",
+        headers={"Content-Type": "application/pdf"}
+    )
+    assert (res.status_code, res.json()["detail"]) == (400, "File too large")
+    assert upload_api.created == []
+
+
+@pytest.fixture
+def pending_uploads(monkeypatch):
+    """
+    mongomock jobs and pending_uploads collections behind the cleanup
+    endpoint; returns the pending uploads and the deleted object paths.
+    """
+    import jobs.router as jobs
+
+    db = mongomock.MongoClient().db
+    deleted = []
+    monkeypatch.setattr(jobs, "jobs_collection", db.jobs)
+    monkeypatch.setattr(jobs, "pending_uploads_collection", db.pending_uploads)
+    monkeypatch.setattr(jobs, "delete_file", deleted.append)
+    return db.pending_uploads, deleted
+
+
+def expired_slot(job_id: str, status: str = "pending") -> dict:
+    return {
+        "_id": job_id,
+        "status": status,
+        "expires_at": datetime.utcnow() - timedelta(hours=1),
+        "remote_pdf_path": f"pdfs/{job_id}.pdf"
+    }
+
+
+def test_cleanup_skips_uploads_being_finalized(pending_uploads):
+    import jobs.router as jobs
+
+    slots, deleted = pending_uploads
+    slots.insert_many([expired_slot("left"), expired_slot("claimed", "finalizing")])
+
+    result = jobs.cleanup_expired_files(key=jobs.CLEANUP_SECRET_KEY)
+    assert result["abandoned_uploads"] == 1
+    assert deleted == ["pdfs/left.pdf"]
+    assert [doc["_id"] for doc in slots.find()] == ["claimed"]
+
+
+def test_failed_delete_puts_the_slot_back(pending_uploads, monkeypatch):
+    import jobs.router as jobs
+
+    slots, _ = pending_uploads
+    slots.insert_one(expired_slot("left"))
+
+    def unavailable(path):
+        raise RuntimeError("storage down")
+
+    monkeypatch.setattr(jobs, "delete_file", unavailable)
+
+    result = jobs.cleanup_expired_files(key=jobs.CLEANUP_SECRET_KEY)
+    assert (result["abandoned_uploads"], len(result["errors"])) == (0, 1)
+    assert slots.find_one({"_id": "left"})["status"] == "pending"
@@ -0,0 +1,68 @@
+import struct
+
+import pytest
+
+from utils import WavError, parse_wav, parse_wav_header, wav_header
+
+
+def make_wav(pcm: bytes, channels=1, sample_width=2, rate=24000, extra=b"") -> bytes:
+    """
+    A PCM WAV with `extra` chunks between fmt and data.
+    """
+    header = wav_header(channels, sample_width, rate, len(pcm))
+    return header[:36] + extra + header[36:] + pcm
+
+
+def list_chunk(payload: bytes) -> bytes:
+    return b"LIST" + struct.pack("<I", len(payload)) + payload + b"\0" * (len(payload) & 1)
+
+
+def test_parse_wav_canonical():
+    info = parse_wav(make_wav(b"\1\0" * 100))
+    assert (info.channels, info.sample_width, info.sample_rate) == (1, 2, 24000)
+    assert info.data_offset == 44
+    assert info.frames == 100
+
+
+def test_parse_wav_skips_extra_chunks():
+    pcm = b"\2\0" * 50
+    info = parse_wav(make_wav(pcm, extra=list_chunk(b"INFOabc")))
+    assert info.data_offset == 44 + 8 + 8
+    assert bytes(info.data) == pcm
+
+
+def test_parse_wav_clamps_streamed_size():
+    buf = bytearray(make_wav(b"\0" * 201))
+    struct.pack_into("<I", buf, 40, 0xFFFFFFFF)
+    info = parse_wav(buf)
+    # Clamped to what's there, then trimmed to whole frames
+    assert len(info.data) == 200
+
+
+@pytest.mark.parametrize("buf", [
+    b"",
+    b"RIFF\0\0\0\0WAVX",
+    wav_header(1, 2, 24000, 0)[:36],
+])
+def test_parse_wav_rejects_garbage(buf):
+    with pytest.raises(WavError):
+        parse_wav(buf)
+
+
+def test_parse_wav_rejects_compressed():
+    buf = bytearray(make_wav(b"\0" * 8))
+    struct.pack_into("<H", buf, 20, 3)  # IEEE float
+    with pytest.raises(WavError):
+        parse_wav(buf)
+
+
+def test_parse_wav_header_from_head_only():
+    wav = make_wav(b"\0" * 1000, channels=2, rate=22050, extra=list_chunk(b"INFO"))
+    layout = parse_wav_header(wav[:64], len(wav))
+    assert layout == (2, 2, 22050, 44 + 12, 1000)
+
+
+def test_parse_wav_header_needs_data_chunk_in_head():
+    wav = make_wav(b"\0" * 100, extra=list_chunk(b"x" * 100))
+    with pytest.raises(WavError):
+        parse_wav_header(wav[:40], len(wav))
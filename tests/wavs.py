@@ -0,0 +1,36 @@
+import io
+import wave
+
+
+def make_wav(pcm: bytes, channels=1, sample_width=2, rate=24000) -> bytes:
+    out = io.BytesIO()
+    with wave.open(out, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sample_width)
+        w.setframerate(rate)
+        w.writeframes(pcm)
+    return out.getvalue()
+
+
+def read_wav(data: bytes) -> tuple:
+    with wave.open(io.BytesIO(data), "rb") as w:
+        return (w.getnchannels(), w.getsampwidth(), w.getframerate()), w.readframes(w.getnframes())
+
+
+def audio_pages(store: dict, pcms: dict, **params) -> dict:
+    """
+    Store one page WAV per key in `store` and return the job's `pages`.
+    """
+    pages = {}
+    for key, pcm in pcms.items():
+        path = f"audio/job/{key}.wav"
+        store[path] = make_wav(pcm, **params)
+        pages[key] = {"audio_path": path}
+    return pages
+
+
+async def collect(chunks) -> bytes:
+    """
+    Drain an async byte stream.
+    """
+    return b"".join([bytes(chunk) async for chunk in chunks])
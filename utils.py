@@ -1,6 +1,172 @@
-import io
-import wave
+import struct
+from typing import NamedTuple
+
+WAV_HEADER_SIZE = 44
+MAX_RIFF_SIZE = 0xFFFFFFFF
+
+
+def page_number(key: str) -> int:
+    return int(key.split("_")[-1])
+
+
+def ordered_pages(pages: dict) -> list:
+    """
+    Return a job's (key, page) pairs sorted by page number ("page_N" keys).
+    """
+    return sorted(pages.items(), key=lambda item: page_number(item[0]))
+
+
+def page_cache_version(job: dict, page: dict) -> str:
+    """
+    Version of a page's audio objects for the page cache. Workers rewrite
+    them in place, so this changes whenever pages are dispatched again
+    (audio_generation) or the worker records a different result: its
+    duration, and the uploaded object's size and etag when the worker
+    stores them on the page ("size", "etag").
+    """
+    return f"{job.get('audio_generation', 0)}:{page.get('duration')}:{page.get('size')}:{page.get('etag')}"
+
+
+class WavError(ValueError):
+    pass
+
+
+class WavInfo(NamedTuple):
+    channels: int
+    sample_width: int
+    sample_rate: int
+    data_offset: int
+    data: memoryview
+
+    @property
+    def frames(self) -> int:
+        return len(self.data) // (self.channels * self.sample_width)
+
+
+_PCM = 1
+_EXTENSIBLE = 0xFFFE
+
+
+class WavLayout(NamedTuple):
+    channels: int
+    sample_width: int
+    sample_rate: int
+    data_offset: int
+    data_size: int
+
+
+def _scan_chunks(view: memoryview, total: int) -> tuple:
+    """
+    Walk the chunk list of a RIFF/WAVE file whose first len(view) of `total`
+    bytes are in `view`. Returns (fmt fields, data offset, data size).
+    """
+    if len(view) < 12 or view[0:4] != b"RIFF" or view[8:12] != b"WAVE":
+        raise WavError("Not a RIFF/WAVE file")
+
+    fmt = None
+    data_offset = data_size = None
+    pos = 12
+    while pos + 8 <= len(view):
+        chunk_id = bytes(view[pos:pos + 4])
+        (size,) = struct.unpack_from("<I", view, pos + 4)
+        body = pos + 8
+        remaining = total - body
+
+        if chunk_id == b"fmt ":
+            if size < 16 or size > remaining or body + 16 > len(view):
+                raise WavError("Malformed fmt chunk")
+            fmt = struct.unpack_from("<HHIIHH", view, body)
+            if fmt[0] == _EXTENSIBLE and size >= 40 and body + 26 <= len(view):
+                (sub_format,) = struct.unpack_from("<H", view, body + 24)
+                fmt = (sub_format,) + fmt[1:]
+        elif chunk_id == b"data":
+            data_offset = body
+            data_size = size if 0 < size <= remaining else remaining
+            if fmt is not None:
+                break
+
+        pos = body + size + (size & 1)
+        if size > remaining:
+            break
+
+    if fmt is None:
+        raise WavError("Missing fmt chunk")
+    if data_offset is None:
+        raise WavError("Missing data chunk")
+    return fmt, data_offset, data_size
+
+
+def _pcm_params(fmt: tuple) -> tuple:
+    format_tag, channels, sample_rate, _, block_align, bits = fmt
+    if format_tag != _PCM:
+        raise WavError(f"Unsupported WAV encoding {format_tag:#x}")
+    if not 1 <= channels <= 8 or sample_rate <= 0 or bits not in (8, 16, 24, 32):
+        raise WavError("Invalid WAV params")
+    sample_width = bits // 8
+    if block_align != channels * sample_width:
+        raise WavError("Inconsistent block align")
+    return channels, sample_width, sample_rate
+
+
+def parse_wav(buf) -> WavInfo:
+    """
+    Locate the PCM in a RIFF/WAVE buffer without copying it.
+
+    Walks the chunk list, so extra chunks (LIST, fact, ...) before or after
+    `data` are skipped. A `data` size that is 0, 0xFFFFFFFF or runs past the
+    end of the buffer (streamed/truncated writers) is clamped to what is
+    actually there, and the PCM is trimmed to whole frames. Raises WavError
+    for anything that isn't uncompressed PCM with sane params.
+    """
+    view = memoryview(buf).cast("B")
+    fmt, data_offset, data_size = _scan_chunks(view, len(view))
+    channels, sample_width, sample_rate = _pcm_params(fmt)
+
+    data_size -= data_size % (channels * sample_width)
+    return WavInfo(
+        channels,
+        sample_width,
+        sample_rate,
+        data_offset,
+        view[data_offset:data_offset + data_size]
+    )
+
+
+def parse_wav_header(head, total_size: int) -> WavLayout:
+    """
+    Same as parse_wav, from only the first bytes of a `total_size` byte
+    file. Raises WavError when the chunks up to `data` aren't all in `head`.
+    """
+    view = memoryview(head).cast("B")
+    fmt, data_offset, data_size = _scan_chunks(view, total_size)
+    channels, sample_width, sample_rate = _pcm_params(fmt)
+    return WavLayout(
+        channels,
+        sample_width,
+        sample_rate,
+        data_offset,
+        data_size - data_size % (channels * sample_width)
+    )
+
+
+def wav_pcm_view(wav_bytes) -> memoryview:
+    return parse_wav(wav_bytes).data
+
 
 def wav_to_pcm_bytes(wav_bytes: bytes) -> bytes:
-    with wave.open(io.BytesIO(wav_bytes), "rb") as w:
-        return w.readframes(w.getnframes())
\ No newline at end of file
+    return bytes(wav_pcm_view(wav_bytes))
+
+
+def wav_header(nchannels: int, sampwidth: int, framerate: int, data_size: int) -> bytes:
+    """
+    Build a canonical 44-byte PCM WAV header for `data_size` bytes of audio.
+    """
+    block_align = nchannels * sampwidth
+    data_size = min(data_size, MAX_RIFF_SIZE - 36)
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, nchannels, framerate,
+        framerate * block_align, block_align, sampwidth * 8,
+        b"data", data_size
+    )